@@ -0,0 +1,86 @@
+"""
+Micro-benchmark of the alarm zones: AlarmEngine against a loop over boolean zone masks
+(frame[mask].max() per zone), for several zone counts.
+
+    python benchmarks/bench_alarms.py --frames 2000 --zones 8,32,64
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "client", "embedded_device"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "common"))
+
+from thermal_common.alarm_engine import AlarmEngine, zone_mask  # noqa: E402
+
+from bench_renderer import make_frames, measure  # noqa: E402
+
+
+def make_zones(count, rate, seed=0):
+    """Half rectangles, half triangles spread over the frame, with high and optionally rate limits"""
+    rng = np.random.default_rng(seed)
+    zones = []
+    for i in range(count):
+        x, y = int(rng.integers(0, 26)), int(rng.integers(0, 18))
+        zone = {"name": f"Zone{i}", "high": 35.0}
+        if i % 2:
+            zone["rect"] = [x, y, int(rng.integers(3, 7)), int(rng.integers(3, 7))]
+        else:
+            zone["polygon"] = [[x, y], [x + 6, y], [x + 3, y + 6]]
+        if rate:
+            zone["rate"] = 20.0
+        zones.append(zone)
+    return zones
+
+
+class MaskLoop:
+    """Straightforward evaluation: one boolean mask per zone, high limit with debounce"""
+    def __init__(self, zones, debounce=3):
+        self.masks = [zone_mask(zone, (24, 32)) for zone in zones]
+        self.high = [zone["high"] for zone in zones]
+        self.pending = [0] * len(zones)
+        self.active = [False] * len(zones)
+        self.debounce = debounce
+
+    def evaluate(self, frame, timestamp):
+        events = []
+        for i, mask in enumerate(self.masks):
+            violating = frame[mask].max() > self.high[i]
+            self.pending[i] = self.pending[i] + 1 if violating != self.active[i] else 0
+            if self.pending[i] >= self.debounce:
+                self.active[i] = not self.active[i]
+                self.pending[i] = 0
+                events.append(i)
+        return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--zones", default="8,32,64", help="Zone counts to compare")
+    args = parser.parse_args()
+
+    frames = make_frames(args.frames)
+    period = 1.0 / 32
+
+    print(f"{args.frames * args.repeat} frames, times per frame")
+    print(f"{'zones':>6}  {'path':<22}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'32 Hz load':>12}")
+    for count in (int(value) for value in args.zones.split(",")):
+        cases = {
+            "mask loop": MaskLoop(make_zones(count, rate=False)),
+            "AlarmEngine": AlarmEngine(make_zones(count, rate=False)),
+            "AlarmEngine + rate": AlarmEngine(make_zones(count, rate=True)),
+        }
+        for name, engine in cases.items():
+            clock = iter(range(10 ** 9))
+            timings = measure(lambda frame: engine.evaluate(frame, next(clock) * period), frames, args.repeat)
+            p50, p99 = np.percentile(timings, [50, 99])
+            load = timings.mean() * 1e-6 / period
+            print(f"{count:>6}  {name:<22}{timings.mean():>10.1f}{p50:>10.1f}{p99:>10.1f}{100 * load:>11.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+End-to-end throughput and latency benchmark of server and client, no hardware and no Qt needed.
+
+For every combination of wire format and render settings a server with simulated sensors is
+started in a subprocess and the client Producer runs headless against it in this process.
+
+    python benchmarks/bench_pipeline.py --duration 10 --formats double,float32,int16 --render-workers 0,2
+
+Reported per run: rendered frames/s, end-to-end latency percentiles (sensor timestamp -> frame
+committed to the buffer), frames dropped on the network, in the render queue and skipped by the
+reader, CPU per client stage (thread), CPU and RSS of the server and client processes.
+"""
+import argparse
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import psutil
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SERVER_SCRIPT = os.path.join(ROOT, "server", "server_sensor_data_opcua.py")
+sys.path.insert(0, os.path.join(ROOT, "client", "embedded_device"))
+sys.path.insert(0, os.path.join(ROOT, "common"))
+
+from multithreading.buffer import CircularBuffer  # noqa: E402
+from multithreading.producer import Producer  # noqa: E402
+
+
+class BenchmarkConfigs:
+    """Client configuration and log sink with the interface of AppConfigs"""
+    def __init__(self, config):
+        self.config = config
+        self.messages = []
+
+    def load_config(self):
+        return self.config
+
+    def reload_if_changed(self):
+        return False
+
+    def logging(self, message, error=None, level=None):
+        self.messages.append(message if error is None else f"{message}. Error: {error}")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def start_server(port, wire_format, sensors, frame_rate, config_dir):
+    config = {
+        "endpoint": f"opc.tcp://127.0.0.1:{port}/freeopcua/server/",
+        "server_name": "Benchmark Thermal Server",
+        "namespace": "BeagleBoneThermal",
+        "wire_format": wire_format,
+        "sensors": [
+            {"name": f"Sensor{i}", "type": "simulated", "frame_rate": frame_rate, "seed": i}
+            for i in range(sensors)
+        ],
+    }
+    path = os.path.join(config_dir, f"server_{port}.json")
+    with open(path, "w") as config_file:
+        json.dump(config, config_file)
+    process = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPT, "--config", path],
+        cwd=os.path.dirname(SERVER_SCRIPT),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    if not wait_for_port(port, 15):
+        process.kill()
+        raise RuntimeError("Server did not start")
+    return process, config["endpoint"]
+
+
+def thread_cpu_times(process):
+    """CPU seconds per native thread id of a process"""
+    return {thread.id: thread.user_time + thread.system_time for thread in process.threads()}
+
+
+def stage_name(thread):
+    if thread.name.startswith("render"):
+        return "render"
+    if thread.name == "producer":
+        return "acquisition"
+    if thread.name == "reader":
+        return "reader"
+    return "other"
+
+
+def run_case(wire_format, render_workers, scale_factor, args, config_dir):
+    port = free_port()
+    server, endpoint = start_server(port, wire_format, args.sensors, args.frame_rate, config_dir)
+    server_process = psutil.Process(server.pid)
+    client_process = psutil.Process()
+
+    configs = BenchmarkConfigs({
+        "opcua_server": endpoint,
+        "delivery_mode": args.delivery_mode,
+        "scale_factor": scale_factor,
+        "render_workers": render_workers,
+    })
+    buffer = CircularBuffer(buffer_size=30)
+    producer = Producer(buffer, configs)
+
+    latencies = []
+    stop = threading.Event()
+
+    def read_frames():
+        while not stop.is_set():
+            slot = buffer.wait_for_frame(timeout=0.2)
+            if slot is not None:
+                latencies.append(time.time() - slot.timestamp)
+
+    producer_thread = threading.Thread(target=producer.start, name="producer", daemon=True)
+    reader_thread = threading.Thread(target=read_frames, name="reader", daemon=True)
+    producer_thread.start()
+    reader_thread.start()
+
+    # Warm up until the first frame arrives, then measure
+    warmup_deadline = time.monotonic() + 15
+    while buffer.write_count == 0 and time.monotonic() < warmup_deadline:
+        time.sleep(0.05)
+    latencies.clear()
+    start_frames = buffer.write_count
+    start_counter = dict(producer.frame_counter.as_dict())
+    start_pipeline = producer.pipeline.stats() if producer.pipeline else {}
+    start_skipped = buffer.skipped
+    start_client_cpu = thread_cpu_times(client_process)
+    start_server_cpu = server_process.cpu_times()
+    start_time = time.monotonic()
+
+    time.sleep(args.duration)
+
+    elapsed = time.monotonic() - start_time
+    frames = buffer.write_count - start_frames
+    counter = producer.frame_counter.as_dict()
+    pipeline = producer.pipeline.stats() if producer.pipeline else {}
+    client_cpu = thread_cpu_times(client_process)
+    server_cpu = server_process.cpu_times()
+    server_rss = server_process.memory_info().rss
+    client_rss = client_process.memory_info().rss
+    skipped = buffer.skipped - start_skipped
+
+    stages = {}
+    for thread in threading.enumerate():
+        if thread.native_id in client_cpu:
+            used = client_cpu[thread.native_id] - start_client_cpu.get(thread.native_id, 0.0)
+            stages[stage_name(thread)] = stages.get(stage_name(thread), 0.0) + used
+
+    stop.set()
+    producer.stop()
+    producer_thread.join(5)
+    reader_thread.join(1)
+    server.terminate()
+    server.wait(5)
+
+    latency_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    p50, p95, p99 = np.percentile(latency_ms, [50, 95, 99])
+    return {
+        "wire_format": wire_format,
+        "render_workers": render_workers,
+        "scale_factor": scale_factor,
+        "fps": frames / elapsed,
+        "latency_p50_ms": p50,
+        "latency_p95_ms": p95,
+        "latency_p99_ms": p99,
+        "net_dropped": counter["dropped"] - start_counter["dropped"],
+        "render_dropped": pipeline.get("dropped", 0) - start_pipeline.get("dropped", 0),
+        "reader_skipped": skipped,
+        "cpu_percent": {stage: 100 * used / elapsed for stage, used in stages.items()},
+        "server_cpu_percent": 100 * ((server_cpu.user + server_cpu.system)
+                                     - (start_server_cpu.user + start_server_cpu.system)) / elapsed,
+        "server_rss_mb": server_rss / 2 ** 20,
+        "client_rss_mb": client_rss / 2 ** 20,
+    }
+
+
+def print_result(result):
+    cpu = " ".join(f"{stage}={value:.1f}%" for stage, value in sorted(result["cpu_percent"].items()))
+    print(
+        f"{result['wire_format']:<8}{result['render_workers']:>8}{result['scale_factor']:>7}"
+        f"{result['fps']:>8.1f}{result['latency_p50_ms']:>9.1f}{result['latency_p95_ms']:>9.1f}"
+        f"{result['latency_p99_ms']:>9.1f}{result['net_dropped']:>8}{result['render_dropped']:>8}"
+        f"{result['reader_skipped']:>8}{result['server_cpu_percent']:>9.1f}{result['server_rss_mb']:>8.0f}"
+        f"{result['client_rss_mb']:>8.0f}  {cpu}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per run")
+    parser.add_argument("--formats", default="double,float32,int16", help="Wire formats to compare")
+    parser.add_argument("--render-workers", default="0,2", help="Render worker counts to compare")
+    parser.add_argument("--scale-factors", default="10", help="Render scale factors to compare")
+    parser.add_argument("--frame-rate", type=float, default=32.0, help="Simulated sensor frame rate")
+    parser.add_argument("--sensors", type=int, default=1, help="Simulated sensors on the server")
+    parser.add_argument("--delivery-mode", default="subscription", choices=("subscription", "polling"))
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    formats = args.formats.split(",")
+    workers = [int(value) for value in args.render_workers.split(",")]
+    scale_factors = [int(value) for value in args.scale_factors.split(",")]
+
+    print(f"{'format':<8}{'workers':>8}{'scale':>7}{'fps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'netdrop':>8}{'rdrop':>8}{'skipped':>8}{'srv cpu':>9}{'srv MB':>8}{'cli MB':>8}  client cpu")
+    results = []
+    with tempfile.TemporaryDirectory() as config_dir:
+        for wire_format, render_workers, scale_factor in itertools.product(formats, workers, scale_factors):
+            result = run_case(wire_format, render_workers, scale_factor, args, config_dir)
+            print_result(result)
+            results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as result_file:
+            json.dump(results, result_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Micro-benchmark of the temperature readouts of the viewer: TemperatureProbe, which upsamples a frame
+once on the first query, against cv2.resize of the frame on every query (point, rectangle max and
+line profile at the heatmap resolution).
+
+Every frame gets --moves hover queries, as from the mouse moving over the heatmap, plus one spot,
+rectangle and line query. Reported are the time per query of each kind and per frame of the workload.
+
+    python benchmarks/bench_probe.py --frames 500 --moves 10 --scale-factor 10
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "client", "embedded_device"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "common"))
+
+from processing.temperature_probe import TemperatureProbe  # noqa: E402
+
+from bench_renderer import make_frames  # noqa: E402
+
+
+class ResizePerQuery:
+    """Straightforward readouts: cv2.resize of the frame for every query"""
+    def __init__(self, scale_factor):
+        self.size = (32 * scale_factor, 24 * scale_factor)
+        self.frame = None
+
+    def set_frame(self, frame):
+        self.frame = frame
+
+    def field(self):
+        return cv2.resize(self.frame, self.size, interpolation=cv2.INTER_CUBIC)
+
+    def value_at(self, x, y):
+        return float(self.field()[y, x])
+
+    def rect_max(self, x, y, width, height):
+        region = self.field()[y:y + height + 1, x:x + width + 1]
+        row, col = np.unravel_index(int(np.argmax(region)), region.shape)
+        return float(region[row, col]), x + int(col), y + int(row)
+
+    def line_profile(self, x0, y0, x1, y1):
+        samples = max(abs(x1 - x0), abs(y1 - y0)) + 1
+        cols = np.rint(np.linspace(x0, x1, samples)).astype(np.intp)
+        rows = np.rint(np.linspace(y0, y1, samples)).astype(np.intp)
+        return self.field()[rows, cols]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--moves", type=int, default=10, help="Hover queries per frame")
+    parser.add_argument("--scale-factor", type=int, default=10)
+    args = parser.parse_args()
+
+    frames = make_frames(args.frames)
+    width, height = 32 * args.scale_factor, 24 * args.scale_factor
+    rng = np.random.default_rng(0)
+    moves = rng.integers(0, [width, height], size=(args.frames, args.moves, 2))
+    rect = (width // 4, height // 4, width // 2, height // 2)
+    line = (0, 0, width - 1, height - 1)
+
+    probe = TemperatureProbe(scale_factor=args.scale_factor)
+    probe.set_frame(frames[0])
+    reference = cv2.resize(frames[0], (width, height), interpolation=cv2.INTER_CUBIC)
+    print(f"max difference to cv2.resize {np.abs(probe.field() - reference).max():.2e} C")
+
+    print(f"{args.frames} frames, {args.moves} hover queries per frame, heatmap {width}x{height}")
+    print(f"{'readouts':<18}{'hover us':>10}{'spot us':>10}{'rect us':>10}{'line us':>10}{'frame us':>10}"
+          f"{'fields':>8}")
+    for name, readouts in (("cv2.resize/query", ResizePerQuery(args.scale_factor)),
+                           ("TemperatureProbe", TemperatureProbe(scale_factor=args.scale_factor))):
+        timings = np.zeros(4)
+        frame_start = time.perf_counter()
+        for frame, positions in zip(frames, moves):
+            readouts.set_frame(frame)
+            start = time.perf_counter()
+            for x, y in positions:
+                readouts.value_at(int(x), int(y))
+            hover = time.perf_counter()
+            readouts.value_at(width // 2, height // 2)
+            spot = time.perf_counter()
+            readouts.rect_max(*rect)
+            area = time.perf_counter()
+            readouts.line_profile(*line)
+            timings += (hover - start, spot - hover, area - spot, time.perf_counter() - area)
+        per_frame = (time.perf_counter() - frame_start) / args.frames
+        timings *= 1e6 / args.frames
+        timings[0] /= max(args.moves, 1)
+        fields = getattr(readouts, "computed", args.frames * (args.moves + 3))
+        print(f"{name:<18}{timings[0]:>10.1f}{timings[1]:>10.1f}{timings[2]:>10.1f}{timings[3]:>10.1f}"
+              f"{per_frame * 1e6:>10.1f}{fields:>8}")
+
+
+if __name__ == "__main__":
+    main()
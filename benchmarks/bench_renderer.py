@@ -0,0 +1,90 @@
+"""
+Micro-benchmark of heatmap rendering: ThermalRenderer against the original
+normalize -> cv2.resize -> np.uint8 -> cv2.applyColorMap path of the Producer.
+
+    python benchmarks/bench_renderer.py --frames 2000 --scale-factor 10
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "client", "embedded_device"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "common"))
+
+from processing.renderer import ThermalRenderer  # noqa: E402
+
+
+def legacy_render(thermal_array, scale_factor, colormap):
+    """Rendering as done by Producer.fetch_thermal_data before ThermalRenderer"""
+    min_temp = np.min(thermal_array)
+    max_temp = np.max(thermal_array)
+    normalized = (thermal_array - max_temp) / (min_temp - max_temp)
+    resized = cv2.resize(
+        normalized,
+        (32 * scale_factor, 24 * scale_factor),
+        interpolation=cv2.INTER_CUBIC
+    )
+    return cv2.applyColorMap(np.uint8(resized * 255), colormap)
+
+
+def make_frames(count, seed=0, noise=0.2):
+    """Room temperature scene with a moving hot spot and sensor noise (rms degrees)"""
+    rng = np.random.default_rng(seed)
+    rows, cols = np.mgrid[0:24, 0:32].astype(np.float32)
+    frames = np.empty((count, 24, 32), dtype=np.float32)
+    for i in range(count):
+        cy, cx = 12 + 8 * np.sin(i / 20), 16 + 12 * np.cos(i / 30)
+        frames[i] = 22 + 15 * np.exp(-((rows - cy) ** 2 + (cols - cx) ** 2) / 18)
+    frames += rng.normal(0, noise, frames.shape).astype(np.float32)
+    return frames
+
+
+def measure(render, frames, repeat):
+    for frame in frames[:50]:
+        render(frame)
+    timings = np.empty(len(frames) * repeat)
+    i = 0
+    for _ in range(repeat):
+        for frame in frames:
+            start = time.perf_counter()
+            render(frame)
+            timings[i] = time.perf_counter() - start
+            i += 1
+    return timings * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scale-factor", type=int, default=10)
+    parser.add_argument("--colormap", type=int, default=cv2.COLORMAP_JET)
+    args = parser.parse_args()
+
+    frames = make_frames(args.frames)
+    renderer = ThermalRenderer(scale_factor=args.scale_factor)
+    out = np.empty(renderer.output_shape + (3,), dtype=np.uint8)
+
+    cases = {
+        "legacy": lambda frame: legacy_render(frame, args.scale_factor, args.colormap),
+        "ThermalRenderer": lambda frame: renderer.render(frame, args.colormap, out),
+    }
+
+    print(f"{args.frames * args.repeat} frames, output {out.shape[1]}x{out.shape[0]}, "
+          f"OpenCV threads {cv2.getNumThreads()}")
+    print(f"{'path':<18}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'max fps':>10}")
+    results = {}
+    for name, render in cases.items():
+        timings = measure(render, frames, args.repeat)
+        results[name] = timings.mean()
+        p50, p99 = np.percentile(timings, [50, 99])
+        print(f"{name:<18}{timings.mean():>10.1f}{p50:>10.1f}{p99:>10.1f}{1e6 / timings.mean():>10.0f}")
+    print(f"speedup {results['legacy'] / results['ThermalRenderer']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
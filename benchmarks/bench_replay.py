@@ -0,0 +1,119 @@
+"""
+Recorder throughput and replay load test of the client render stage, no server and no Qt needed.
+
+A synthetic recording is written first (or --recording is used), then replayed through the
+headless Producer at the given speeds (0 = as fast as possible, the replay then waits for the
+render stage instead of dropping frames).
+
+    python benchmarks/bench_replay.py --frames 3200 --speeds 1,4,0 --render-workers 0,2
+
+Reported: recorder append time and RSS growth while recording, and per replay run the frames
+fed, frames rendered per second, latency percentiles (replay -> committed) and frames dropped
+by the render stage.
+"""
+import argparse
+import itertools
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import psutil
+
+from bench_pipeline import BenchmarkConfigs
+from multithreading.buffer import CircularBuffer
+from multithreading.producer import Producer
+from recording.stream_file import StreamRecorder
+
+
+def synthetic_frames(count, seed=0):
+    """Moving hot spot over a noisy 22 degree background"""
+    rng = np.random.default_rng(seed)
+    rows, cols = np.mgrid[0:24, 0:32].astype(np.float32)
+    for i in range(count):
+        cy = 12 + 8 * np.sin(i / 40)
+        cx = 16 + 12 * np.cos(i / 55)
+        frame = 22 + 25 * np.exp(-((rows - cy) ** 2 + (cols - cx) ** 2) / 12)
+        yield (frame + rng.normal(0, 0.25, frame.shape)).astype(np.float32)
+
+
+def record(path, frames, frame_rate):
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    times = []
+    with StreamRecorder(path) as recorder:
+        for sequence, frame in enumerate(synthetic_frames(frames), 1):
+            start = time.perf_counter()
+            recorder.append(frame, sequence, sequence / frame_rate)
+            times.append(time.perf_counter() - start)
+    times_us = np.array(times) * 1e6
+    print(f"recorded {frames} frames: append mean {times_us.mean():.1f} us, p99 {np.percentile(times_us, 99):.1f} us, "
+          f"max {times_us.max():.0f} us, RSS +{(process.memory_info().rss - rss_before) / 2 ** 20:.1f} MB, "
+          f"{os.path.getsize(path) / 2 ** 20:.1f} MB on disk")
+
+
+def replay(path, speed, render_workers, max_seconds):
+    configs = BenchmarkConfigs({
+        "replay_path": path,
+        "replay_speed": speed,
+        "render_workers": render_workers,
+        # As fast as possible only measures the render stage if the replay waits for it
+        "backpressure": "block" if speed == 0 else "drop_oldest",
+    })
+    buffer = CircularBuffer(buffer_size=30)
+    producer = Producer(buffer, configs)
+    latencies = []
+    stop = threading.Event()
+
+    def read_frames():
+        while not stop.is_set():
+            slot = buffer.wait_for_frame(timeout=0.2)
+            if slot is not None:
+                latencies.append(time.time() - slot.timestamp)
+
+    reader = threading.Thread(target=read_frames, name="reader", daemon=True)
+    reader.start()
+    producer_thread = threading.Thread(target=producer.start, name="producer", daemon=True)
+    start = time.monotonic()
+    producer_thread.start()
+    producer_thread.join(max_seconds)
+    producer.stop()
+    producer_thread.join(5)
+    elapsed = time.monotonic() - start
+    stop.set()
+    reader.join(1)
+
+    fed = producer.replay_source.fed if producer.replay_source else 0
+    latency_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    p50, p95, p99 = np.percentile(latency_ms, [50, 95, 99])
+    print(f"{speed:>6}{render_workers:>8}{fed:>8}{buffer.write_count / elapsed:>9.1f}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}"
+          f"{fed - buffer.write_count:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recording", help="Replay this recording instead of a synthetic one")
+    parser.add_argument("--frames", type=int, default=3200, help="Frames of the synthetic recording")
+    parser.add_argument("--frame-rate", type=float, default=32.0, help="Frame rate of the synthetic recording")
+    parser.add_argument("--speeds", default="4,0", help="Replay speeds to compare, 0 is as fast as possible")
+    parser.add_argument("--render-workers", default="0,2", help="Render worker counts to compare")
+    parser.add_argument("--max-seconds", type=float, default=60.0, help="Time limit per replay run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.recording
+        if path is None:
+            path = os.path.join(directory, "synthetic.trec")
+            record(path, args.frames, args.frame_rate)
+
+        print(f"{'speed':>6}{'workers':>8}{'frames':>8}{'fps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+              f"{'dropped':>9}")
+        speeds = [float(value) for value in args.speeds.split(",")]
+        workers = [int(value) for value in args.render_workers.split(",")]
+        for speed, render_workers in itertools.product(speeds, workers):
+            replay(path, speed, render_workers, args.max_seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Cold start benchmark of the viewer: time to window and time to first frame of
+client/embedded_device/app.py, or of a frozen build with --executable, against a server with a
+simulated sensor.
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --executable client/dist/embedded-device-microservice/embedded-device-microservice
+
+Every run starts the app in a temporary working directory whose config enables autostart, times
+the "Window shown" and "First frame shown" records of its log from the process launch, and stops
+it. The first run is the coldest, later ones profit from the page cache. Target: window in under 1 s.
+Without a display use --platform offscreen.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from bench_pipeline import ROOT, free_port, start_server
+
+APP_SCRIPT = os.path.join(ROOT, "client", "embedded_device", "app.py")
+WINDOW_TARGET = 1.0  # seconds
+
+
+# "2024-01-01 12:00:00.123 INFO: Window shown 0.45 s after start"
+STARTUP_RECORD = re.compile(r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\.\d{3}) \w+: (Window shown|First frame shown)")
+
+
+def log_times(log_path, launch):
+    """Seconds from launch (time.time()) to the window and first frame records of the app log"""
+    times = {}
+    try:
+        with open(log_path, encoding="utf-8") as log_file:
+            for line in log_file:
+                match = STARTUP_RECORD.match(line)
+                if match and match.group(2) not in times:
+                    logged = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S.%f").timestamp()
+                    times[match.group(2)] = logged - launch
+    except FileNotFoundError:
+        pass
+    return times.get("Window shown"), times.get("First frame shown")
+
+
+def run_app(command, workdir, env, timeout, log_path):
+    """Seconds from launch to the window and to the first frame (None when not seen)"""
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    launch = time.time()
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    window = first_frame = None
+    deadline = time.monotonic() + timeout
+    try:
+        # The records carry their own time, polling the log does not delay the measurement
+        while first_frame is None and process.poll() is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+            window, first_frame = log_times(log_path, launch)
+    finally:
+        process.terminate()
+        try:
+            process.wait(5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    if first_frame is None:
+        # Written between the last poll and the exit
+        window, first_frame = log_times(log_path, launch)
+    return window, first_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--executable", help="Frozen build to start instead of app.py")
+    parser.add_argument("--platform", help="QT_QPA_PLATFORM of the app, e.g. offscreen")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait for the first frame")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        port = free_port()
+        server, endpoint = start_server(port, "float32", 1, 32.0, workdir)
+        try:
+            os.makedirs(os.path.join(workdir, "app_configuration"))
+            log_path = os.path.join(workdir, "startup.log")
+            with open(os.path.join(workdir, "app_configuration", "embedded_device_config.json"), "w") as config_file:
+                json.dump({"opcua_server": endpoint, "autostart": True, "log_file": log_path}, config_file)
+            env = dict(os.environ)
+            if args.platform:
+                env["QT_QPA_PLATFORM"] = args.platform
+            command = [args.executable] if args.executable else [sys.executable, APP_SCRIPT]
+
+            print(f"{'run':>4}{'window s':>11}{'first frame s':>15}")
+            windows, first_frames = [], []
+            for run in range(args.runs):
+                window, first_frame = run_app(command, workdir, env, args.timeout, log_path)
+                print(f"{run + 1:>4}{window if window is not None else float('nan'):>11.3f}"
+                      f"{first_frame if first_frame is not None else float('nan'):>15.3f}")
+                if window is not None:
+                    windows.append(window)
+                if first_frame is not None:
+                    first_frames.append(first_frame)
+        finally:
+            server.terminate()
+            server.wait()
+
+    if not windows:
+        print("The window was never shown, start the app by hand with a display to see its output")
+        return
+    print(f"median window {np.median(windows):.3f} s (max {max(windows):.3f}), "
+          f"first frame {np.median(first_frames) if first_frames else float('nan'):.3f} s, "
+          f"target window < {WINDOW_TARGET:.0f} s {'met' if max(windows) < WINDOW_TARGET else 'missed'}")
+
+
+if __name__ == "__main__":
+    main()
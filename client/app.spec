@@ -5,6 +5,9 @@ from PyInstaller.utils.hooks import collect_data_files
 datas = [
     (os.path.join('embedded_device', 'app_configuration'), 'app_configuration/'),
     (os.path.join('embedded_device', 'multithreading'), 'multithreading/'),
+    (os.path.join('embedded_device', 'processing'), 'processing/'),
+    (os.path.join('embedded_device', 'recording'), 'recording/'),
+    (os.path.join('embedded_device', 'diagnostics'), 'diagnostics/'),
     ("embedded_device/thermal_viewer.qml", ".") 
 ]
 
@@ -13,10 +16,11 @@ hiddenimports = []
 
 a = Analysis(
     ['embedded_device/app.py'],
-    pathex=[],
+    # thermal_common is installed as a path dependency, also found here without poetry install
+    pathex=[os.path.join('..', 'common')],
     binaries=binaries,
     datas=datas,
-    hiddenimports=['embedded_device.multithreading.producer','embedded_device.multithreading.buffer'],
+    hiddenimports=['embedded_device.app_configuration.log_writer','embedded_device.multithreading.producer','embedded_device.multithreading.buffer','embedded_device.multithreading.backoff','embedded_device.multithreading.shared_ring','embedded_device.multithreading.session_pool','embedded_device.multithreading.multi_producer','embedded_device.processing.renderer','embedded_device.processing.temperature_probe','embedded_device.recording.stream_file','embedded_device.recording.replay','embedded_device.diagnostics.metrics_server','embedded_device.diagnostics.client_diagnostics','thermal_common.frame_codec','thermal_common.stage_metrics','thermal_common.sampling_profiler','thermal_common.alarm_engine','thermal_common.frame_filter'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -27,19 +31,18 @@ a = Analysis(
 
 pyz = PYZ(a.pure)
 
+# One directory build: a one file executable unpacks Qt and all libraries to a temporary
+# directory on every start, UPX compressed libraries are decompressed on every start
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='embedded-device-microservice',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -47,3 +50,13 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='embedded-device-microservice',
+)
@@ -1,22 +1,25 @@
+import time
+
+# Start of the app, for the time to window and to first frame
+STARTED = time.perf_counter()
+
 import sys
-import numpy as np
-import cv2
 import threading
-import base64
 import os
-import time
 
 # PySide6 imports
-from PySide6.QtCore import QObject, Signal as pyqtSignal, Slot as pyqtSlot, QTimer
+from PySide6.QtCore import QObject, Qt, Signal as pyqtSignal, Slot as pyqtSlot, Property as pyqtProperty, QTimer
 from PySide6.QtGui import QImage, QPixmap
-from PySide6.QtQml import QQmlApplicationEngine
+from PySide6.QtQml import QQmlApplicationEngine, QQmlImageProviderBase
+from PySide6.QtQuick import QQuickImageProvider
 from PySide6.QtWidgets import QApplication
 from PySide6.QtCore import QUrl
 from PySide6.QtQuickControls2 import QQuickStyle
 
-from multithreading.buffer import CircularBuffer
-from multithreading.producer import Producer
+# The producers (asyncua, OpenCV, numpy) are imported by ThermalViewerController.load_backend,
+# on a thread while QML loads
 from app_configuration.app_configs import AppConfigs
+from app_configuration.log_writer import ERROR
 
 
 # PyInstaller
@@ -27,35 +30,56 @@ else:
 
 qml_file = os.path.join(base_path, ".", "thermal_viewer.qml")
 
+# Colormaps of the settings in order, resolved to OpenCV constants when cv2 is loaded
+COLORMAP_NAMES = (
+    "COLORMAP_JET", "COLORMAP_HOT", "COLORMAP_COOL", "COLORMAP_RAINBOW", "COLORMAP_VIRIDIS",
+    "COLORMAP_PLASMA", "COLORMAP_INFERNO", "COLORMAP_MAGMA", "COLORMAP_CIVIDIS", "COLORMAP_PARULA",
+)
+
+class ThermalImageProvider(QQuickImageProvider):
+    """
+    Serves the latest heatmaps to QML without codec round trips, as image://thermal/<frame id>
+    or image://thermal/<sensor index>/<frame id> in the sensor grid
+    """
+    def __init__(self):
+        super().__init__(QQmlImageProviderBase.ImageType.Image)
+        self.lock = threading.Lock()
+        self.images = {}
+
+    def set_frame(self, frame, key=None):
+        """Copy a BGR uint8 heatmap into the image served to QML"""
+        height, width = frame.shape[:2]
+        image = QImage(frame.data, width, height, frame.strides[0], QImage.Format.Format_BGR888).copy()
+        with self.lock:
+            self.images[key] = image
+
+    def clear(self):
+        with self.lock:
+            self.images = {}
+
+    def requestImage(self, id, size, requestedSize):
+        key = id.split('/')[0] if '/' in id else None
+        with self.lock:
+            image = self.images.get(key, QImage())
+        if size is not None:
+            size.setWidth(image.width())
+            size.setHeight(image.height())
+        return image
+
 class ThermalImageProcessor(QObject):
     """Handles thermal image processing and conversion"""
     def __init__(self):
         super().__init__()
     
-    def convert_to_base64(self, frame):
-        """Convert OpenCV frame to base64 encoded image"""
-        if frame is None:
-            return None
-        
-       
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Encode image to JPG with reduced quality for better performance
-        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 85]
-        _, buffer = cv2.imencode('.jpg', frame_rgb, encode_param)
-        
-        
-        base64_image = base64.b64encode(buffer).decode('utf-8')
-        return f"data:image/jpg;base64,{base64_image}"
-    
     def extract_temperature_data(self, thermal_data):
         """Extract temperature data from thermal array"""
-        if thermal_data is None or not isinstance(thermal_data, list):
+        if thermal_data is None:
             return 0.0, 0.0, 0.0
+        import numpy as np
         
         try:
             # Reshape thermal data to original sensor resolution
-            thermal_array = np.array(thermal_data, dtype=np.float32).reshape((24, 32))
+            thermal_array = np.asarray(thermal_data, dtype=np.float32).reshape((24, 32))
             
             # Calculate min, max, and mean temperatures
             min_temp = np.min(thermal_array)
@@ -71,54 +95,164 @@ class ThermalViewerController(QObject):
     """Main controller for thermal viewer application"""
     
     # Signals for QML communication
-    frameUpdated = pyqtSignal(str, arguments=['frameBase64'])
+    frameUpdated = pyqtSignal(str, arguments=['frameUrl'])
     streamStateChanged = pyqtSignal(bool, arguments=['isRunning'])
     temperatureDataUpdated = pyqtSignal(float, float, float, arguments=['min', 'max', 'avg'])
+    gridFrameUpdated = pyqtSignal(int, str, arguments=['index', 'frameUrl'])
+    endpointStatusUpdated = pyqtSignal(int, str, arguments=['index', 'status'])
+    alarmChanged = pyqtSignal(int, str, bool, str, arguments=['index', 'zone', 'active', 'message'])
+    # Emitted when the stream starts or stops and when the temperature warning is disabled
+    alarmsCleared = pyqtSignal()
+    # Emitted by the producer threads when frames were committed, at most one is waiting in the GUI event queue
+    frameReady = pyqtSignal()
+    # Emitted by the loader thread when the producers are created
+    backendReady = pyqtSignal()
     
     def __init__(self):
         super().__init__()
         
      
         self.appConfigs = AppConfigs()
-        self.buffer = CircularBuffer(buffer_size=30) 
+        config = self.appConfigs.config or {}
+        self.buffer = None
         
         # Image processor
         self.image_processor = ThermalImageProcessor()
+
+        # Raw heatmap provider for QML
+        self.image_provider = ThermalImageProvider()
+        self.frame_id = 0
+        self.first_frame_shown = False
         
-        # Producer
-        self.producer = Producer(self.buffer, self.appConfigs)
+        # Producer, with "endpoints" in the config one per endpoint on a shared loop shown as a grid.
+        # Created by load_backend on a thread while QML loads, like the diagnostics and colormaps
+        self.producer = None
+        self.producers = []
+        # Copy of the displayed frame of every producer for the temperature readouts of the pointer
+        self.probes = []
+        self.grid = bool(config.get('endpoints'))
+        self.diagnostics = None
+        self.autostart = config.get('autostart', False)
         
         # Colormap
         self.current_colormap = 0  # Default to JET (cv2.COLORMAP_JET)
-        self.colormap_values = {
-            0: cv2.COLORMAP_JET,      # JET
-            1: cv2.COLORMAP_HOT,      # HOT
-            2: cv2.COLORMAP_COOL,     # COOL
-            3: cv2.COLORMAP_RAINBOW,  # RAINBOW
-            4: cv2.COLORMAP_VIRIDIS,  # VIRIDIS
-            5: cv2.COLORMAP_PLASMA,   # PLASMA
-            6: cv2.COLORMAP_INFERNO,  # INFERNO
-            7: cv2.COLORMAP_MAGMA,    # MAGMA
-            8: cv2.COLORMAP_CIVIDIS,  # CIVIDIS
-            9: cv2.COLORMAP_PARULA    # PARULA
-        }
+        # Alarm evaluation of the producers, the Temperature Warning switch
+        self.temp_warning = True
+        self.colormap_values = {}
         
         self.producer_thread = None
         self.running = False
         self.last_thermal_data = None
         
-        # Frame update timer
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_frame)
-        self.timer.start(33)  # 30fps
+        # Frame updates: the producers signal committed frames and the GUI thread shows the newest one,
+        # so the display follows the acquisition rate and the GUI thread sleeps while no frame arrives
+        self.frame_lock = threading.Lock()
+        self.frame_pending = False
+        self.frameReady.connect(self.update_frame, Qt.ConnectionType.QueuedConnection)
+
+        # Grid cell status, also refreshed while an endpoint sends no frame
+        self.status_timer = QTimer()
+        self.status_timer.timeout.connect(self.update_status)
+        self.streamStateChanged.connect(self.update_status_timer, Qt.ConnectionType.QueuedConnection)
+
+        # asyncua, OpenCV and numpy take most of the start time, they are imported on this thread.
+        # Stream toggles before backendReady are queued in pending_running, the GUI thread never waits
+        self.backend_loaded = threading.Event()
+        self.backend_ready = False
+        self.pending_running = None
+        self.backendReady.connect(self.on_backend_ready, Qt.ConnectionType.QueuedConnection)
+        self.loader = threading.Thread(target=self.load_backend, name="backend-loader", daemon=True)
+        self.loader.start()
 
         # Log start
         self.appConfigs.logging("Thermal Viewer Controller initialized")
 
+    def load_backend(self):
+        """Create the producers, diagnostics and colormap LUTs, and start the stream with autostart"""
+        try:
+            import cv2
+            from multithreading.buffer import CircularBuffer
+            from multithreading.producer import Producer
+            from multithreading.multi_producer import MultiProducer
+            from diagnostics.client_diagnostics import ClientDiagnostics
+            from processing.temperature_probe import TemperatureProbe
+
+            self.colormap_values = {index: getattr(cv2, name) for index, name in enumerate(COLORMAP_NAMES)}
+            endpoints = (self.appConfigs.config or {}).get('endpoints')
+            if endpoints:
+                self.producer = MultiProducer(self.appConfigs, endpoints)
+                self.producers = self.producer.producers
+            else:
+                self.buffer = CircularBuffer(buffer_size=30, render_shape=(24 * 10, 32 * 10))
+                self.producer = Producer(self.buffer, self.appConfigs)
+                self.producers = [self.producer]
+            self.probes = [
+                TemperatureProbe(scale_factor=producer.renderer.scale_factor,
+                                 interpolation=producer.renderer.interpolation)
+                for producer in self.producers
+            ]
+
+            for index, producer in enumerate(self.producers):
+                producer.renderer.prepare(self.colormap_values.values())
+                # Emitted on the producer thread, delivered to QML on the GUI thread
+                producer.alarm_listeners.append(
+                    lambda event, index=index: self.alarmChanged.emit(index, event.zone, event.active, event.message)
+                )
+                producer.frame_listeners.append(self.notify_frame)
+                producer.set_alarms_enabled(self.temp_warning)
+
+            # Metrics endpoint and sampling profiler, when configured
+            self.diagnostics = ClientDiagnostics(self.appConfigs, self.producers)
+            self.diagnostics.start()
+
+            # The OPC UA connection is set up while QML is still loading
+            if self.autostart:
+                self.start_stream()
+        except Exception as e:
+            self.appConfigs.logging("Error loading the producers", e)
+            print(f"Error loading the producers: {e}")
+        finally:
+            self.backend_loaded.set()
+            self.backendReady.emit()
+
+    def on_backend_ready(self):
+        """Runs on the GUI thread once QML is loaded, signals emitted before may have had no QML receiver"""
+        self.backend_ready = True
+        self.loadingChanged.emit()
+        self.endpointNamesChanged.emit()
+        if self.pending_running is not None:
+            running, self.pending_running = self.pending_running, None
+            self.set_stream(running)
+        self.streamStateChanged.emit(self.running)
+
+    def get_loading(self):
+        return not self.backend_ready
+
+    # True until the producers are created, the stream switch shows the queued state meanwhile
+    loadingChanged = pyqtSignal()
+    loading = pyqtProperty(bool, get_loading, notify=loadingChanged)
+
+    def get_endpoint_names(self):
+        return [producer.name for producer in self.producers] if self.grid else []
+
+    # Names of the grid cells, empty for a single sensor and until the producers are created
+    endpointNamesChanged = pyqtSignal()
+    endpointNames = pyqtProperty('QVariantList', get_endpoint_names, notify=endpointNamesChanged)
+
     @pyqtSlot()
     def toggle_stream(self):
-        """Toggle the thermal stream on and off"""
-        if not self.running:
+        """Toggle the thermal stream on and off, while the backend loads the last toggle is applied by on_backend_ready"""
+        running = self.running if self.pending_running is None else self.pending_running
+        if not self.backend_ready:
+            self.pending_running = not running
+            return
+        self.set_stream(not running)
+
+    def set_stream(self, running):
+        if self.producer is None:
+            # load_backend failed
+            self.streamStateChanged.emit(False)
+        elif running:
             self.start_stream()
         else:
             self.stop_stream()
@@ -126,22 +260,34 @@ class ThermalViewerController(QObject):
     @pyqtSlot(int)
     def set_colormap(self, colormap_index):
         """Set the colormap to use for thermal visualization"""
-        if colormap_index in self.colormap_values:
+        if 0 <= colormap_index < len(COLORMAP_NAMES):
             self.current_colormap = colormap_index
             self.appConfigs.logging(f"Colormap changed to index {colormap_index}")
             
             # Update producer's colormap if it exists
-            if hasattr(self.producer, 'current_colormap'):
+            if self.backend_loaded.is_set() and hasattr(self.producer, 'current_colormap'):
                 self.producer.current_colormap = self.colormap_values[colormap_index]
     
+    @pyqtSlot(bool)
+    def set_temp_warning(self, enabled):
+        """Turn the alarm evaluation of all producers on or off, disabling it clears the active alarms"""
+        self.temp_warning = enabled
+        # Producers created later by load_backend take the setting from temp_warning
+        for producer in self.producers:
+            producer.set_alarms_enabled(enabled)
+        if not enabled:
+            self.alarmsCleared.emit()
+        self.appConfigs.logging(f"Temperature warning {'enabled' if enabled else 'disabled'}")
+
     @pyqtSlot(int, bool)
     def apply_settings(self, colormap_index, enable_temp_warning):
         """Apply all settings at once"""
         self.set_colormap(colormap_index)
+        self.set_temp_warning(enable_temp_warning)
         self.appConfigs.logging(f"Settings applied: colormap={colormap_index}, temp_warning={enable_temp_warning}")
     
     def start_stream(self):
-        """Start the thermal data producer"""
+        """Start the thermal data producer, also called on the loader thread"""
         if not self.running:
             self.running = True
             
@@ -152,7 +298,8 @@ class ThermalViewerController(QObject):
             self.producer_thread.daemon = True
             self.producer_thread.start()
             
-            # Notify QML about stream state
+            # Notify QML about stream state, alarms of the previous stream do not apply anymore
+            self.alarmsCleared.emit()
             self.streamStateChanged.emit(True)
             self.appConfigs.logging("Stream started")
     
@@ -168,52 +315,160 @@ class ThermalViewerController(QObject):
             # Wait for thread to finish with timeout
             if self.producer_thread:
                 self.producer_thread.join(timeout=2.0)
+
+            for producer in self.producers:
+                stats = producer.buffer.stats()
+                self.appConfigs.logging(
+                    f"Displayed {stats['read']} of {stats['committed']} frames, skipped {stats['skipped']} ({producer.name})"
+                )
             
             # Reset last thermal data
             self.last_thermal_data = None
+            for producer in self.producers:
+                producer.buffer.clear()
+            for probe in self.probes:
+                probe.clear()
+            self.image_provider.clear()
+            for producer in self.producers:
+                producer.reset_alarms()
             
             # Notify QML that stream is stopped
+            self.alarmsCleared.emit()
             self.streamStateChanged.emit(False)
             self.appConfigs.logging("Stream stopped")
     
+    def update_status_timer(self, running):
+        """Refresh the grid cell status once a second while streaming"""
+        if running and self.grid:
+            self.status_timer.start(1000)
+        else:
+            self.status_timer.stop()
+
+    def shown_window(self):
+        """Connected to the first frameSwapped of the window"""
+        self.sender().frameSwapped.disconnect(self.shown_window)
+        self.appConfigs.logging(f"Window shown {time.perf_counter() - STARTED:.2f} s after start")
+
+    def shown_first_frame(self):
+        if not self.first_frame_shown:
+            self.first_frame_shown = True
+            self.appConfigs.logging(f"First frame shown {time.perf_counter() - STARTED:.2f} s after start")
+
+    def notify_frame(self):
+        """Called on the producer threads for every committed frame, queues one update_frame at a time"""
+        with self.frame_lock:
+            if self.frame_pending:
+                return
+            self.frame_pending = True
+        self.frameReady.emit()
+
     def update_frame(self):
-        """Update the displayed frame from the buffer"""
+        """Show the newest frame of the buffer, frames committed since the last update are skipped"""
+        # Frames committed from here on queue the next update
+        with self.frame_lock:
+            self.frame_pending = False
         if not self.running:
             return
+
+        if self.grid:
+            self.update_grid()
+            return
         
-        # Get frame from buffer
-        frame_bytes = self.buffer.get()
+        # Get the newest frame from the buffer, stale frames are skipped
+        slot = self.buffer.get()
         
-        if frame_bytes is not None:
+        if slot is not None and slot.rendered is not None:
+            self.producer.displayed(slot)
             try:
-                # Decode the image from buffer
-                frame_array = np.frombuffer(frame_bytes, dtype=np.uint8)
-                frame = cv2.imdecode(frame_array, cv2.IMREAD_COLOR)
+                # Keep the displayed frame, the ring slot is reused by the producer
+                probe = self.probes[0]
+                probe.set_frame(slot.frame)
+                self.last_thermal_data = probe.frame
+
+                # Extract temperature data
+                min_temp, max_temp, mean_temp = self.image_processor.extract_temperature_data(self.last_thermal_data)
+
+                # Update temperature values in QML
+                self.temperatureDataUpdated.emit(min_temp, max_temp, mean_temp)
                 
-                if frame is not None:
-                    # Get thermal data from producer for temperature display
-                    if hasattr(self.producer, 'last_thermal_data') and self.producer.last_thermal_data is not None:
-                        self.last_thermal_data = self.producer.last_thermal_data
-                        
-                        # Extract temperature data
-                        min_temp, max_temp, mean_temp = self.image_processor.extract_temperature_data(self.last_thermal_data)
-                        
-                        # Update temperature values in QML
-                        self.temperatureDataUpdated.emit(min_temp, max_temp, mean_temp)
-                    
-                    # Convert to base64 without temperature overlay
-                    base64_image = self.image_processor.convert_to_base64(frame)
-                    
-                    if base64_image:
-                        # Emit signal to update QML
-                        self.frameUpdated.emit(base64_image)
+                # Hand the raw heatmap to the image provider, a new id makes QML request it
+                self.image_provider.set_frame(slot.rendered)
+                self.frame_id += 1
+                self.frameUpdated.emit(f"image://thermal/{self.frame_id}")
+                self.shown_first_frame()
                         
             except Exception as e:
-                self.appConfigs.logging(f"Error updating frame: {e}")
+                self.appConfigs.logging(f"Error updating frame: {e}", level=ERROR)
                 print(f"Error updating frame: {e}")
 
+    def update_grid(self):
+        """Update the grid cells of the sensors with a new frame"""
+        self.frame_id += 1
+        frames = []
+        for index, producer in enumerate(self.producers):
+            slot = producer.buffer.get()
+            if slot is not None and slot.rendered is not None:
+                producer.displayed(slot)
+                self.probes[index].set_frame(slot.frame)
+                self.image_provider.set_frame(slot.rendered, str(index))
+                self.gridFrameUpdated.emit(index, f"image://thermal/{index}/{self.frame_id}")
+                self.shown_first_frame()
+            if self.probes[index].valid:
+                frames.append(self.probes[index].frame)
+
+        if frames:
+            import numpy as np
+            # Overall range of the sensors for the temperature panel
+            self.temperatureDataUpdated.emit(
+                float(min(frame.min() for frame in frames)),
+                float(max(frame.max() for frame in frames)),
+                float(np.mean([frame.mean() for frame in frames]))
+            )
+
+    def probe(self, index):
+        """Probe of a sensor, None before the producers are created or for an unknown index"""
+        if not self.backend_loaded.is_set() or not 0 <= index < len(self.probes):
+            return None
+        return self.probes[index]
+
+    @pyqtSlot(int, float, float, result=float)
+    def temperature_at(self, index, x, y):
+        """Temperature at heatmap pixel (x, y) of a sensor, NaN without a frame"""
+        probe = self.probe(index)
+        value = probe.value_at(x, y) if probe is not None else None
+        return value if value is not None else float('nan')
+
+    @pyqtSlot(int, float, float, float, float, result='QVariantMap')
+    def rect_max(self, index, x, y, width, height):
+        """Hottest heatmap pixel of a rectangle as {value, x, y}, empty without a frame"""
+        probe = self.probe(index)
+        spot = probe.rect_max(x, y, width, height) if probe is not None else None
+        if spot is None:
+            return {}
+        value, spot_x, spot_y = spot
+        return {"value": value, "x": spot_x, "y": spot_y}
+
+    @pyqtSlot(int, float, float, float, float, result='QVariantList')
+    def line_profile(self, index, x0, y0, x1, y1):
+        """Temperatures along a line of the heatmap, one per heatmap pixel, empty without a frame"""
+        probe = self.probe(index)
+        profile = probe.line_profile(x0, y0, x1, y1) if probe is not None else None
+        return profile.tolist() if profile is not None else []
+
+    def update_status(self):
+        """Update the status of the grid cells, once a second while streaming"""
+        for index, health in enumerate(self.producer.health().values()):
+            if not health["connected"]:
+                status = "offline"
+            elif health["latency_ms"] is None:
+                status = "connected"
+            else:
+                status = f"{health['frame_rate'] or 0:.0f} fps, {health['latency_ms']:.0f} ms"
+            self.endpointStatusUpdated.emit(index, status)
+
     def cleanup(self):
         """Clean up resources before closing the application"""
+        self.backend_loaded.wait(5.0)
         self.stop_stream()
         if self.producer:
             self.producer.stop()
@@ -222,8 +477,19 @@ class ThermalViewerController(QObject):
             
         self.appConfigs.logging("Producer and thread cleaned up")
         print("Producer and thread cleaned up")
+        if self.diagnostics is not None:
+            self.diagnostics.stop()
+        self.appConfigs.close()
+
+def preload():
+    """Import the producer modules, ThermalViewerController.load_backend waits for them"""
+    import multithreading.producer  # noqa: F401
+    import multithreading.multi_producer  # noqa: F401
+
 
 def main():
+    # Imports start before Qt so they overlap the creation of the application and the QML engine
+    threading.Thread(target=preload, name="preload", daemon=True).start()
     
     app = QApplication(sys.argv)
     
@@ -233,8 +499,9 @@ def main():
     
     controller = ThermalViewerController()
     
-    # Expose controller to QML
+    # Expose controller and heatmap provider to QML
     engine.rootContext().setContextProperty("thermalController", controller)
+    engine.addImageProvider("thermal", controller.image_provider)
     
     QQuickStyle.setStyle("Universal")  
     
@@ -247,6 +514,8 @@ def main():
         
     # Handle window closing
     engine.rootObjects()[0].destroyed.connect(controller.cleanup)
+    # Time to window, the first frame of the window may be rendered on the render thread
+    engine.rootObjects()[0].frameSwapped.connect(controller.shown_window, Qt.ConnectionType.QueuedConnection)
     
     sys.exit(app.exec())
 
@@ -1,37 +1,67 @@
 import os
 import json
-from datetime import datetime
 from pathlib import Path
 
+from app_configuration.log_writer import LogWriter, level_value, ERROR, INFO, WARNING
+
 class AppConfigs:
 
     def __init__(self):
+        """
+        The config file is parsed once, config is shared by all components. With config_reload
+        reload_if_changed() parses it again when the file changed, log settings need a restart
+        """
+        self.file_path = os.path.join(os.getcwd(),'app_configuration','embedded_device_config.json')
+        self.modified = None  # st_mtime_ns of the file when it was parsed
         self.config = self.load_config()
-        self.log_file = self.__get_log_file()
+        self.reload = bool((self.config or {}).get('config_reload', False))
+        self.log_writer = self.__get_log_writer()
         
 
     def load_config(self):
-        file_path = os.path.join(os.getcwd(),'app_configuration','embedded_device_config.json')
         try:
-            with open(file_path, 'r') as config_file:
+            self.modified = os.stat(self.file_path).st_mtime_ns
+            with open(self.file_path, 'r') as config_file:
                 return  json.load(config_file)
         except Exception as e:
             print(f"Error config file doesn't exist: {e}")
             return
+
+    def reload_if_changed(self):
+        """Parse the config file again if config_reload is set and it changed, the last valid config is kept"""
+        if not self.reload:
+            return False
+        try:
+            if os.stat(self.file_path).st_mtime_ns == self.modified:
+                return False
+        except OSError:
+            return False
+        config = self.load_config()
+        if config is None:
+            self.logging("Changed config file not loaded, keeping the previous configuration", level=WARNING)
+            return False
+        self.config = config
+        self.logging("Config file reloaded")
+        return True
         
 
-    def logging(self, message, error=None):
-        timestamp = self.__log_timestamp()
-        if error is None:
-            self.log_file.write(timestamp + ": " + message + "\n")
-            self.log_file.flush()
-        else:
-            self.log_file.write(timestamp + ": " + message + ". " + "Error: " + str(error) + "\n")
-            self.log_file.flush()
-
-    def __log_timestamp(self):
-        return  datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    def __get_log_file(self):
-        logfile = open(self.config.get('log_file', 'embedded_device.log'), 'w')
-        return logfile
+    def logging(self, message, error=None, level=None):
+        """Queue a log record, level defaults to ERROR when an error is given and INFO otherwise"""
+        if level is None:
+            level = ERROR if error is not None else INFO
+        self.log_writer.log(level, message, error)
+
+    def close(self):
+        """Write the queued log records and close the log file"""
+        self.log_writer.close()
+
+    def __get_log_writer(self):
+        config = self.config or {}
+        return LogWriter(
+            config.get('log_file', 'embedded_device.log'),
+            level=level_value(config.get('log_level', 'info')),
+            max_bytes=config.get('log_max_bytes', 5 * 1024 * 1024),
+            backup_count=config.get('log_backup_count', 3),
+            burst=config.get('log_burst', 5),
+            burst_interval=config.get('log_burst_interval', 10.0)
+        )
@@ -0,0 +1,211 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Tuple
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+
+def level_value(level) -> int:
+    """Level number of a level name ("info", "WARNING", ...) or number"""
+    if isinstance(level, str):
+        for value, name in LEVEL_NAMES.items():
+            if name == level.upper():
+                return value
+        raise ValueError(f"Unknown log level: {level}")
+    return int(level)
+
+
+class RateLimiter(logging.Filter):
+    def __init__(self, burst: int = 5, interval: float = 10.0, max_keys: int = 1000):
+        """
+        Lets at most burst identical records through per interval (seconds)
+
+        A reconnect loop or a broken sensor repeats the same error at the frame rate, the
+        repetitions are counted instead. The count is attached to the next identical record let
+        through, counts of messages that do not come again are taken with expired() or pending()
+        """
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.max_keys = max_keys
+        self.windows: Dict[Tuple, list] = {}  # key -> [window start, records in window, suppressed]
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if hasattr(record, "suppressed"):
+            # Report of suppressed repetitions
+            return True
+        key = (record.levelno, record.getMessage(), getattr(record, "error", None))
+        allowed, record.suppressed = self.check(key, record.created)
+        return allowed
+
+    def check(self, key: Tuple, now: float) -> Tuple[bool, int]:
+        """(allowed, repetitions suppressed since the last allowed record)"""
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                if window is None and len(self.windows) >= self.max_keys:
+                    self.prune()
+                self.windows[key] = [now, 1, 0]
+                return True, suppressed
+            if window[1] < self.burst:
+                window[1] += 1
+                suppressed, window[2] = window[2], 0
+                return True, suppressed
+            window[2] += 1
+            return False, 0
+
+    def expired(self, now: float) -> List[Tuple[Tuple, int]]:
+        """Forget the windows older than interval, (key, suppressed) of those with suppressed records"""
+        with self.lock:
+            ended = [key for key, window in self.windows.items() if now - window[0] >= self.interval]
+            return [(key, count) for key, count in
+                    ((key, self.windows.pop(key)[2]) for key in ended) if count]
+
+    def pending(self) -> List[Tuple[Tuple, int]]:
+        """(key, suppressed) of every window with suppressed records, all windows are forgotten"""
+        with self.lock:
+            windows, self.windows = self.windows, {}
+        return [(key, window[2]) for key, window in windows.items() if window[2]]
+
+    def prune(self):
+        """Forget the windows without suppressed records, distinct messages do not grow the table"""
+        self.windows = {key: window for key, window in self.windows.items() if window[2]}
+        if len(self.windows) >= self.max_keys:
+            self.windows.clear()
+
+
+class LogFormatter(logging.Formatter):
+    """<time>.<ms> <LEVEL>: <message>. Error: <error> (repeated <n> more times)"""
+    default_msec_format = "%s.%03d"
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        error = getattr(record, "error", None)
+        if error is not None:
+            line += f". Error: {error}"
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            line += f" (repeated {suppressed} more times)"
+        return line
+
+
+class LogQueueHandler(QueueHandler):
+    """QueueHandler which drops and counts records when the queue is full instead of reporting an error"""
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.reported = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped != self.reported:
+            dropped, self.reported = self.dropped - self.reported, self.dropped
+            try:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    "levelno": WARNING, "levelname": LEVEL_NAMES[WARNING],
+                    "msg": f"{dropped} log messages dropped, queue full"
+                }))
+            except queue.Full:
+                pass
+
+
+class LogQueueListener(QueueListener):
+    """QueueListener whose stop() waits for room in a full queue instead of raising"""
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class LogFileHandler(RotatingFileHandler):
+    """RotatingFileHandler counting the records it wrote"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.written = 0
+
+    def emit(self, record: logging.LogRecord):
+        super().emit(record)
+        self.written += 1
+
+
+class LogWriter:
+    def __init__(self, path: str, level: int = INFO, max_bytes: int = 5 * 1024 * 1024, backup_count: int = 3,
+                 queue_size: int = 10000, burst: int = 5, burst_interval: float = 10.0,
+                 name: str = "embedded_device"):
+        """
+        Log file written by a QueueListener thread
+
+        log() only queues the record, the acquisition loop and the UI thread never wait for the
+        disk. The file is appended to and rotated to path.1 ... path.<backup_count> when it grows
+        beyond max_bytes (no rotation when either is 0). Records are dropped (and counted) when
+        the queue is full. Suppressed repetitions of messages which do not come again are written
+        once their window ended (checked on the next record) and by close()
+        """
+        self.rate_limiter = RateLimiter(burst, burst_interval)
+        self.next_sweep = time.time() + burst_interval
+        self.file_handler = LogFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                           encoding="utf-8", delay=True)
+        self.file_handler.setFormatter(LogFormatter())
+        self.queue_handler = LogQueueHandler(queue.Queue(maxsize=queue_size))
+        self.queue_handler.addFilter(self.rate_limiter)
+        self.listener = LogQueueListener(self.queue_handler.queue, self.file_handler)
+
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(level)
+        self.logger.propagate = False
+        self.logger.addHandler(self.queue_handler)
+        self.closed = False
+        self.listener.start()
+        atexit.register(self.close)
+
+    @property
+    def written(self) -> int:
+        return self.file_handler.written
+
+    @property
+    def dropped(self) -> int:
+        return self.queue_handler.dropped
+
+    def log(self, level: int, message: str, error=None):
+        """Queue a record, never blocks"""
+        if self.closed:
+            return
+        now = time.time()
+        if now >= self.next_sweep:
+            self.next_sweep = now + self.rate_limiter.interval
+            self.__report_suppressed(self.rate_limiter.expired(now))
+        self.logger.log(level, message, extra={"error": None if error is None else str(error)})
+
+    def close(self):
+        """Write the suppressed counts and the queued records, and close the file"""
+        if self.closed:
+            return
+        self.closed = True
+        atexit.unregister(self.close)
+        self.__report_suppressed(self.rate_limiter.pending())
+        self.logger.removeHandler(self.queue_handler)
+        self.listener.stop()
+        self.file_handler.close()
+
+    def __report_suppressed(self, counts: List[Tuple[Tuple, int]]):
+        for (level, message, error), suppressed in counts:
+            if self.logger.isEnabledFor(level):
+                self.queue_handler.handle(self.logger.makeRecord(
+                    self.logger.name, level, "", 0, message, None, None,
+                    extra={"error": error, "suppressed": suppressed}
+                ))
@@ -0,0 +1,65 @@
+from typing import List
+
+from diagnostics.metrics_server import MetricsServer
+from thermal_common.sampling_profiler import SamplingProfiler
+from app_configuration.app_configs import AppConfigs
+from app_configuration.log_writer import WARNING
+
+
+class ClientDiagnostics:
+    def __init__(self, appConfigs: AppConfigs, producers: List):
+        """
+        Metrics endpoint and sampling profiler of the client, both off unless configured
+
+        metrics_port serves the diagnostics() of every producer on metrics_host (default localhost),
+        profiler_interval (seconds) samples the stacks of all threads, the collapsed stacks are served
+        at /profile and written to profile_path when the client stops
+        """
+        self.appConfigs = appConfigs
+        self.producers = producers
+        config = self.appConfigs.config or {}
+        self.host = config.get('metrics_host', '127.0.0.1')
+        self.port = config.get('metrics_port')
+        self.profile_path = config.get('profile_path')
+        interval = config.get('profiler_interval')
+        self.profiler = SamplingProfiler(interval) if interval else None
+        self.server = None
+
+    def snapshot(self) -> dict:
+        log_writer = self.appConfigs.log_writer
+        snapshot = {
+            "endpoints": {producer.name: producer.diagnostics() for producer in self.producers},
+            "log": {"written": log_writer.written, "dropped": log_writer.dropped},
+        }
+        if self.profiler is not None:
+            snapshot["profile"] = {
+                "samples": self.profiler.samples,
+                "top": {function: share for function, share in self.profiler.top(10)},
+            }
+        return snapshot
+
+    def start(self):
+        if self.profiler is not None:
+            self.profiler.start()
+            self.appConfigs.logging(f"Sampling profiler started, interval {self.profiler.interval} s")
+        if self.port is None:
+            return
+        try:
+            self.server = MetricsServer(self.snapshot, self.host, self.port, self.profiler)
+        except OSError as e:
+            self.appConfigs.logging(f"Metrics endpoint on port {self.port} not available", e, level=WARNING)
+            print(f"Metrics endpoint on port {self.port} not available: {e}")
+            return
+        self.server.start()
+        self.appConfigs.logging(f"Metrics served at http://{self.host}:{self.server.port}/metrics")
+        print(f"Metrics served at http://{self.host}:{self.server.port}/metrics")
+
+    def stop(self):
+        if self.server is not None:
+            self.server.stop()
+            self.server = None
+        if self.profiler is not None:
+            self.profiler.stop()
+            if self.profile_path:
+                self.profiler.save(self.profile_path)
+                self.appConfigs.logging(f"Profile of {self.profiler.samples} samples written to {self.profile_path}")
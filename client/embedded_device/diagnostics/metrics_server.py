@@ -0,0 +1,81 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+from thermal_common.sampling_profiler import SamplingProfiler
+
+
+def flatten(values: dict, prefix: str = ""):
+    """("a.b.c", value) pairs of the scalar leaves of nested dicts"""
+    for key, value in values.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            yield from flatten(value, name)
+        else:
+            yield name, value
+
+
+class MetricsServer:
+    def __init__(self, snapshot: Callable[[], dict], host: str = "127.0.0.1", port: int = 8765,
+                 profiler: Optional[SamplingProfiler] = None):
+        """
+        Local HTTP endpoint serving the client metrics
+
+            /metrics       snapshot() as JSON
+            /metrics.txt   one "name value" line per metric
+            /profile       collapsed stacks of the sampling profiler (when enabled)
+
+        Requests are answered on their own threads, snapshot() must be safe to call from them.
+        Binds to localhost by default, the metrics are not meant to leave the device
+        """
+        self.snapshot = snapshot
+        self.profiler = profiler
+        self.httpd = ThreadingHTTPServer((host, port), self.__handler())
+        self.httpd.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-server", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path in ("/", "/metrics"):
+                    self.reply(json.dumps(server.snapshot(), default=str), "application/json")
+                elif path == "/metrics.txt":
+                    lines = (f"{name} {value}\n" for name, value in flatten(server.snapshot()))
+                    self.reply("".join(lines), "text/plain")
+                elif path == "/profile" and server.profiler is not None:
+                    self.reply(server.profiler.collapsed(), "text/plain")
+                else:
+                    self.send_error(404)
+
+            def reply(self, body: str, content_type: str):
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                # Requests are not logged, a dashboard polling every second would flood the log
+                pass
+
+        return Handler
@@ -0,0 +1,104 @@
+"""
+Headless client: runs the Producer without Qt and publishes the frames to local processes
+through a shared memory ring (multithreading.shared_ring), so several analysis processes share
+one OPC UA session.
+
+    python headless.py [--name thermal_frames] [--slots 8] [--no-rendered] [--replace]
+
+Readers attach with SharedFrameReader(name). PySide6 is not imported in this mode.
+"""
+import argparse
+import signal
+import threading
+import time
+
+from multithreading.buffer import CircularBuffer
+from multithreading.producer import Producer
+from multithreading.shared_ring import SharedFrameRing
+from diagnostics.client_diagnostics import ClientDiagnostics
+from app_configuration.app_configs import AppConfigs
+
+
+class HeadlessPublisher:
+    def __init__(self, appConfigs: AppConfigs, name: str, slots: int, rendered: bool = True,
+                 status_interval: float = 10.0, replace: bool = False):
+        """
+        Copy every frame committed by the producer into the shared memory ring
+
+        Like the QML viewer it is the only reader of the producer buffer, frames committed
+        while a copy is in progress are skipped and counted by the buffer
+        """
+        self.appConfigs = appConfigs
+        self.buffer = CircularBuffer(buffer_size=30)
+        self.producer = Producer(self.buffer, appConfigs)
+        self.diagnostics = ClientDiagnostics(appConfigs, [self.producer])
+        self.ring = SharedFrameRing(
+            name, slots, frame_shape=self.buffer.frames.shape[1:],
+            render_shape=self.buffer.rendered.shape[1:3] if rendered else None, replace=replace
+        )
+        self.rendered = rendered
+        self.status_interval = status_interval
+        self.published = 0
+        self.running = False
+        self.producer_thread = None
+
+    def run(self):
+        """Publish until stop() is called (or the producer thread ends)"""
+        self.running = True
+        self.producer_thread = threading.Thread(target=self.producer.start, name="producer", daemon=True)
+        self.producer_thread.start()
+        self.diagnostics.start()
+        self.appConfigs.logging(f"Publishing frames to shared memory {self.ring.name}")
+        print(f"Publishing frames to shared memory {self.ring.name}")
+
+        last_status = time.monotonic()
+        try:
+            while self.running and self.producer_thread.is_alive():
+                slot = self.buffer.wait_for_frame(timeout=0.5)
+                if slot is not None:
+                    self.ring.put(slot.frame, slot.sequence, slot.timestamp, slot.rendered if self.rendered else None)
+                    self.producer.displayed(slot)
+                    self.published += 1
+
+                now = time.monotonic()
+                if self.status_interval and now - last_status >= self.status_interval:
+                    last_status = now
+                    print(f"Published {self.published} frames, skipped {self.buffer.skipped}, "
+                          f"{self.producer.frame_counter.as_dict()}")
+        finally:
+            self.producer.stop()
+            self.producer_thread.join(timeout=2.0)
+            self.ring.close()
+            self.diagnostics.stop()
+            self.appConfigs.logging(f"Headless client stopped after {self.published} frames")
+            print(f"Headless client stopped after {self.published} frames")
+            self.appConfigs.close()
+
+    def stop(self, *args):
+        self.running = False
+
+
+def main():
+    appConfigs = AppConfigs()
+    config = appConfigs.config or {}
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--name", default=config.get('shared_memory_name', 'thermal_frames'),
+                        help="Name of the shared memory block")
+    parser.add_argument("--slots", type=int, default=config.get('shared_memory_slots', 8),
+                        help="Frames kept in the ring")
+    parser.add_argument("--no-rendered", dest="rendered", action="store_false",
+                        default=config.get('shared_memory_rendered', True),
+                        help="Publish only the raw temperatures, not the heatmaps")
+    parser.add_argument("--replace", action="store_true",
+                        help="Take over the shared memory block even if another headless client writes it")
+    args = parser.parse_args()
+
+    publisher = HeadlessPublisher(appConfigs, args.name, args.slots, args.rendered, replace=args.replace)
+    signal.signal(signal.SIGINT, publisher.stop)
+    signal.signal(signal.SIGTERM, publisher.stop)
+    publisher.run()
+
+
+if __name__ == "__main__":
+    main()
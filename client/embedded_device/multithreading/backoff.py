@@ -0,0 +1,37 @@
+import math
+import random
+
+
+class Backoff:
+    def __init__(self, initial: float = 0.05, maximum: float = 2.0, factor: float = 2.0, jitter: float = 0.5):
+        """
+        Reconnect delays growing exponentially from initial (seconds) up to maximum
+
+        Every delay is randomized by +-jitter (relative), so clients losing a server at the same
+        time do not reconnect in lockstep
+        """
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.attempts = 0
+        # attempts stops growing once the delay reached maximum, the exponent stays bounded on long outages
+        if initial > 0 and maximum > initial and factor > 1:
+            self.max_attempts = math.ceil(math.log(maximum / initial, factor))
+        else:
+            self.max_attempts = 0
+
+    @property
+    def growth(self) -> float:
+        """factor ** attempts, the growth of the delays so far, stops once the delay reached maximum"""
+        return self.factor ** self.attempts
+
+    def next(self) -> float:
+        """Delay before the next attempt"""
+        delay = min(self.initial * self.growth, self.maximum)
+        if self.attempts < self.max_attempts:
+            self.attempts += 1
+        return delay * random.uniform(1.0 - self.jitter, 1.0 + self.jitter)
+
+    def reset(self):
+        self.attempts = 0
@@ -1,99 +1,178 @@
 import threading
-from collections import deque
-from typing import Any, List
+import time
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class FrameSlot(NamedTuple):
+    """A committed frame in the buffer, frame and rendered are views on the preallocated slot"""
+    index: int
+    sequence: int
+    timestamp: float
+    frame: np.ndarray
+    rendered: Optional[np.ndarray]
+    committed: float = 0.0  # time.perf_counter() of the commit
+
 
 class CircularBuffer:
-    def __init__(self, buffer_size: int = 10):
+    def __init__(self, buffer_size: int = 10, frame_shape: Tuple[int, int] = (24, 32),
+                 render_shape: Optional[Tuple[int, int]] = None):
         """
-        Initialize a thread-safe circular buffer with a fixed maximum size
+        Initialize a preallocated frame ring for one writer and one reader
 
+        Raw frames are stored in a single (N, rows, cols) float32 block and rendered
+        heatmaps in an optional (N, H, W, 3) uint8 block, so streaming does not allocate.
+        The reader always gets the newest frame, older unread frames are skipped
         """
-        self.buffer = deque(maxlen=buffer_size)  # Fixed-size buffer
-        self.lock = threading.Lock()
-        self.is_filled = threading.Event()  # Event to signal when buffer is full
+        if buffer_size < 2:
+            raise ValueError("buffer_size must be at least 2")
         self.buffer_size = buffer_size  # Store buffer size for reference
-    
-    def put(self, item: Any) -> bool:
-        """
-        Add an item to the buffer, overwriting oldest if full
-        """
-        with self.lock:
-            was_full = len(self.buffer) == self.buffer.maxlen
-            self.buffer.append(item)  # Automatically removes oldest if full
-            
-            if not was_full and len(self.buffer) == self.buffer.maxlen:
-                self.is_filled.set()  # Signal that buffer is filled
-            
-            return True
-    
-    def get(self) -> Any:
-        """
-        Remove and return an item from the buffer
-        """
-        with self.lock:
-            if self.buffer:
-                item = self.buffer.popleft()
-                
-                # Optional: Clear filled flag if buffer is no longer full
-                if len(self.buffer) < self.buffer.maxlen:
-                    self.is_filled.clear()
-                
-                return item
-            return None
-    
-    def get_all(self) -> List[Any]:
+        self.frames = np.zeros((buffer_size,) + tuple(frame_shape), dtype=np.float32)
+        self.rendered = None
+        self.sequences = np.full(buffer_size, -1, dtype=np.int64)
+        self.timestamps = np.zeros(buffer_size, dtype=np.float64)
+        self.commit_times = np.zeros(buffer_size, dtype=np.float64)
+        self.condition = threading.Condition()
+
+        self.write_count = 0  # Frames committed since start
+        self.read_count = 0  # Value of write_count when the reader last took a frame
+        self.reads = 0  # Frames taken by the reader
+        self.latest_index = -1
+        self.skipped = 0  # Frames overwritten or superseded before they were read
+
+        if render_shape is not None:
+            self.set_render_shape(render_shape)
+
+    def set_render_shape(self, render_shape: Tuple[int, int]):
+        """
+        (Re)allocate the rendered heatmap slots, only when the shape changes
+        """
+        shape = (self.buffer_size,) + tuple(render_shape[:2]) + (3,)
+        with self.condition:
+            if self.rendered is None or self.rendered.shape != shape:
+                self.rendered = np.zeros(shape, dtype=np.uint8)
+
+    def reserve(self) -> int:
+        """
+        Return the index of the slot the writer should fill next
+
+        The slot is never the newest committed frame, so the reader keeps a stable view of it
+        """
+        return self.write_count % self.buffer_size
+
+    def commit(self, index: int, sequence: Optional[int] = None, timestamp: Optional[float] = None) -> int:
+        """
+        Publish a filled slot as the newest frame and wake up waiting readers
+        """
+        with self.condition:
+            if sequence is None:
+                sequence = self.write_count
+            self.sequences[index] = sequence
+            self.timestamps[index] = time.time() if timestamp is None else timestamp
+            self.commit_times[index] = time.perf_counter()
+            self.latest_index = index
+            self.write_count += 1
+            self.condition.notify_all()
+            return sequence
+
+    def put(self, frame: np.ndarray, sequence: Optional[int] = None, timestamp: Optional[float] = None,
+            rendered: Optional[np.ndarray] = None) -> int:
+        """
+        Copy a frame (and optionally its heatmap) into the next slot and commit it
         """
-        Get all items from the buffer and clear it
+        index = self.reserve()
+        np.copyto(self.frames[index], frame)
+        if rendered is not None and self.rendered is not None:
+            np.copyto(self.rendered[index], rendered)
+        return self.commit(index, sequence, timestamp)
 
+    def latest(self) -> Optional[FrameSlot]:
         """
-        with self.lock:
-            items = list(self.buffer)
-            self.buffer.clear()
-            self.is_filled.clear()
-        return items
-    
-    def peek_all(self) -> List[Any]:
+        Return the newest frame without marking it as read
         """
-        Get all items from the buffer without removing them
-        
+        with self.condition:
+            return self.__slot(self.latest_index)
+
+    def get(self) -> Optional[FrameSlot]:
+        """
+        Return the newest frame if it has not been read yet, skipping stale ones
+        """
+        with self.condition:
+            return self.__take_newest()
+
+    def wait_for_frame(self, timeout: float = None) -> Optional[FrameSlot]:
+        """
+        Block until a frame newer than the last one read is available or timeout occurs
         """
-        with self.lock:
-            return list(self.buffer)
-    
+        with self.condition:
+            self.condition.wait_for(self.__has_new_frame, timeout)
+            return self.__take_newest()
+
     def empty(self) -> bool:
         """
-        Check if the buffer is empty
+        Check if there is no unread frame
 
         """
-        with self.lock:
-            return len(self.buffer) == 0
-        
+        with self.condition:
+            return not self.__has_new_frame()
+
     def full(self) -> bool:
         """
-        Check if the buffer is full
-        
+        Check if every slot holds a frame
+
         """
-        with self.lock:
-            return len(self.buffer) == self.buffer.maxlen
-    
+        with self.condition:
+            return self.write_count >= self.buffer_size
+
     def qsize(self) -> int:
         """
-        Return the current size of the buffer
+        Return the number of committed frames held in the ring
 
         """
-        with self.lock:
-            return len(self.buffer)
-    
-    def wait_until_filled(self, timeout: float = None) -> bool:
+        with self.condition:
+            return min(self.write_count, self.buffer_size)
+
+    def stats(self) -> dict:
         """
-        Wait until the buffer is filled or timeout occurs
-        
+        Return the commit, read and skip counters and the frames committed but not read yet
+
         """
-        return self.is_filled.wait(timeout)
-    
-    def is_buffer_filled(self) -> bool:
+        with self.condition:
+            return {
+                "size": self.buffer_size,
+                "committed": self.write_count,
+                "read": self.reads,
+                "unread": min(self.write_count - self.read_count, self.buffer_size),
+                "skipped": self.skipped,
+            }
+
+    def clear(self):
         """
-        Check if buffer has been filled to capacity
- 
+        Forget all frames, the preallocated slots are kept
         """
-        return self.is_filled.is_set()
\ No newline at end of file
+        with self.condition:
+            self.sequences.fill(-1)
+            self.write_count = 0
+            self.read_count = 0
+            self.reads = 0
+            self.latest_index = -1
+            self.skipped = 0
+
+    def __has_new_frame(self) -> bool:
+        return self.write_count > self.read_count
+
+    def __take_newest(self) -> Optional[FrameSlot]:
+        if not self.__has_new_frame():
+            return None
+        self.skipped += self.write_count - self.read_count - 1
+        self.read_count = self.write_count
+        self.reads += 1
+        return self.__slot(self.latest_index)
+
+    def __slot(self, index: int) -> Optional[FrameSlot]:
+        if index < 0:
+            return None
+        rendered = self.rendered[index] if self.rendered is not None else None
+        return FrameSlot(index, int(self.sequences[index]), float(self.timestamps[index]),
+                         self.frames[index], rendered, float(self.commit_times[index]))
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from multithreading.buffer import CircularBuffer
+from multithreading.producer import Producer
+from multithreading.session_pool import SessionPool
+from app_configuration.app_configs import AppConfigs
+from app_configuration.log_writer import DEBUG, ERROR
+
+
+class MultiProducer:
+    def __init__(self, appConfigs: AppConfigs, endpoints: Optional[List[dict]] = None, buffer_size: int = 8):
+        """
+        Acquisition of many sensor streams on one event loop thread
+
+        Every entry of endpoints (default: "endpoints" of the config file) gets its own Producer,
+        frame buffer, reconnect state and health counters; its keys override the config file
+        (opcua_server, sensor, delivery_mode, scale_factor, ...). Endpoints on the same server
+        share one OPC UA session. Rendering runs on the loop unless an endpoint sets render_workers
+        """
+        self.appConfigs = appConfigs
+        config = self.appConfigs.config or {}
+        endpoints = endpoints if endpoints is not None else config.get('endpoints', [])
+        self.session_pool = SessionPool(
+            appConfigs,
+            request_timeout=config.get('request_timeout', 4.0),
+            connect_timeout=config.get('connect_timeout', 4.0)
+        )
+        self.producers: List[Producer] = [
+            Producer(
+                CircularBuffer(buffer_size=buffer_size),
+                appConfigs,
+                endpoint={'render_workers': 0, **endpoint},
+                session_pool=self.session_pool
+            )
+            for endpoint in endpoints
+        ]
+        self.health_interval = config.get('health_interval', 30)
+        self.running = False
+        self._loop = None
+
+    @property
+    def current_colormap(self):
+        return self.producers[0].current_colormap if self.producers else None
+
+    @current_colormap.setter
+    def current_colormap(self, colormap):
+        for producer in self.producers:
+            producer.current_colormap = colormap
+
+    def start(self):
+        """Run every endpoint until stop() is called"""
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+
+        try:
+            self.running = True
+            for producer in self.producers:
+                producer.running = True
+                producer.start_pipeline()
+                producer.start_recording()
+            self._loop.run_until_complete(asyncio.gather(
+                *(producer.fetch_thermal_data() for producer in self.producers),
+                self.monitor_health()
+            ))
+        except Exception as e:
+            self.appConfigs.logging(f"Multi producer error: {e}", level=ERROR)
+            print(f"Multi producer error: {e}")
+        finally:
+            for producer in self.producers:
+                if producer.client or producer.closing:
+                    self._loop.run_until_complete(producer.disconnect())
+                producer.stop_pipeline()
+                producer.stop_recording()
+            self._loop.run_until_complete(self.session_pool.close())
+            self._loop.close()
+            self._loop = None
+            self.appConfigs.logging("Multi producer thread completed")
+            print("Multi producer thread completed")
+
+    async def monitor_health(self):
+        """Log the health of every endpoint every health_interval seconds"""
+        next_report = time.monotonic() + self.health_interval
+        while self.running:
+            await asyncio.sleep(0.5)
+            if not self.health_interval or time.monotonic() < next_report:
+                continue
+            next_report += self.health_interval
+            for name, health in self.health(reset_max=True).items():
+                self.appConfigs.logging(f"Endpoint {name}: {health}", level=DEBUG)
+
+    def health(self, reset_max: bool = False) -> Dict[str, dict]:
+        """Connection, frame and latency metrics of every endpoint, reset_max starts a new latency_max window"""
+        return {
+            producer.name: {
+                "connected": producer.connected,
+                "server": producer.server_url,
+                "frame_rate": producer.frame_rate,
+                "round_trip_ms": 1000 * producer.round_trip_time if producer.round_trip_time is not None else None,
+                **producer.frame_counter.as_dict(),
+                **producer.health.snapshot(reset_max),
+            }
+            for producer in self.producers
+        }
+
+    def stop(self):
+        """Stop every endpoint"""
+        self.running = False
+        for producer in self.producers:
+            producer.running = False
+        self.appConfigs.logging("Multi producer stop requested...")
+        print("Multi producer stop requested...")
@@ -0,0 +1,199 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+import numpy as np
+
+from thermal_common.stage_metrics import StageMetrics
+
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+BACKPRESSURE_POLICIES = (DROP_OLDEST, BLOCK)
+
+
+class RenderPipeline:
+    def __init__(self, render: Callable, commit: Callable, make_renderer: Callable, span,
+                 buffer_size: int, workers: int = 2, queue_size: int = 4, policy: str = DROP_OLDEST,
+                 block_timeout: float = 1.0, on_error: Optional[Callable] = None,
+                 metrics: Optional[StageMetrics] = None):
+        """
+        Hand-off between the acquisition stage (asyncio loop) and a pool of render threads
+
+        Frames wait in a bounded queue, when it is full the oldest frame is dropped (drop_oldest)
+        or the acquisition stage waits up to block_timeout for a free place (block): on the asyncio
+        loop through put(), which waits in an executor, from other threads through submit().
+        Workers render in parallel into their own buffer slot (OpenCV and numpy release the GIL)
+        and commit strictly in the order the frames were submitted. With metrics (StageMetrics)
+        the time every frame waited in the queue is recorded as the handoff stage
+        """
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        # Slots in flight must never reach the newest committed frame or the one being displayed
+        if workers < 1 or workers > buffer_size - 2:
+            raise ValueError(f"workers must be between 1 and {buffer_size - 2}")
+
+        self.render = render  # render(renderer, frame, index, span)
+        self.commit = commit  # commit(index, sequence, timestamp)
+        self.make_renderer = make_renderer
+        self.span = span
+        self.buffer_size = buffer_size
+        self.workers = workers
+        self.queue = deque()
+        self.queue_size = queue_size
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.on_error = on_error
+        self.metrics = metrics
+
+        self.condition = threading.Condition()
+        self.put_lock = None  # asyncio.Lock of put(), created on the loop
+        self.running = False
+        self.threads = []
+
+        self.next_ticket = 0  # Order in which frames left the queue
+        self.committed_ticket = 0  # Next ticket allowed to commit
+        self.next_slot = 0
+
+        # Counters
+        self.submitted = 0
+        self.dropped = 0
+        self.rendered = 0
+        self.failed = 0
+
+    def start(self):
+        """Start the render workers"""
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+            # Tickets of frames discarded by a previous stop() are never committed
+            self.next_ticket = 0
+            self.committed_ticket = 0
+        self.threads = [
+            threading.Thread(target=self.__work, name=f"render-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Stop the workers, queued frames are discarded"""
+        with self.condition:
+            self.running = False
+            self.queue.clear()
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def submit(self, frame: np.ndarray, sequence: Optional[int] = None, timestamp: Optional[float] = None) -> bool:
+        """
+        Queue a frame for rendering, returns False if it was dropped.
+        The block policy waits on the calling thread, use put() on the asyncio loop
+        """
+        with self.condition:
+            if not self.running:
+                return False
+
+            if len(self.queue) >= self.queue_size:
+                if self.policy == BLOCK:
+                    self.condition.wait_for(
+                        lambda: len(self.queue) < self.queue_size or not self.running, self.block_timeout
+                    )
+                if len(self.queue) >= self.queue_size or not self.running:
+                    if self.policy == BLOCK:
+                        self.dropped += 1
+                        return False
+                    self.queue.popleft()
+                    self.dropped += 1
+
+            self.queue.append((frame, sequence, timestamp, time.perf_counter()))
+            self.submitted += 1
+            self.condition.notify_all()
+            return True
+
+    async def put(self, frame: np.ndarray, sequence: Optional[int] = None, timestamp: Optional[float] = None) -> bool:
+        """
+        submit() for the asyncio loop: with the block policy a full queue is waited for in an executor,
+        frames are queued in the order of the put() calls
+        """
+        if self.policy != BLOCK:
+            return self.submit(frame, sequence, timestamp)
+        if self.put_lock is None:
+            self.put_lock = asyncio.Lock()
+        async with self.put_lock:
+            with self.condition:
+                full = len(self.queue) >= self.queue_size
+            if not full:
+                return self.submit(frame, sequence, timestamp)
+            return await asyncio.get_running_loop().run_in_executor(None, self.submit, frame, sequence, timestamp)
+
+    def qsize(self) -> int:
+        with self.condition:
+            return len(self.queue)
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {
+                "submitted": self.submitted,
+                "dropped": self.dropped,
+                "rendered": self.rendered,
+                "failed": self.failed,
+                "queued": len(self.queue),
+            }
+
+    def __take(self):
+        """Dequeue the oldest frame and give it a ticket, a slot and its span, in submission order"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.queue or not self.running)
+            if not self.running:
+                return None
+
+            frame, sequence, timestamp, queued = self.queue.popleft()
+            if self.metrics is not None:
+                self.metrics.since("handoff", queued)
+            ticket = self.next_ticket
+            self.next_ticket += 1
+            index = self.next_slot % self.buffer_size
+            self.next_slot += 1
+            # Auto-ranging has memory, update it in frame order
+            span = self.span.update_frame(frame)
+            self.condition.notify_all()
+            return ticket, index, span, frame, sequence, timestamp
+
+    def __work(self):
+        renderer = self.make_renderer()
+        while True:
+            task = self.__take()
+            if task is None:
+                return
+            ticket, index, span, frame, sequence, timestamp = task
+
+            try:
+                self.render(renderer, frame, index, span)
+                ok = True
+            except Exception as e:
+                ok = False
+                if self.on_error is not None:
+                    self.on_error(e)
+
+            with self.condition:
+                self.condition.wait_for(lambda: self.committed_ticket == ticket or not self.running)
+                if not self.running:
+                    return
+                # The next tickets wait for this one, it advances even when the commit fails
+                try:
+                    if ok:
+                        self.commit(index, sequence, timestamp)
+                        self.rendered += 1
+                    else:
+                        self.failed += 1
+                except Exception as e:
+                    self.failed += 1
+                    if self.on_error is not None:
+                        self.on_error(e)
+                finally:
+                    self.committed_ticket += 1
+                    self.condition.notify_all()
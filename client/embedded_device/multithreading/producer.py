@@ -1,124 +1,539 @@
 import asyncio
 import time
+from typing import Optional
+
 import numpy as np
 import cv2
 import asyncua
+from asyncua import ua
 import logging
+from thermal_common.alarm_engine import AlarmEngine
+from thermal_common.frame_codec import FORMAT_TILES, FrameDecoder, decode_batch
+from thermal_common.frame_filter import FrameFilter
+from thermal_common.stage_metrics import StageMetrics
 
+from multithreading.backoff import Backoff
 from multithreading.buffer import CircularBuffer
+from multithreading.pipeline import RenderPipeline, DROP_OLDEST
+from multithreading.session_pool import SessionPool, open_session
 from app_configuration.app_configs import AppConfigs
+from app_configuration.log_writer import WARNING, ERROR
+from processing.renderer import ThermalRenderer, TemperatureSpan
+from recording.replay import ReplaySource
+from recording.stream_file import StreamRecorder, StreamRecording
+
+# Status code bits set by the server when a monitored item queue overflowed
+STATUS_INFOTYPE_DATAVALUE = 0x00000400
+STATUS_OVERFLOW = 0x00000080
+
+# Read errors after which the session is kept if it is still alive
+TRANSIENT_STATUS_CODES = {
+    ua.StatusCodes.BadTimeout,
+    ua.StatusCodes.BadRequestTimeout,
+    ua.StatusCodes.BadTooManyOperations,
+    ua.StatusCodes.BadResourceUnavailable,
+    ua.StatusCodes.BadServerTooBusy,
+    ua.StatusCodes.BadTcpServerTooBusy,
+}
+# Stage durations recorded for every frame: sensor timestamp to receive (server publish and network,
+# across the two clocks), decode, noise filter, the three render steps, wait in the render queue, wait in the
+# buffer until the reader takes it, and sensor timestamp to display
+PIPELINE_STAGES = ("transit", "decode", "filter", "normalize", "resize", "colormap", "handoff", "display", "end_to_end")
+
+# Without alarm_zones the whole frame raises an alarm above 100 degrees, the former viewer warning
+DEFAULT_ALARM_ZONES = [{"name": "Temperature", "high": 100.0, "hysteresis": 0.0, "debounce": 1}]
+
+# Read errors meaning the cached NodeIds are not valid anymore (server restarted with another address space)
+UNKNOWN_NODE_STATUS_CODES = {ua.StatusCodes.BadNodeIdUnknown, ua.StatusCodes.BadNodeIdInvalid}
+
+
+def status_code(error):
+    return error.code if isinstance(error, ua.UaStatusCodeError) else None
+
+
+def is_transient(error):
+    """A request that failed without a sign that the connection is broken"""
+    return isinstance(error, asyncio.TimeoutError) or status_code(error) in TRANSIENT_STATUS_CODES
+
+
+class FrameCounter:
+    """Counts received, dropped and duplicated frames from sequence numbers or source timestamps"""
+    def __init__(self):
+        # Gaps in the source timestamps are counted as drops unless the server skips unchanged frames
+        self.count_gaps = True
+        self.reset()
+
+    def reset(self):
+        self.received = 0
+        self.dropped = 0
+        self.duplicated = 0
+        self.last_source_time = None
+        self.last_sequence = None
+        self.frame_interval = None
+
+    def observe(self, source_time, overflow=False, sequence=None):
+        """
+        Register a frame and return False if it was already delivered.
+        With a frame sequence number drops are exact, otherwise they are estimated
+        from gaps in the server source timestamps (unless count_gaps is off) and from queue overflows
+        """
+        if sequence is not None:
+            return self.observe_sequence(sequence)
+
+        if overflow:
+            self.dropped += 1
+
+        if source_time is None:
+            self.received += 1
+            return True
+
+        if self.last_source_time is not None:
+            gap = (source_time - self.last_source_time).total_seconds()
+            if gap <= 0:
+                self.duplicated += 1
+                return False
+
+            # Smallest gap seen so far is the best estimate of the server frame interval
+            if self.frame_interval is None or gap < self.frame_interval:
+                self.frame_interval = gap
+            missed = round(gap / self.frame_interval) - 1
+            if missed > 0 and self.count_gaps:
+                self.dropped += missed
+
+        self.last_source_time = source_time
+        self.received += 1
+        return True
+
+    def observe_sequence(self, sequence):
+        """Register a frame by its sequence number (uint32, wraps around)"""
+        if self.last_sequence is not None:
+            gap = (sequence - self.last_sequence) & 0xFFFFFFFF
+            if gap == 0:
+                self.duplicated += 1
+                return False
+            # Large gaps are a server restart, not lost frames
+            if gap < 0x80000000:
+                self.dropped += gap - 1
+
+        self.last_sequence = sequence
+        self.received += 1
+        return True
+
+    def as_dict(self):
+        return {
+            "received": self.received,
+            "dropped": self.dropped,
+            "duplicated": self.duplicated,
+        }
+
+
+class EndpointHealth:
+    """Connection state and frame latency of one endpoint, latency is source timestamp to processing"""
+    def __init__(self):
+        self.connects = 0
+        self.connection_losses = 0
+        self.transient_errors = 0
+        self.last_error = None
+        self.lost_time = None
+        self.reconnect_time = None  # seconds from the last connection loss to the reconnect
+        self.last_frame_time = None
+        self.latency = None  # seconds, moving average
+        self.latency_max = 0.0  # seconds, since the last snapshot
+
+    def connected(self):
+        self.connects += 1
+        if self.lost_time is not None:
+            self.reconnect_time = time.monotonic() - self.lost_time
+            self.lost_time = None
+
+    def lost(self, error=None):
+        self.connection_losses += 1
+        self.lost_time = time.monotonic()
+        if error is not None:
+            self.last_error = str(error)
+
+    def transient(self, error):
+        self.transient_errors += 1
+        self.last_error = str(error)
+
+    def failed(self, error):
+        self.last_error = str(error)
+
+    def frame(self, timestamp=None):
+        now = time.time()
+        self.last_frame_time = now
+        if timestamp is None:
+            return
+        latency = max(now - timestamp, 0.0)
+        self.latency = latency if self.latency is None else self.latency + 0.1 * (latency - self.latency)
+        self.latency_max = max(self.latency_max, latency)
+
+    def snapshot(self, reset_max=True):
+        """Counters since start, latency_max since the previous snapshot that reset it"""
+        snapshot = {
+            "connects": self.connects,
+            "connection_losses": self.connection_losses,
+            "transient_errors": self.transient_errors,
+            "reconnect_time": self.reconnect_time,
+            "last_error": self.last_error,
+            "frame_age": time.time() - self.last_frame_time if self.last_frame_time is not None else None,
+            "latency_ms": 1000 * self.latency if self.latency is not None else None,
+            "latency_max_ms": 1000 * self.latency_max,
+        }
+        if reset_max:
+            self.latency_max = 0.0
+        return snapshot
+
+
+class ThermalDataHandler:
+    """Subscription handler which forwards every ThermalData change to the producer"""
+    def __init__(self, producer, client):
+        self.producer = producer
+        self.client = client
+
+    async def datachange_notification(self, node, val, data):
+        # Late notifications of a session that was replaced are ignored
+        if self.client is not self.producer.client:
+            return
+        value = data.monitored_item.Value
+        status = value.StatusCode.value if value.StatusCode is not None else 0
+        overflow = (status & STATUS_INFOTYPE_DATAVALUE) != 0 and (status & STATUS_OVERFLOW) != 0
+        await self.producer.receive_value(val, value.SourceTimestamp or value.ServerTimestamp, overflow)
+
+    def status_change_notification(self, status):
+        if self.client is not self.producer.client:
+            return
+        self.producer.appConfigs.logging(f"Subscription status changed: {status}")
+        print(f"Subscription status changed: {status}")
+        self.producer.connection_lost(status)
+
 
 class Producer:
-    def __init__(self, buffer: CircularBuffer, appConfigs: AppConfigs):
+    def __init__(self, buffer: CircularBuffer, appConfigs: AppConfigs, endpoint: Optional[dict] = None,
+                 session_pool: Optional[SessionPool] = None):
+        """
+        Acquisition and rendering of one sensor stream into the buffer
+
+        endpoint holds settings overriding the config file for one endpoint of a MultiProducer
+        (opcua_server, sensor, ...), its session is then taken from the shared session_pool
+        """
         self.buffer = buffer
         self.running = False
         self.connected = False
-        self.reconnect_delay = 5  # seconds between reconnection attempts
         self.custom_ns_name = "BeagleBoneThermal"
         self.custom_ns_idx = None
         self.client = None
         self._loop = None
         self.appConfigs = appConfigs
-        self.scale_factor = 10
+        self.endpoint = endpoint or {}
+        self.session_pool = session_pool
+        self.session_lease = None
+        self.server_url = None
+        config = self.config(self.appConfigs.config)
+        self.name = self.endpoint.get('name') or config.get('sensor') or config.get('opcua_server')
+        self.scale_factor = config.get('scale_factor', 10)
         self.thermal_node = None
         self.last_thermal_data = None
         self.last_fetch_time = 0
         self.fetch_interval = 0.1  # Minimum time between fetches (seconds)
+
+        # Frame delivery: "subscription" or "polling" (fallback)
+        self.delivery_mode = "subscription"
+        self.publishing_interval = 30  # milliseconds
+        self.queue_size = 32
+        self.subscription = None
+        self.frame_counter = FrameCounter()
+        self.health = EndpointHealth()
+        self.metrics = StageMetrics(PIPELINE_STAGES, window=config.get('metrics_window', 1024))
+
+        # Reconnects: jittered exponential backoff from tens of milliseconds, the NodeIds resolved by the
+        # first connect are reused, sessions of lost connections are closed in the background
+        self.backoff = Backoff(
+            initial=config.get('reconnect_initial_delay', 0.05),
+            maximum=config.get('reconnect_max_delay', 2.0)
+        )
+        self.next_connect_time = 0
+        self.connected_since = None
+        self.request_timeout = config.get('request_timeout', 4.0)  # seconds, per OPC UA request
+        self.connect_timeout = config.get('connect_timeout', 4.0)  # seconds, whole connect sequence
+        self.connect_duration = None  # seconds, last successful connect
+        self.close_timeout = 1.0
+        self.max_transient_errors = config.get('max_transient_errors', 3)
+        self.transient_errors = 0  # consecutive, reset by a successful read
+        self.resolved = None
+        self.closing = set()
+
+        # Stream decoder, the tiles wire format needs the previous frames
+        self.frame_decoder = FrameDecoder()
+        self.keyframe_retry = 1.0  # seconds between keyframe requests while out of sync
+        self.last_keyframe_request = 0
+        self.polled_tiles = False  # tiles stream read by polling, single reads miss the deltas
+
+        # Batch reads when polling: ReadFrames returns every frame since the last one in one round trip.
+        # "auto" switches to it when more than one frame is published per poll, "on" always, "off" never
+        self.batch_mode = config.get('batch_mode', 'auto')
+        self.batching = False
+        self.sensor_node = None
+        self.read_frames_node = None
+        self.deadband_node = None
+        self.deadband_pixels_node = None
+        self.round_trip_time = None  # seconds, moving average
+        self.frame_rate = None  # frames/s published by the server, moving average
+        self.last_rate_sample = None
         
         # Default colormap (JET)
         self.current_colormap = cv2.COLORMAP_JET
 
+        # Heatmap rendering, temperature_span [low, high] fixes the colormap range, otherwise auto-ranged
+        # on the frame min/max or on the range_percentiles [low, high] of the frame
+        self.renderer = ThermalRenderer(
+            scale_factor=self.scale_factor,
+            span=TemperatureSpan(
+                fixed=config.get('temperature_span'),
+                hysteresis=config.get('span_hysteresis', 0.5),
+                percentiles=config.get('range_percentiles')
+            ),
+            metrics=self.metrics
+        )
+        self.buffer.set_render_shape(self.renderer.output_shape)
+
+        # Render stage: 0 workers renders inline on the acquisition loop
+        self.render_workers = config.get('render_workers', 2)
+        self.handoff_queue_size = config.get('handoff_queue_size', 4)
+        self.backpressure = config.get('backpressure', DROP_OLDEST)
+        self.pipeline = None
+
+        # Noise filter and dead-pixel correction before alarms and rendering, the filtered frames
+        # must outlive the render queue and the frames being rendered
+        self.frame_filter = None
+        try:
+            self.frame_filter = FrameFilter.from_config(config.get('frame_filter'), config.get('bad_pixels'),
+                                                        outputs=self.handoff_queue_size + self.render_workers + 1)
+        except (TypeError, ValueError) as e:
+            self.appConfigs.logging(f"Invalid frame filter ({self.name})", e)
+
+        # Raw frames are recorded to record_path, replay_path replaces the OPC UA server by a recording
+        self.record_path = config.get('record_path')
+        self.recorder = None
+        self.replay_path = config.get('replay_path')
+        self.replay_speed = config.get('replay_speed', 1.0)
+        self.replay_loop = config.get('replay_loop', False)
+        self.replay_source = None
+
+        # Alarm zones evaluated on every frame, listeners are called with every AlarmEvent on the producer thread
+        self.alarms = None
+        try:
+            self.alarms = AlarmEngine(config.get('alarm_zones') or DEFAULT_ALARM_ZONES,
+                                      rate_window=config.get('alarm_rate_window', 1.0))
+        except ValueError as e:
+            self.appConfigs.logging(f"Invalid alarm zones ({self.name})", e)
+        self.alarm_listeners = []
+        self.alarms_enabled = True  # the viewer's Temperature Warning switch
+
+        # Called without arguments on the committing thread (loop or render thread) for every new frame
+        self.frame_listeners = []
+
+    def config(self, config=None):
+        """Config file settings with the endpoint overrides applied"""
+        return {**(config or {}), **self.endpoint}
+
     async def connect(self):
         """Establish connection to OPC-UA server"""
         try:
-            config = self.appConfigs.load_config()
+            # Connection settings of a changed config file apply from the next connect
+            self.appConfigs.reload_if_changed()
+            config = self.config(self.appConfigs.config)
             server_url = config.get('opcua_server')
-            self.client = asyncua.Client(server_url)
-            await self.client.connect()
-            
-            ns_array = await self.client.get_namespace_array()
-            self.custom_ns_idx = next((idx for idx, ns in enumerate(ns_array) if ns == self.custom_ns_name), 2)
-            self.thermal_node = await self.client.nodes.objects.get_child([f"{self.custom_ns_idx}:ThermalData"])
-            
+            self.delivery_mode = config.get('delivery_mode', self.delivery_mode)
+            self.publishing_interval = config.get('publishing_interval_ms', self.publishing_interval)
+            self.queue_size = config.get('queue_size', self.queue_size)
+            self.server_url = server_url
+            start = time.monotonic()
+            timeout = self.connect_timeout
+            if self.connect_duration is not None:
+                # Reconnects to a server known to answer fast give up early and retry, growing with the backoff
+                timeout = min(self.connect_timeout, max(0.2, 5 * self.connect_duration) * self.backoff.growth)
+            if self.session_pool is not None:
+                self.session_lease = await self.session_pool.acquire(server_url, timeout)
+                self.client = self.session_lease.client
+            else:
+                self.client = await open_session(server_url, self.request_timeout, timeout)
+            self.connect_duration = time.monotonic() - start
+
+            await self.resolve_nodes(server_url, config.get('sensor'))
+            await self.read_deadband()
+            self.frame_decoder.reset()
+            self.polled_tiles = False
+            if self.frame_filter is not None:
+                self.frame_filter.reset()
+            self.reset_alarms()
+            self.transient_errors = 0
+
             self.connected = True
-            self.appConfigs.logging(f"Connected to OPC-UA server at {server_url}")
-            print(f"Connected to OPC-UA server at {server_url}")
+            self.connected_since = time.monotonic()
+            self.health.connected()
+            self.appConfigs.logging(f"Connected to OPC-UA server at {server_url} ({self.name})")
+            print(f"Connected to OPC-UA server at {server_url} ({self.name})")
+
+            if self.delivery_mode == "subscription":
+                await self.subscribe()
             return self.client
         except Exception as e:
-            self.appConfigs.logging(f"Connection error: {e}")
+            self.appConfigs.logging(f"Connection error ({self.name}): {e}", level=ERROR)
+            self.health.failed(e)
             self.connected = False
+            self.drop_session()
+            self.next_connect_time = time.monotonic() + self.backoff.next()
             return None
 
+    async def resolve_nodes(self, server_url, sensor):
+        """
+        Find the ThermalData node, its sensor object and ReadFrames method
+
+        The NodeIds found by the first connect are reused on reconnects to the same server, one read of
+        their browse names checks them instead of reading the namespaces and browsing again
+        """
+        key = (server_url, sensor)
+        if self.resolved is not None and self.resolved["key"] == key:
+            names = self.resolved["names"]
+            nodes = {attribute: self.client.get_node(nodeid) for attribute, nodeid in self.resolved["nodeids"].items()}
+            values = await self.client.read_attributes(list(nodes.values()), ua.AttributeIds.BrowseName)
+            if all(value.StatusCode.is_good() and value.Value.Value == names[attribute]
+                   for attribute, value in zip(nodes, values)):
+                self.custom_ns_idx = self.resolved["ns_idx"]
+                self.thermal_node = nodes["thermal_node"]
+                self.sensor_node = nodes.get("sensor_node")
+                self.read_frames_node = nodes.get("read_frames_node")
+                self.deadband_node = nodes.get("deadband_node")
+                self.deadband_pixels_node = nodes.get("deadband_pixels_node")
+                self.batching = False
+                return
+            self.appConfigs.logging(f"Cached nodes of {self.name} changed, browsing again", level=WARNING)
+
+        ns_array = await self.client.get_namespace_array()
+        self.custom_ns_idx = next((idx for idx, ns in enumerate(ns_array) if ns == self.custom_ns_name), 2)
+        # Objects/<sensor>/ThermalData on multi-sensor servers, Objects/ThermalData is the first sensor
+        path = [f"{self.custom_ns_idx}:{sensor}"] if sensor else []
+        self.thermal_node = await self.client.nodes.objects.get_child(path + [f"{self.custom_ns_idx}:ThermalData"])
+        await self.find_sensor_methods()
+
+        nodes = {
+            attribute: getattr(self, attribute)
+            for attribute in ("thermal_node", "sensor_node", "read_frames_node", "deadband_node",
+                              "deadband_pixels_node")
+            if getattr(self, attribute) is not None
+        }
+        values = await self.client.read_attributes(list(nodes.values()), ua.AttributeIds.BrowseName)
+        self.resolved = {
+            "key": key,
+            "ns_idx": self.custom_ns_idx,
+            "nodeids": {attribute: node.nodeid for attribute, node in nodes.items()},
+            "names": {attribute: value.Value.Value for attribute, value in zip(nodes, values)},
+        }
+
+    def connection_lost(self, error):
+        """Drop the session and schedule the reconnect"""
+        now = time.monotonic()
+        # A connection that stayed up longer than the longest delay starts the backoff again
+        if self.connected_since is not None and now - self.connected_since > self.backoff.maximum:
+            self.backoff.reset()
+        self.connected = False
+        self.connected_since = None
+        self.health.lost(error)
+        self.drop_session()
+        self.next_connect_time = now + self.backoff.next()
+
+    async def handle_read_error(self, error):
+        """Keep the session after a transient error while it is alive, treat anything else as a lost connection"""
+        if status_code(error) in UNKNOWN_NODE_STATUS_CODES:
+            self.resolved = None
+        elif is_transient(error) and self.transient_errors < self.max_transient_errors:
+            try:
+                await self.client.check_connection()
+                self.transient_errors += 1
+                self.health.transient(error)
+                self.appConfigs.logging(f"Transient read error ({self.name})", error, level=WARNING)
+                return
+            except Exception:
+                pass
+
+        self.appConfigs.logging(f"Data fetch error ({self.name}): {error}", level=ERROR)
+        print(f"Data fetch error ({self.name}): {error}")
+        self.connection_lost(error)
+
+    def drop_session(self):
+        """Forget the current session and close it in the background, the reconnect does not wait for it"""
+        client, subscription, lease = self.client, self.subscription, self.session_lease
+        self.client = None
+        self.subscription = None
+        self.session_lease = None
+        if client is None:
+            return
+        task = asyncio.ensure_future(self.close_session(client, subscription, lease))
+        self.closing.add(task)
+        task.add_done_callback(self.closing.discard)
+
+    async def close_session(self, client, subscription=None, lease=None):
+        try:
+            if lease is not None:
+                # The session may still serve other endpoints, only this subscription goes
+                if subscription is not None:
+                    await asyncio.wait_for(subscription.delete(), self.close_timeout)
+            else:
+                await asyncio.wait_for(client.disconnect(), self.close_timeout)
+        except Exception as e:
+            # Closing a lost connection is expected to fail, the server drops the session when it times out
+            self.appConfigs.logging(f"Session close error ({self.name})", e, level=WARNING)
+        finally:
+            # The lease goes back also when the subscription of a dead session could not be deleted
+            if lease is not None:
+                await self.session_pool.release(lease)
+
     async def fetch_thermal_data(self):
         """Fetch data from the OPC-UA server and fill the buffer"""
-        last_connection_attempt = 0
-        
         while self.running:
             try:
                 current_time = time.time()
                 
-                # Try re-connect
-                if not self.connected and (current_time - last_connection_attempt) > self.reconnect_delay:
-                    last_connection_attempt = current_time
+                # Try re-connect, with backoff after failures
+                if not self.connected and time.monotonic() >= self.next_connect_time:
                     await self.connect()
                 
-                # Fetch and process data if connected
-                if self.connected and self.client and self.thermal_node:
+                # Subscription delivers frames through ThermalDataHandler, only watch the session
+                if self.connected and self.subscription is not None:
                     try:
+                        await self.client.check_connection()
+                    except Exception as e:
+                        self.appConfigs.logging(f"Subscription connection lost ({self.name}): {e}", level=WARNING)
+                        print(f"Subscription connection lost ({self.name}): {e}")
+                        self.connection_lost(e)
+
+                # Polling fallback
+                elif self.connected and self.client and self.thermal_node:
+                    try:
+                        if self.batching:
+                            await self.fetch_batch()
                         # Rate limit data fetching for better performance
-                        if current_time - self.last_fetch_time >= self.fetch_interval:
+                        elif current_time - self.last_fetch_time >= self.fetch_interval:
                             self.last_fetch_time = current_time
+                            if self.polled_tiles and self.read_frames_node is None:
+                                await self.poll_keyframe()
 
-                            thermal_data = await self.thermal_node.read_value()
-                            
-                            # Store the raw thermal data for temperature display
-                            if isinstance(thermal_data, list) and len(thermal_data) == 768:
-                                self.last_thermal_data = thermal_data
-                                
-                                # Process thermal data
-                                # Reshape to original sensor resolution (24x32)
-                                thermal_array = np.array(thermal_data, dtype=np.float32).reshape((24, 32))
-                                
-                                # Normalize to full range
-                                min_temp = np.min(thermal_array)
-                                max_temp = np.max(thermal_array)
-                                
-                                # Normalize with custom max-min scaling
-                                normalized = (thermal_array - max_temp) / (min_temp - max_temp)
-                                
-                                # Resize with cubic interpolation
-                                resized = cv2.resize(
-                                    normalized, 
-                                    (32 * self.scale_factor, 24 * self.scale_factor), 
-                                    interpolation=cv2.INTER_CUBIC
-                                )
-                                
-                                # Apply selected colormap (instead of fixed COLORMAP_JET)
-                                heatmap = cv2.applyColorMap(
-                                    np.uint8(resized * 255), 
-                                    self.current_colormap
-                                )
-                                
-                                # Compress for better performance
-                                encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 90]
-                                _, buffer_frame = cv2.imencode('.jpg', heatmap, encode_param)
-                                
-                                # Add to buffer if not full
-                                if not self.buffer.full():
-                                    self.buffer.put(buffer_frame.tobytes())
-                                else:
-                                    # If buffer is full, remove oldest item and add new one
-                                    self.buffer.get() 
-                                    self.buffer.put(buffer_frame.tobytes())
+                            start = time.perf_counter()
+                            data_value = await self.thermal_node.read_data_value()
+                            self.update_round_trip(time.perf_counter() - start)
+                            await self.receive_value(
+                                data_value.Value.Value, data_value.SourceTimestamp or data_value.ServerTimestamp
+                            )
+                        self.update_batching()
+                        self.transient_errors = 0
                     except Exception as e:
-                        self.appConfigs.logging(f"Data fetch error: {e}")
-                        print(f"Data fetch error: {e}")
-                        self.connected = False
-                
+                        await self.handle_read_error(e)
+
                 await asyncio.sleep(0.03)
                 
             except Exception as e:
-                self.appConfigs.logging(f"Critical error in fetch loop: {e}")
+                self.appConfigs.logging(f"Critical error in fetch loop: {e}", level=ERROR)
                 print(f"Critical error in fetch loop: {e}")
                 await asyncio.sleep(1)
             
@@ -126,6 +541,338 @@ class Producer:
             if not self.running:
                 break
 
+    async def subscribe(self):
+        """Subscribe to ThermalData changes, falling back to polling on failure"""
+        try:
+            handler = ThermalDataHandler(self, self.client)
+            self.subscription = await self.client.create_subscription(self.publishing_interval, handler)
+            # Sampling interval 0 reports every server write instead of resampling the value
+            await self.subscription.subscribe_data_change(
+                self.thermal_node, queuesize=self.queue_size, sampling_interval=0
+            )
+            self.appConfigs.logging(
+                f"Subscribed to ThermalData (publishing interval {self.publishing_interval} ms, queue size {self.queue_size})"
+            )
+        except Exception as e:
+            self.appConfigs.logging("Subscription failed, falling back to polling", e, level=WARNING)
+            print(f"Subscription failed, falling back to polling: {e}")
+            if self.subscription is not None:
+                try:
+                    await self.subscription.delete()
+                except Exception:
+                    pass
+            self.subscription = None
+
+    async def find_sensor_methods(self):
+        """Look up the sensor object of the ThermalData node, its ReadFrames method and deadband settings (optional)"""
+        self.sensor_node = None
+        self.read_frames_node = None
+        self.deadband_node = None
+        self.deadband_pixels_node = None
+        self.batching = False
+        try:
+            self.sensor_node = await self.thermal_node.get_parent()
+            self.read_frames_node = await self.sensor_node.get_child(f"{self.custom_ns_idx}:ReadFrames")
+        except Exception as e:
+            self.appConfigs.logging("ReadFrames not available, batch reads disabled", e, level=WARNING)
+        if self.sensor_node is not None:
+            try:
+                self.deadband_node = await self.sensor_node.get_child(f"{self.custom_ns_idx}:Deadband")
+                self.deadband_pixels_node = await self.sensor_node.get_child(f"{self.custom_ns_idx}:DeadbandPixels")
+            except ua.UaError:
+                # Servers without deadband publishing send every frame
+                pass
+
+    async def read_deadband(self):
+        """
+        Servers with a deadband skip unchanged frames, gaps in the source timestamps are then no lost
+        frames: header-less formats only count drops from queue overflows
+        """
+        nodes = [node for node in (self.deadband_node, self.deadband_pixels_node) if node is not None]
+        deadband = False
+        if nodes:
+            values = await self.client.read_attributes(nodes, ua.AttributeIds.Value)
+            deadband = any(value.StatusCode.is_good() and value.Value.Value for value in values)
+        self.frame_counter.count_gaps = not deadband
+
+    async def fetch_batch(self):
+        """Read every frame published since the last received one and process them in order"""
+        after = self.frame_counter.last_sequence or 0
+        start = time.perf_counter()
+        value = await self.sensor_node.call_method(
+            self.read_frames_node, asyncua.ua.Variant(after, asyncua.ua.VariantType.UInt32)
+        )
+        self.update_round_trip(time.perf_counter() - start)
+
+        # One vectorized unpack of the whole block
+        frames, sequences, timestamps = decode_batch(value)
+        for frame, sequence, timestamp in zip(frames, sequences.tolist(), timestamps.tolist()):
+            if self.frame_counter.observe_sequence(sequence):
+                self.update_frame_rate(sequence, timestamp)
+                await self.hand_off(frame, sequence, timestamp)
+
+    def update_round_trip(self, seconds):
+        if self.round_trip_time is None:
+            self.round_trip_time = seconds
+        else:
+            self.round_trip_time += 0.2 * (seconds - self.round_trip_time)
+
+    def update_frame_rate(self, sequence, timestamp):
+        """Estimate the server frame rate from sequence numbers and header timestamps"""
+        if self.last_rate_sample is not None:
+            last_sequence, last_timestamp = self.last_rate_sample
+            frames = (sequence - last_sequence) & 0xFFFFFFFF
+            elapsed = timestamp - last_timestamp
+            if 0 < frames < 0x80000000 and elapsed > 0:
+                rate = frames / elapsed
+                self.frame_rate = rate if self.frame_rate is None else self.frame_rate + 0.2 * (rate - self.frame_rate)
+        self.last_rate_sample = (sequence, timestamp)
+
+    def update_frame_interval(self):
+        """
+        Estimate the server frame rate of formats without a header from the DataValue source timestamps:
+        polled values skip frames, the smallest gap between them is the best estimate of the frame interval
+        """
+        interval = self.frame_counter.frame_interval
+        if interval:
+            self.frame_rate = 1.0 / interval
+
+    def update_batching(self):
+        """Switch between single and batch reads, with hysteresis"""
+        available = self.read_frames_node is not None
+        if self.polled_tiles and available:
+            # Polls of a tiles stream read deltas of skipped frames, ReadFrames returns full frames
+            batching = True
+        elif self.batch_mode == 'on' or not available:
+            batching = available and self.batch_mode == 'on'
+        elif self.batch_mode == 'auto' and self.round_trip_time is not None and self.frame_rate is not None:
+            # Frames published during one poll, a single read costs a round trip plus the poll interval
+            load = (self.round_trip_time + self.fetch_interval) * self.frame_rate
+            batching = load > 1.0 if not self.batching else load > 0.5
+        else:
+            batching = False
+
+        if batching != self.batching:
+            self.batching = batching
+            self.appConfigs.logging(
+                f"{'Batch' if batching else 'Single'} reads (round trip {1000 * (self.round_trip_time or 0):.0f} ms, "
+                f"{self.frame_rate or 0:.1f} frames/s)"
+            )
+
+    async def receive_value(self, value, source_time, overflow=False):
+        """Decode a ThermalData value, skip repeated frames and process new ones"""
+        start = time.perf_counter()
+        try:
+            thermal_array, header = self.frame_decoder.decode(value)
+        except (ValueError, TypeError) as e:
+            self.appConfigs.logging("Invalid thermal frame", e, level=WARNING)
+            return
+        self.metrics.since("decode", start)
+
+        if header is not None and header.format == FORMAT_TILES and self.subscription is None:
+            self.poll_tiles()
+
+        sequence = header.sequence if header is not None else None
+        if thermal_array is None:
+            # Tile delta after a lost frame, nothing to show until the next keyframe
+            if self.frame_counter.observe(source_time, overflow, sequence):
+                self.update_frame_rate(sequence, header.timestamp)
+            self.request_keyframe()
+            return
+
+        if self.frame_counter.observe(source_time, overflow, sequence):
+            if header is not None:
+                timestamp = header.timestamp
+                self.update_frame_rate(sequence, timestamp)
+            else:
+                timestamp = source_time.timestamp() if source_time is not None else None
+                self.update_frame_interval()
+            if timestamp is not None:
+                self.metrics.record("transit", max(time.time() - timestamp, 0.0))
+            await self.hand_off(thermal_array, sequence, timestamp)
+
+    def poll_tiles(self):
+        """Tiles stream without subscription: read it through ReadFrames batches, or keyframes only"""
+        if self.polled_tiles:
+            return
+        self.polled_tiles = True
+        if self.read_frames_node is not None:
+            message = f"Polling a tiles stream ({self.name}), reading full frames through ReadFrames"
+        else:
+            message = (f"Polling a tiles stream ({self.name}) without ReadFrames, only keyframes are shown: "
+                       f"use subscription or enable batch_frames on the server")
+        self.appConfigs.logging(message, level=WARNING)
+        print(message)
+
+    async def poll_keyframe(self):
+        """
+        Polled tiles without ReadFrames: the frames between polls are skipped, only keyframes decode.
+        Request one and read one frame interval later, while it is the current value
+        """
+        self.last_keyframe_request = time.monotonic()
+        await self.call_request_keyframe()
+        await asyncio.sleep(1.0 / self.frame_rate if self.frame_rate else self.fetch_interval)
+
+    def request_keyframe(self):
+        """Ask the server for a keyframe, at most once per keyframe_retry seconds"""
+        now = time.monotonic()
+        if self.thermal_node is None or now - self.last_keyframe_request < self.keyframe_retry:
+            return
+        self.last_keyframe_request = now
+        asyncio.ensure_future(self.call_request_keyframe())
+
+    async def call_request_keyframe(self):
+        try:
+            sensor_node = self.sensor_node or await self.thermal_node.get_parent()
+            await sensor_node.call_method(f"{self.custom_ns_idx}:RequestKeyframe")
+        except Exception as e:
+            # Servers without RequestKeyframe send keyframes periodically
+            self.appConfigs.logging("Keyframe request failed", e, level=WARNING)
+
+    def process_thermal_data(self, thermal_array, sequence=None, timestamp=None):
+        """
+        Filter a decoded (24, 32) thermal frame and hand it to the render stage, raw frames are recorded.
+        Waits for the render workers with the block backpressure, hand_off() is the asyncio loop version
+        """
+        thermal_array = self.prepare_frame(thermal_array, sequence, timestamp)
+        if thermal_array is None:
+            return
+        if self.pipeline is not None:
+            self.pipeline.submit(thermal_array, sequence, timestamp)
+            return
+        self.render_inline(thermal_array, sequence, timestamp)
+
+    async def hand_off(self, thermal_array, sequence=None, timestamp=None):
+        """process_thermal_data() on the asyncio loop, the block backpressure waits without blocking the loop"""
+        thermal_array = self.prepare_frame(thermal_array, sequence, timestamp)
+        if thermal_array is None:
+            return
+        if self.pipeline is not None:
+            await self.pipeline.put(thermal_array, sequence, timestamp)
+            return
+        self.render_inline(thermal_array, sequence, timestamp)
+
+    def prepare_frame(self, thermal_array, sequence=None, timestamp=None):
+        """Record, filter and check the alarms of a frame, None if it is not a (24, 32) frame"""
+        if thermal_array.shape != (24, 32):
+            return None
+
+        self.health.frame(timestamp)
+        if self.recorder is not None:
+            self.recorder.append(thermal_array, sequence, timestamp)
+        if self.frame_filter is not None:
+            start = time.perf_counter()
+            thermal_array = self.frame_filter.apply(thermal_array)
+            self.metrics.since("filter", start)
+        if self.alarms is not None:
+            if self.alarms_enabled:
+                for event in self.alarms.evaluate(thermal_array, timestamp):
+                    self.alarm_changed(event)
+            elif self.alarms.active.any():
+                self.reset_alarms()
+        return thermal_array
+
+    def render_inline(self, thermal_array, sequence=None, timestamp=None):
+        """Render on the acquisition thread, without render workers"""
+        index = self.buffer.reserve()
+        self.render_frame(self.renderer, thermal_array, index)
+        self.commit_frame(index, sequence, timestamp)
+
+    def set_alarms_enabled(self, enabled):
+        """Turn the alarm evaluation on or off, raised alarms are cleared with the next frame"""
+        self.alarms_enabled = enabled
+
+    def reset_alarms(self):
+        """Forget the alarm state, the listeners get the clear events of the raised alarms"""
+        if self.alarms is not None:
+            for event in self.alarms.reset():
+                self.alarm_changed(event)
+
+    def alarm_changed(self, event):
+        self.appConfigs.logging(f"Alarm {self.name}/{event.message}", level=WARNING if event.active else None)
+        for listener in self.alarm_listeners:
+            listener(event)
+
+    def render_frame(self, renderer, thermal_array, index, span=None):
+        """Copy a frame into a buffer slot and normalize, resize and colormap it into the slot's heatmap"""
+        frame = self.buffer.frames[index]
+        np.copyto(frame, thermal_array)
+        renderer.render(frame, self.current_colormap, self.buffer.rendered[index], span)
+
+    def commit_frame(self, index, sequence=None, timestamp=None):
+        """Publish a rendered slot, the oldest frame is overwritten when the ring is full, and notify the listeners"""
+        # Store the raw thermal data for temperature display
+        self.last_thermal_data = self.buffer.frames[index]
+        self.buffer.commit(index, sequence, timestamp)
+        for listener in self.frame_listeners:
+            listener()
+
+    def displayed(self, slot):
+        """Record the buffer wait and the end to end latency of a frame taken by the reader"""
+        self.metrics.since("display", slot.committed)
+        if slot.timestamp:
+            self.metrics.record("end_to_end", max(time.time() - slot.timestamp, 0.0))
+
+    def diagnostics(self):
+        """Stage durations, frame counters, connection health and buffer occupancy, safe to call from any thread"""
+        return {
+            "connected": self.connected,
+            "server": self.server_url,
+            "frame_rate": self.frame_rate,
+            "round_trip_ms": 1000 * self.round_trip_time if self.round_trip_time is not None else None,
+            "frames": self.frame_counter.as_dict(),
+            "health": self.health.snapshot(reset_max=False),
+            "buffer": self.buffer.stats(),
+            "pipeline": self.pipeline.stats() if self.pipeline is not None else None,
+            "stages": self.metrics.snapshot(),
+            "alarms": self.alarms.state() if self.alarms is not None else [],
+            "filter": self.frame_filter.stats() if self.frame_filter is not None else None,
+        }
+
+    def start_pipeline(self):
+        """Start the render worker threads"""
+        if self.render_workers <= 0:
+            return
+        self.pipeline = RenderPipeline(
+            render=self.render_frame,
+            commit=self.commit_frame,
+            make_renderer=lambda: ThermalRenderer(scale_factor=self.scale_factor, span=self.renderer.span,
+                                                  metrics=self.metrics),
+            span=self.renderer.span,
+            buffer_size=self.buffer.buffer_size,
+            workers=self.render_workers,
+            queue_size=self.handoff_queue_size,
+            policy=self.backpressure,
+            on_error=lambda e: self.appConfigs.logging("Render error", e),
+            metrics=self.metrics
+        )
+        self.pipeline.start()
+
+    def stop_pipeline(self):
+        if self.pipeline is not None:
+            self.pipeline.stop()
+            self.pipeline = None
+
+    def start_recording(self):
+        if self.record_path:
+            self.recorder = StreamRecorder(self.record_path)
+            self.appConfigs.logging(f"Recording frames to {self.record_path}")
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.appConfigs.logging(f"Recorded {self.recorder.frames} frames to {self.record_path}")
+            self.recorder = None
+
+    def replay(self):
+        """Feed the recording at replay_path into the render stage instead of the OPC UA frames"""
+        recording = StreamRecording(self.replay_path)
+        self.appConfigs.logging(f"Replaying {len(recording)} frames from {self.replay_path} at speed {self.replay_speed}")
+        self.replay_source = ReplaySource(
+            recording, self.process_thermal_data, speed=self.replay_speed, loop=self.replay_loop
+        )
+        self.replay_source.run(lambda: not self.running)
+
     def start(self):
         """Start the producer"""
         self._loop = asyncio.new_event_loop()
@@ -133,13 +880,20 @@ class Producer:
         
         try:
             self.running = True
-            self._loop.run_until_complete(self.fetch_thermal_data())
+            self.start_pipeline()
+            self.start_recording()
+            if self.replay_path:
+                self.replay()
+            else:
+                self._loop.run_until_complete(self.fetch_thermal_data())
         except Exception as e:
-            self.appConfigs.logging(f"Producer error: {e}")
+            self.appConfigs.logging(f"Producer error: {e}", level=ERROR)
             print(f"Producer error: {e}")
         finally:
-            if self.client and self.connected:
+            if self.client or self.closing:
                 self._loop.run_until_complete(self.disconnect())
+            self.stop_pipeline()
+            self.stop_recording()
             self._loop.close()
             self._loop = None
             self.appConfigs.logging("Producer thread completed")
@@ -149,15 +903,25 @@ class Producer:
         """Disconnect from OPC-UA server"""
         if self.client:
             try:
-                await self.client.disconnect()
+                if self.subscription is not None:
+                    await self.subscription.delete()
+                if self.session_lease is None:
+                    await self.client.disconnect()
                 self.appConfigs.logging("Disconnected from OPC-UA server")
                 print("Disconnected from OPC-UA server")
             except Exception as e:
-                self.appConfigs.logging(f"Disconnection error: {e}")
+                self.appConfigs.logging(f"Disconnection error: {e}", level=ERROR)
                 print(f"Disconnection error: {e}")
             finally:
+                if self.session_lease is not None:
+                    await self.session_pool.release(self.session_lease)
                 self.client = None
+                self.subscription = None
+                self.session_lease = None
                 self.connected = False
+        if self.closing:
+            # Sessions of lost connections still being closed
+            await asyncio.gather(*self.closing, return_exceptions=True)
 
     def stop(self):
         """Stop the producer"""
@@ -0,0 +1,112 @@
+import asyncio
+from typing import Dict, Optional, Set
+
+import asyncua
+
+from app_configuration.app_configs import AppConfigs
+from app_configuration.log_writer import WARNING
+
+
+async def open_session(url: str, request_timeout: float = 4.0, connect_timeout: float = 4.0) -> asyncua.Client:
+    """
+    Connected client, the whole connect sequence is limited to connect_timeout
+
+    asyncua waits up to the request timeout for the answer to its Hello, also when the server
+    closed the socket meanwhile, a reconnect right after a network blip would stall for seconds
+    """
+    client = asyncua.Client(url, timeout=request_timeout)
+    try:
+        await asyncio.wait_for(client.connect(), connect_timeout)
+    except BaseException:
+        client.disconnect_socket()
+        raise
+    return client
+
+
+class SessionLease:
+    """One acquire of a pooled session, released at most once"""
+    def __init__(self, url: str, client: asyncua.Client):
+        self.url = url
+        self.client = client
+        self.released = False
+
+
+class SessionPool:
+    def __init__(self, appConfigs: AppConfigs, close_timeout: float = 2.0, request_timeout: float = 4.0,
+                 connect_timeout: float = 4.0):
+        """
+        OPC UA sessions shared by the endpoints of a MultiProducer, one per server URL
+
+        Endpoints reading different sensors of the same server use the same session (each with
+        its own subscription). A session is checked when it is handed out and replaced if it
+        is broken, it is closed when the last lease on it is released. A lease on a session that
+        was replaced meanwhile does not count for the new session
+        """
+        self.appConfigs = appConfigs
+        self.close_timeout = close_timeout
+        self.request_timeout = request_timeout
+        self.connect_timeout = connect_timeout
+        self.sessions: Dict[str, asyncua.Client] = {}
+        self.leases: Dict[str, Set[SessionLease]] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.connects = 0
+
+    async def acquire(self, url: str, connect_timeout: Optional[float] = None) -> SessionLease:
+        """Lease on a connected session to url, raises if the server cannot be reached"""
+        async with self.locks.setdefault(url, asyncio.Lock()):
+            client = self.sessions.get(url)
+            if client is not None:
+                try:
+                    await client.check_connection()
+                except Exception as e:
+                    self.appConfigs.logging(f"Session to {url} lost, reconnecting", e, level=WARNING)
+                    # The leases of the broken session are released by their endpoints when they reconnect
+                    del self.sessions[url]
+                    self.leases.pop(url, None)
+                    await self.close_session(client)
+                    client = None
+
+            if client is None:
+                client = await open_session(url, self.request_timeout, connect_timeout or self.connect_timeout)
+                self.sessions[url] = client
+                self.connects += 1
+                self.appConfigs.logging(f"Opened session to {url}")
+
+            lease = SessionLease(url, client)
+            self.leases.setdefault(url, set()).add(lease)
+            return lease
+
+    async def release(self, lease: SessionLease):
+        """Give a session back, it is closed when no lease holds it anymore"""
+        if lease.released:
+            return
+        lease.released = True
+        url = lease.url
+        async with self.locks.setdefault(url, asyncio.Lock()):
+            client = self.sessions.get(url)
+            if client is not lease.client:
+                # The session was replaced and closed already
+                return
+            leases = self.leases.get(url, set())
+            leases.discard(lease)
+            if not leases:
+                del self.sessions[url]
+                self.leases.pop(url, None)
+                await self.close_session(client)
+                self.appConfigs.logging(f"Closed session to {url}")
+
+    async def close_session(self, client: asyncua.Client):
+        try:
+            await asyncio.wait_for(client.disconnect(), self.close_timeout)
+        except Exception as e:
+            # A dead session cannot be closed cleanly, its resources are released anyway
+            self.appConfigs.logging("Session close error", e, level=WARNING)
+
+    async def close(self):
+        for url, client in list(self.sessions.items()):
+            await self.close_session(client)
+        self.sessions.clear()
+        self.leases.clear()
+
+    def __len__(self) -> int:
+        return len(self.sessions)
@@ -0,0 +1,275 @@
+import os
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Layout of the shared memory block:
+#   0    static header (magic, version, slots, rows, cols, rendered height, rendered width)
+#   16   writer PID, uint32
+#   24   heartbeat, time.time() of the last put, float64
+#   32   write count, uint64
+#   64   slot table, one (seqlock counter, sequence, timestamp) record per slot
+#   ...  raw frames (slots, rows, cols) float32, then heatmaps (slots, height, width, 3) uint8
+RING_HEADER = struct.Struct("<4sHHHHHH")
+RING_MAGIC = b"TSHM"
+RING_VERSION = 2
+WRITER_PID_OFFSET = 16
+HEARTBEAT_OFFSET = 24
+WRITE_COUNT_OFFSET = 32
+SLOT_TABLE_OFFSET = 64
+SLOT_DTYPE = np.dtype([("lock", "<u8"), ("sequence", "<i8"), ("timestamp", "<f8")])
+
+# Rings written by this process, by name
+open_rings = set()
+
+
+def align(offset: int, alignment: int = 64) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def attach(name: str) -> shared_memory.SharedMemory:
+    """Open an existing block without letting the resource tracker of this process remove it at exit"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    # Before 3.13 the resource tracker would remove the block when this process exits. It keeps one entry
+    # per name, the one of a ring written by this process is left to the writer
+    if name not in open_rings:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def process_running(pid: int) -> bool:
+    """True if the process pid exists on this host"""
+    if os.name == "nt":
+        # os.kill would terminate it. Windows removes a block with its last handle, so its writer is alive
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class RingLayout(NamedTuple):
+    slots: int
+    frame_shape: Tuple[int, int]
+    render_shape: Optional[Tuple[int, int]]
+
+    @property
+    def frames_offset(self) -> int:
+        return align(SLOT_TABLE_OFFSET + self.slots * SLOT_DTYPE.itemsize)
+
+    @property
+    def rendered_offset(self) -> int:
+        return align(self.frames_offset + self.slots * int(np.prod(self.frame_shape)) * 4)
+
+    @property
+    def size(self) -> int:
+        rendered = self.slots * int(np.prod(self.render_shape)) * 3 if self.render_shape else 0
+        return self.rendered_offset + rendered
+
+    def views(self, buffer):
+        """numpy views of the write count, slot table, frames and heatmaps on the shared block"""
+        write_count = np.ndarray((1,), dtype="<u8", buffer=buffer, offset=WRITE_COUNT_OFFSET)
+        table = np.ndarray((self.slots,), dtype=SLOT_DTYPE, buffer=buffer, offset=SLOT_TABLE_OFFSET)
+        frames = np.ndarray((self.slots,) + self.frame_shape, dtype="<f4", buffer=buffer, offset=self.frames_offset)
+        rendered = None
+        if self.render_shape:
+            rendered = np.ndarray((self.slots,) + self.render_shape + (3,), dtype=np.uint8, buffer=buffer,
+                                  offset=self.rendered_offset)
+        return write_count, table, frames, rendered
+
+
+class SharedFrame(NamedTuple):
+    """Newest frame of a shared ring, frame and rendered are views on the shared memory"""
+    index: int
+    lock: int
+    sequence: int
+    timestamp: float
+    frame: np.ndarray
+    rendered: Optional[np.ndarray]
+
+
+class SharedFrameRing:
+    def __init__(self, name: str, slots: int = 8, frame_shape: Tuple[int, int] = (24, 32),
+                 render_shape: Optional[Tuple[int, int]] = None, replace: bool = False):
+        """
+        Writer side of a ring of frames in shared memory, read by other processes with SharedFrameReader
+
+        Every slot has a seqlock counter: it is odd while the slot is written and incremented
+        again when the frame is complete. Readers take the newest slot without locking and check
+        the counter afterwards, so the writer never waits for them. A slot is written again only
+        after slots - 1 newer frames, that is how long a reader can work on a view of it.
+
+        A block with the same name is only replaced when it is stale: a ring whose writer process
+        has exited (e.g. crashed). A block of a running writer, or one which is not a ring of this
+        version, raises FileExistsError unless replace is True
+        """
+        self.layout = RingLayout(slots, tuple(frame_shape), tuple(render_shape[:2]) if render_shape else None)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=self.layout.size)
+        except FileExistsError:
+            if not replace:
+                self.__check_stale(name)
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=self.layout.size)
+        self.name = name
+        open_rings.add(name)
+
+        self.write_count, self.table, self.frames, self.rendered = self.layout.views(self.shm.buf)
+        self.writer_pid = np.ndarray((1,), dtype="<u4", buffer=self.shm.buf, offset=WRITER_PID_OFFSET)
+        self.heartbeat = np.ndarray((1,), dtype="<f8", buffer=self.shm.buf, offset=HEARTBEAT_OFFSET)
+        self.writer_pid[0] = os.getpid()
+        self.heartbeat[0] = time.time()
+        self.write_count[0] = 0
+        self.table["lock"] = 0
+        self.table["sequence"] = -1
+        height, width = self.layout.render_shape or (0, 0)
+        rows, cols = self.layout.frame_shape
+        # The magic is written last, readers attaching earlier see an invalid block
+        self.shm.buf[4:RING_HEADER.size] = RING_HEADER.pack(b"\0" * 4, RING_VERSION, slots, rows, cols,
+                                                           height, width)[4:]
+        self.shm.buf[:4] = RING_MAGIC
+
+    def put(self, frame: np.ndarray, sequence: int, timestamp: float, rendered: Optional[np.ndarray] = None) -> int:
+        """Copy a frame (and its heatmap) into the next slot and publish it, returns the slot index"""
+        count = int(self.write_count[0])
+        index = count % self.layout.slots
+        slot = self.table[index:index + 1]
+
+        slot["lock"] += 1  # odd: being written
+        np.copyto(self.frames[index], frame)
+        if rendered is not None and self.rendered is not None:
+            np.copyto(self.rendered[index], rendered)
+        slot["sequence"] = sequence
+        slot["timestamp"] = timestamp
+        slot["lock"] += 1  # even: complete
+
+        self.write_count[0] = count + 1
+        self.heartbeat[0] = time.time()
+        return index
+
+    @staticmethod
+    def __check_stale(name: str):
+        """Raise FileExistsError unless the existing block is a ring left by a writer that is gone"""
+        if name in open_rings:
+            raise FileExistsError(f"Shared memory {name} is in use by this process, pass replace=True to take it over")
+        shm = attach(name)
+        try:
+            header = bytes(shm.buf[:HEARTBEAT_OFFSET + 8])
+        finally:
+            shm.close()
+        magic, version = RING_HEADER.unpack_from(header)[:2]
+        if magic != RING_MAGIC or version != RING_VERSION:
+            raise FileExistsError(f"Shared memory {name} exists and is not a thermal frame ring of version "
+                                  f"{RING_VERSION}, pass replace=True to remove it")
+        pid, = struct.unpack_from("<I", header, WRITER_PID_OFFSET)
+        heartbeat, = struct.unpack_from("<d", header, HEARTBEAT_OFFSET)
+        # A restarted service can get the PID of its crashed predecessor
+        if pid != os.getpid() and process_running(pid):
+            raise FileExistsError(f"Shared memory {name} is in use by process {pid} "
+                                  f"(last frame {time.time() - heartbeat:.1f} s ago), pass replace=True to take it over")
+
+    def close(self):
+        """Detach and remove the shared memory block, readers keep their mapping until they close"""
+        del self.write_count, self.table, self.frames, self.rendered, self.writer_pid, self.heartbeat
+        open_rings.discard(self.name)
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SharedFrameReader:
+    def __init__(self, name: str):
+        """
+        Reader side of a SharedFrameRing, any number of processes can attach to the same ring
+        """
+        self.shm = attach(name)
+
+        magic, version, slots, rows, cols, height, width = RING_HEADER.unpack(bytes(self.shm.buf[:RING_HEADER.size]))
+        if magic != RING_MAGIC or version != RING_VERSION:
+            self.shm.close()
+            raise ValueError(f"Not a thermal frame ring: magic={magic!r} version={version}")
+        self.name = name
+        self.layout = RingLayout(slots, (rows, cols), (height, width) if height else None)
+        self.write_count, self.table, self.frames, self.rendered = self.layout.views(self.shm.buf)
+        self.read_count = 0
+        self.torn = 0  # Reads retried because the writer was in the slot
+
+    def latest(self, retries: int = 8) -> Optional[SharedFrame]:
+        """
+        Newest complete frame as views on the shared memory (zero-copy), None if there is none yet
+
+        The views stay valid until the writer wraps around to the slot, call valid(frame) after
+        using them or copy(frame) to keep the data
+        """
+        for _ in range(retries):
+            count = int(self.write_count[0])
+            if count == 0:
+                return None
+            index = (count - 1) % self.layout.slots
+            slot = self.table[index]
+            lock = int(slot["lock"])
+            if lock & 1:
+                self.torn += 1
+                continue
+            sequence, timestamp = int(slot["sequence"]), float(slot["timestamp"])
+            if int(self.table[index]["lock"]) != lock:
+                self.torn += 1
+                continue
+            self.read_count = count
+            rendered = self.rendered[index] if self.rendered is not None else None
+            return SharedFrame(index, lock, sequence, timestamp, self.frames[index], rendered)
+        return None
+
+    def valid(self, frame: SharedFrame) -> bool:
+        """True if the slot of the frame has not been written since it was taken"""
+        return int(self.table[frame.index]["lock"]) == frame.lock
+
+    def copy(self, frame: SharedFrame) -> Optional[SharedFrame]:
+        """Private copy of a frame, None if the writer overwrote it meanwhile"""
+        copied = frame._replace(
+            frame=frame.frame.copy(),
+            rendered=frame.rendered.copy() if frame.rendered is not None else None
+        )
+        return copied if self.valid(frame) else None
+
+    def wait_for_frame(self, timeout: Optional[float] = None, poll_interval: float = 0.002) -> Optional[SharedFrame]:
+        """
+        Newest frame once one newer than the last one read is published, None on timeout
+
+        There is no cross-process notification, the write count is polled every poll_interval
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while int(self.write_count[0]) == self.read_count:
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+        return self.latest()
+
+    def close(self):
+        del self.write_count, self.table, self.frames, self.rendered
+        self.shm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,179 @@
+import time
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from thermal_common.frame_filter import PercentileRange
+from thermal_common.stage_metrics import StageMetrics
+
+
+@lru_cache(maxsize=None)
+def colormap_lut(colormap: int) -> np.ndarray:
+    """
+    Return the 256-entry BGR lookup table of an OpenCV colormap, shaped (256, 1, 3) uint8
+    as expected by cv2.applyColorMap for user colormaps
+    """
+    ramp = np.arange(256, dtype=np.uint8).reshape(256, 1)
+    lut = cv2.applyColorMap(ramp, colormap)
+    lut.setflags(write=False)
+    return lut
+
+
+@lru_cache(maxsize=None)
+def resize_maps(shape: Tuple[int, int], scale_factor: int, interpolation: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the separable resize coefficients (rows_map, cols_map) for a frame shape
+
+    cv2.resize is linear and separable, so resizing the identity matrix gives its coefficients:
+    resized = rows_map @ frame @ cols_map is the same image as cv2.resize(frame, ...)
+    """
+    rows, cols = shape
+    rows_map = cv2.resize(np.eye(rows, dtype=np.float32), (rows, rows * scale_factor),
+                          interpolation=interpolation)
+    cols_map = cv2.resize(np.eye(cols, dtype=np.float32), (cols * scale_factor, cols),
+                          interpolation=interpolation)
+    rows_map.setflags(write=False)
+    cols_map.setflags(write=False)
+    return rows_map, cols_map
+
+
+class TemperatureSpan:
+    """
+    Temperature range mapped onto the colormap, fixed or auto-ranged with hysteresis.
+    Auto-ranging follows the frame min and max, or with percentiles (low, high) these percentiles
+    of the frame so a single hot or dead pixel does not compress the colors of the scene
+    """
+    def __init__(self, fixed: Optional[Tuple[float, float]] = None, hysteresis: float = 0.5,
+                 min_span: float = 1.0, percentiles: Optional[Tuple[float, float]] = None):
+        self.hysteresis = hysteresis  # degrees the frame range may shrink before the span follows
+        self.min_span = min_span  # smallest span, avoids dividing by zero on uniform frames
+        self.frame_range = PercentileRange(percentiles) if percentiles is not None else None
+        self.fixed = None
+        self.low = None
+        self.high = None
+        if fixed is not None:
+            self.set_fixed(*fixed)
+
+    def set_fixed(self, low: float, high: float):
+        self.fixed = (float(min(low, high)), float(max(low, high)))
+        self.low, self.high = self.__widen(*self.fixed)
+
+    def set_auto(self):
+        self.fixed = None
+        self.low = None
+        self.high = None
+
+    def update_frame(self, frame: np.ndarray) -> Tuple[float, float]:
+        """Return the span for a frame, not thread safe with percentiles"""
+        if self.fixed is not None:
+            return self.low, self.high
+        if self.frame_range is not None:
+            return self.update(*self.frame_range(frame))
+        return self.update(float(frame.min()), float(frame.max()))
+
+    def update(self, frame_min: float, frame_max: float) -> Tuple[float, float]:
+        """Return the span for a frame with the given min and max temperature"""
+        if self.fixed is not None:
+            return self.low, self.high
+
+        if self.low is None:
+            self.low, self.high = self.__widen(frame_min, frame_max)
+            return self.low, self.high
+
+        # Expand at once so nothing saturates, shrink only past the hysteresis band
+        low, high = self.low, self.high
+        if frame_min < low or frame_min - low > self.hysteresis:
+            low = frame_min
+        if frame_max > high or high - frame_max > self.hysteresis:
+            high = frame_max
+        if (low, high) != (self.low, self.high):
+            self.low, self.high = self.__widen(low, high)
+        return self.low, self.high
+
+    def __widen(self, low: float, high: float) -> Tuple[float, float]:
+        if high - low < self.min_span:
+            center = (low + high) / 2
+            return center - self.min_span / 2, center + self.min_span / 2
+        return low, high
+
+
+class ThermalRenderer:
+    """
+    Renders (24, 32) thermal frames into (H, W, 3) uint8 BGR heatmaps
+
+    Colormap LUTs and resize coefficients are computed once per (scale_factor, interpolation, colormap)
+    and all intermediate results live in reusable buffers, so rendering does not allocate per frame.
+    With metrics the normalize, resize and colormap durations of every frame are recorded
+    """
+    def __init__(self, frame_shape: Tuple[int, int] = (24, 32), scale_factor: int = 10,
+                 interpolation: int = cv2.INTER_CUBIC, span: Optional[TemperatureSpan] = None,
+                 metrics: Optional[StageMetrics] = None):
+        self.frame_shape = tuple(frame_shape)
+        self.span = span if span is not None else TemperatureSpan()
+        self.metrics = metrics
+        self.scale_factor = None
+        self.interpolation = None
+        self.configure(scale_factor, interpolation)
+
+    @property
+    def output_shape(self) -> Tuple[int, int]:
+        return self._resized.shape
+
+    def configure(self, scale_factor: int, interpolation: int = cv2.INTER_CUBIC):
+        """Select resize settings, buffers are only reallocated when they change"""
+        if (scale_factor, interpolation) == (self.scale_factor, self.interpolation):
+            return
+        self.scale_factor = scale_factor
+        self.interpolation = interpolation
+        self._rows_map, self._cols_map = resize_maps(self.frame_shape, scale_factor, interpolation)
+
+        rows, cols = self.frame_shape
+        self._scaled = np.empty((rows, cols), dtype=np.float32)
+        self._partial = np.empty((rows * scale_factor, cols), dtype=np.float32)
+        self._resized = np.empty((rows * scale_factor, cols * scale_factor), dtype=np.float32)
+        self._index = np.empty(self._resized.shape, dtype=np.uint8)
+
+    def prepare(self, colormaps: Iterable[int]):
+        """Build the LUTs of all selectable colormaps up front"""
+        for colormap in colormaps:
+            colormap_lut(colormap)
+
+    def render(self, frame: np.ndarray, colormap: int = cv2.COLORMAP_JET,
+               out: Optional[np.ndarray] = None, span: Optional[Tuple[float, float]] = None) -> np.ndarray:
+        """
+        Render a frame into out (allocated when not given) and return it.
+        span (low, high) overrides the renderer's TemperatureSpan, e.g. when it is updated elsewhere in frame order
+        """
+        if out is None:
+            out = np.empty(self.output_shape + (3,), dtype=np.uint8)
+
+        metrics = self.metrics
+        start = time.perf_counter() if metrics is not None else 0.0
+        if span is None:
+            span = self.span.update_frame(frame)
+        low, high = span
+
+        # Resizing is linear, so scale the 768 pixels to LUT indices before upsampling.
+        # Same orientation as the original max-min normalization: the span maximum maps to index 0
+        gain = 255.0 / (high - low)
+        np.subtract(high, frame, out=self._scaled)
+        self._scaled *= gain
+        if metrics is not None:
+            start = metrics.since("normalize", start)
+
+        np.matmul(self._rows_map, self._scaled, out=self._partial)
+        np.matmul(self._partial, self._cols_map, out=self._resized)
+
+        # Cubic interpolation overshoots, clip instead of wrapping around in the uint8 cast
+        np.clip(self._resized, 0, 255, out=self._resized)
+        np.copyto(self._index, self._resized, casting='unsafe')
+        if metrics is not None:
+            start = metrics.since("resize", start)
+
+        # Built-in colormaps rebuild their table on every call, the cached LUT does not
+        cv2.applyColorMap(self._index, colormap_lut(colormap), out)
+        if metrics is not None:
+            metrics.since("colormap", start)
+        return out
@@ -0,0 +1,115 @@
+"""
+Temperature readouts of the displayed frame: value at a point, max in a rectangle and profile
+along a line, in pixels of the heatmap (e.g. 320x240 with scale factor 10).
+
+The probe keeps a copy of the raw (24, 32) frame shown by the viewer. The upsampled temperature
+field is computed with the renderer's resize coefficients, so the readouts use the interpolation of
+the heatmap under the cursor. It is computed on the first query after a new frame and reused by all
+other queries on the frame, a mouse move is a lookup. Not thread safe, used on the GUI thread.
+"""
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from processing.renderer import resize_maps
+
+
+class TemperatureProbe:
+    """Displayed frame of one sensor and its upsampled temperature field, computed lazily once per frame"""
+    def __init__(self, frame_shape: Tuple[int, int] = (24, 32), scale_factor: int = 10,
+                 interpolation: int = cv2.INTER_CUBIC):
+        self.frame_shape = tuple(frame_shape)
+        self.frame = np.zeros(self.frame_shape, dtype=np.float32)
+        self.valid = False
+        self.stale = True
+        self.frames = 0
+        self.computed = 0  # fields computed, at most one per frame
+        self.scale_factor = None
+        self.interpolation = None
+        self.configure(scale_factor, interpolation)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """(height, width) of the field, the heatmap size"""
+        return self._field.shape
+
+    def configure(self, scale_factor: int, interpolation: int = cv2.INTER_CUBIC):
+        """Follow the renderer's resize settings, buffers are only reallocated when they change"""
+        if (scale_factor, interpolation) == (self.scale_factor, self.interpolation):
+            return
+        self.scale_factor = scale_factor
+        self.interpolation = interpolation
+        self._rows_map, self._cols_map = resize_maps(self.frame_shape, scale_factor, interpolation)
+        rows, cols = self.frame_shape
+        self._partial = np.empty((rows * scale_factor, cols), dtype=np.float32)
+        self._field = np.empty((rows * scale_factor, cols * scale_factor), dtype=np.float32)
+        self.stale = True
+
+    def set_frame(self, frame: np.ndarray):
+        """Copy the frame being displayed, the field is recomputed on the next query"""
+        np.copyto(self.frame, frame)
+        self.valid = True
+        self.stale = True
+        self.frames += 1
+
+    def clear(self):
+        self.valid = False
+
+    def field(self) -> Optional[np.ndarray]:
+        """Upsampled temperatures of the frame, same interpolation as the heatmap, None without a frame"""
+        if not self.valid:
+            return None
+        if self.stale:
+            # Cubic interpolation overshoots like in the heatmap, the temperatures are not clipped
+            np.matmul(self._rows_map, self.frame, out=self._partial)
+            np.matmul(self._partial, self._cols_map, out=self._field)
+            self.stale = False
+            self.computed += 1
+        return self._field
+
+    def value_at(self, x: float, y: float) -> Optional[float]:
+        """Temperature at heatmap pixel (x, y), clamped to the heatmap"""
+        field = self.field()
+        if field is None:
+            return None
+        height, width = field.shape
+        return float(field[self.__clamp(y, height), self.__clamp(x, width)])
+
+    def rect_max(self, x: float, y: float, width: float, height: float) -> Optional[Tuple[float, int, int]]:
+        """(temperature, x, y) of the hottest heatmap pixel of a rectangle, None when it is outside"""
+        field = self.field()
+        if field is None:
+            return None
+        if width < 0:
+            x, width = x + width, -width
+        if height < 0:
+            y, height = y + height, -height
+        x0, y0 = max(int(round(x)), 0), max(int(round(y)), 0)
+        x1 = min(int(round(x + width)) + 1, field.shape[1])
+        y1 = min(int(round(y + height)) + 1, field.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return None
+        region = field[y0:y1, x0:x1]
+        row, col = np.unravel_index(int(np.argmax(region)), region.shape)
+        return float(region[row, col]), x0 + int(col), y0 + int(row)
+
+    def line_profile(self, x0: float, y0: float, x1: float, y1: float,
+                     samples: Optional[int] = None) -> Optional[np.ndarray]:
+        """
+        Temperatures along the line from (x0, y0) to (x1, y1), clamped to the heatmap.
+        By default one sample per heatmap pixel of the line's longer side
+        """
+        field = self.field()
+        if field is None:
+            return None
+        if samples is None:
+            samples = int(max(abs(x1 - x0), abs(y1 - y0))) + 1
+        height, width = field.shape
+        cols = np.clip(np.rint(np.linspace(x0, x1, samples)), 0, width - 1).astype(np.intp)
+        rows = np.clip(np.rint(np.linspace(y0, y1, samples)), 0, height - 1).astype(np.intp)
+        return field[rows, cols]
+
+    @staticmethod
+    def __clamp(value: float, size: int) -> int:
+        return min(max(int(round(value)), 0), size - 1)
@@ -0,0 +1,76 @@
+import math
+import threading
+import time
+from typing import Callable, Optional
+
+from recording.stream_file import StreamRecording
+
+
+class ReplaySource:
+    def __init__(self, recording: StreamRecording, sink: Callable, speed: float = 1.0,
+                 start_time: Optional[float] = None, loop: bool = False, retime: bool = True):
+        """
+        Feed a recording into a frame sink, e.g. Producer.process_thermal_data(frame, sequence, timestamp)
+
+        speed 1 replays at the recorded pace, N is N times faster and 0 feeds frames as fast as the
+        sink takes them (load generator). start_time seeks to the first frame at or after it.
+        With retime the frames are stamped with the replay time, so latencies measured downstream
+        are those of the pipeline and not the age of the recording
+        """
+        self.recording = recording
+        self.sink = sink
+        self.speed = speed
+        self.start_time = start_time
+        self.loop = loop
+        self.retime = retime
+        self.running = False
+        self.thread = None
+        self.fed = 0
+
+    def run(self, should_stop: Callable[[], bool] = lambda: False) -> int:
+        """Replay in the calling thread until the end of the recording (or forever with loop), returns the frames fed"""
+        self.running = True
+        first = self.recording.seek(self.start_time) if self.start_time is not None else 0
+        fallback_interval = 1.0 / 32
+
+        while self.running and not should_stop() and first < len(self.recording):
+            replay_start = time.monotonic()
+            recording_start = None
+            previous = None
+
+            for number in range(first, len(self.recording)):
+                if not self.running or should_stop():
+                    break
+                frame, sequence, timestamp = self.recording[number]
+
+                if self.speed > 0:
+                    # Deadline relative to the start of the pass, sleeping does not accumulate drift
+                    if math.isnan(timestamp):
+                        timestamp = (previous if previous is not None else 0.0) + fallback_interval
+                    if recording_start is None:
+                        recording_start = timestamp
+                    delay = replay_start + (timestamp - recording_start) / self.speed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    previous = timestamp
+
+                self.sink(frame, sequence, time.time() if self.retime else timestamp)
+                self.fed += 1
+
+            if not self.loop:
+                break
+            first = 0
+
+        self.running = False
+        return self.fed
+
+    def start(self, should_stop: Callable[[], bool] = lambda: False):
+        """Replay on a background thread"""
+        self.thread = threading.Thread(target=self.run, args=(should_stop,), name="replay", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
@@ -0,0 +1,159 @@
+import os
+import struct
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# <name>.trec: file header, then fixed size frame records, the file grows by chunks of records
+FILE_HEADER = struct.Struct("<4sHHHII")  # magic, version, rows, cols, chunk frames, frames written
+FILE_HEADER_SIZE = 64
+FILE_MAGIC = b"TREC"
+FILE_VERSION = 1
+
+# <name>.trec.idx: (first timestamp, first frame number) of every chunk
+INDEX_DTYPE = np.dtype([("timestamp", "<f8"), ("frame", "<u8")])
+
+
+def record_dtype(frame_shape: Tuple[int, int]) -> np.dtype:
+    return np.dtype([("timestamp", "<f8"), ("sequence", "<u4"), ("reserved", "<u4"), ("frame", "<f4", frame_shape)])
+
+
+def index_path(path: str) -> str:
+    return path + ".idx"
+
+
+class RecordedFrame(NamedTuple):
+    frame: np.ndarray
+    sequence: int
+    timestamp: float
+
+
+class StreamRecorder:
+    def __init__(self, path: str, frame_shape: Tuple[int, int] = (24, 32), chunk_frames: int = 256):
+        """
+        Append raw float32 frames with their sequence numbers and timestamps to a recording
+
+        Only the chunk being written is memory mapped, so recording for hours does not grow the
+        memory. A new chunk is allocated (and indexed) every chunk_frames frames; appending is a
+        copy into the mapping, the kernel writes it back to disk in the background
+        """
+        self.path = path
+        self.frame_shape = tuple(frame_shape)
+        self.chunk_frames = chunk_frames
+        self.dtype = record_dtype(self.frame_shape)
+        self.frames = 0
+        self.chunk = None
+
+        with open(path, "wb") as data_file:
+            data_file.write(self.__header().ljust(FILE_HEADER_SIZE, b"\0"))
+        self.index_file = open(index_path(path), "wb")
+        self.header = np.memmap(path, dtype=np.uint8, mode="r+", shape=(FILE_HEADER_SIZE,))
+
+    def __header(self) -> bytes:
+        rows, cols = self.frame_shape
+        return FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, rows, cols, self.chunk_frames, self.frames)
+
+    def append(self, frame: np.ndarray, sequence: Optional[int] = None, timestamp: Optional[float] = None):
+        position = self.frames % self.chunk_frames
+        if position == 0:
+            self.__next_chunk(timestamp)
+        record = self.chunk[position]
+        record["timestamp"] = timestamp if timestamp is not None else np.nan
+        record["sequence"] = (sequence or 0) & 0xFFFFFFFF
+        record["frame"] = frame
+        self.frames += 1
+        # The frame count in the header makes the recording readable while it is being written
+        self.header[:FILE_HEADER.size] = np.frombuffer(self.__header(), dtype=np.uint8)
+
+    def __next_chunk(self, timestamp: Optional[float]):
+        if self.chunk is not None:
+            self.chunk.flush()
+        offset = FILE_HEADER_SIZE + self.frames * self.dtype.itemsize
+        with open(self.path, "r+b") as data_file:
+            data_file.truncate(offset + self.chunk_frames * self.dtype.itemsize)
+        self.chunk = np.memmap(self.path, dtype=self.dtype, mode="r+", offset=offset, shape=(self.chunk_frames,))
+
+        entry = np.array([(timestamp if timestamp is not None else np.nan, self.frames)], dtype=INDEX_DTYPE)
+        self.index_file.write(entry.tobytes())
+        self.index_file.flush()
+
+    def close(self):
+        """Flush the recording and cut the unused part of the last chunk"""
+        if self.chunk is not None:
+            self.chunk.flush()
+            self.chunk = None
+        if self.header is not None:
+            self.header.flush()
+            self.header = None
+            with open(self.path, "r+b") as data_file:
+                data_file.truncate(FILE_HEADER_SIZE + self.frames * self.dtype.itemsize)
+        self.index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StreamRecording:
+    def __init__(self, path: str):
+        """
+        Read-only view on a recording, frames are memory mapped and only loaded when accessed
+        """
+        with open(path, "rb") as data_file:
+            header = data_file.read(FILE_HEADER.size)
+        try:
+            magic, version, rows, cols, chunk_frames, frames = FILE_HEADER.unpack(header)
+        except struct.error as e:
+            raise ValueError(f"Truncated recording header: {e}")
+        if magic != FILE_MAGIC or version != FILE_VERSION:
+            raise ValueError(f"Not a thermal recording: magic={magic!r} version={version}")
+
+        self.path = path
+        self.frame_shape = (rows, cols)
+        self.chunk_frames = chunk_frames
+        self.dtype = record_dtype(self.frame_shape)
+
+        # Frames are counted in the header, chunks of a recording in progress may be partly written
+        available = (os.path.getsize(path) - FILE_HEADER_SIZE) // self.dtype.itemsize
+        self.frames = min(frames, available)
+        if self.frames:
+            self.records = np.memmap(path, dtype=self.dtype, mode="r", offset=FILE_HEADER_SIZE, shape=(self.frames,))
+        else:
+            self.records = np.zeros(0, dtype=self.dtype)
+        self.index = np.fromfile(index_path(path), dtype=INDEX_DTYPE) if os.path.exists(index_path(path)) else None
+
+    def __len__(self) -> int:
+        return self.frames
+
+    def __getitem__(self, number: int) -> RecordedFrame:
+        record = self.records[number]
+        return RecordedFrame(record["frame"], int(record["sequence"]), float(record["timestamp"]))
+
+    @property
+    def start_time(self) -> Optional[float]:
+        return float(self.records["timestamp"][0]) if self.frames else None
+
+    @property
+    def end_time(self) -> Optional[float]:
+        return float(self.records["timestamp"][self.frames - 1]) if self.frames else None
+
+    def seek(self, timestamp: float) -> int:
+        """Number of the first frame recorded at or after timestamp"""
+        first, last = 0, self.frames
+        if self.index is not None and len(self.index):
+            # The index narrows the search to one chunk, only its timestamps are read from disk
+            chunk = int(np.searchsorted(self.index["timestamp"], timestamp, side="right")) - 1
+            if chunk >= 0:
+                first = int(self.index["frame"][chunk])
+            if chunk + 1 < len(self.index):
+                last = min(last, int(self.index["frame"][chunk + 1]))
+        first = min(first, self.frames)
+        timestamps = self.records["timestamp"][first:last]
+        return first + int(np.searchsorted(timestamps, timestamp, side="left"))
+
+    def close(self):
+        """Drop the mapping, frames returned before stay valid until they are released"""
+        self.records = np.zeros(0, dtype=self.dtype)
+        self.frames = 0
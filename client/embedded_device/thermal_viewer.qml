@@ -17,7 +17,9 @@ Window {
     property real avgTemp: 0.0
     property bool isStreaming: false
     property bool settingsPanelOpen: false
-    property bool showTempWarning: enableTempWarning.checked && maxTemp > 100.0
+    // Active alarms of the controller's alarm engine: "endpoint/zone" -> message
+    property var activeAlarms: ({})
+    property bool showTempWarning: isStreaming && enableTempWarning.checked && Object.keys(activeAlarms).length > 0
 
     // Main layout
     ColumnLayout {
@@ -143,6 +145,291 @@ Window {
                 fillMode: Image.PreserveAspectFit
                 cache: false
                 source: ""
+                visible: !sensorGrid.visible
+            }
+
+            // Temperature readouts on the heatmap: hover shows the temperature under the pointer,
+            // a click places a spot meter, a drag the max of a rectangle, shift + drag a line profile
+            // and a right click removes them. Coordinates passed to the controller are heatmap pixels
+            Item {
+                id: probeOverlay
+                visible: thermalImage.visible && isStreaming && thermalImage.source != ""
+                x: thermalImage.x + (thermalImage.width - thermalImage.paintedWidth) / 2
+                y: thermalImage.y + (thermalImage.height - thermalImage.paintedHeight) / 2
+                width: thermalImage.paintedWidth
+                height: thermalImage.paintedHeight
+
+                // Heatmap pixels per item pixel
+                property real scaleX: thermalImage.implicitWidth / Math.max(width, 1)
+                property real scaleY: thermalImage.implicitHeight / Math.max(height, 1)
+                // Positions in item coordinates
+                property var hover: null
+                property var spot: null
+                property var area: null
+                property var line: null
+                // Readouts of the current frame
+                property real hoverValue: NaN
+                property real spotValue: NaN
+                property var areaMax: ({})
+                property var profile: []
+
+                function heatmapX(itemX) { return Math.floor(itemX * scaleX); }
+                function heatmapY(itemY) { return Math.floor(itemY * scaleY); }
+                function itemX(heatmapX) { return (heatmapX + 0.5) / scaleX; }
+                function itemY(heatmapY) { return (heatmapY + 0.5) / scaleY; }
+                function format(value) { return isNaN(value) ? "---" : value.toFixed(1) + "°C"; }
+
+                // Queries read the upsampled field the controller computes once per frame
+                function refresh() {
+                    if (!visible) {
+                        return;
+                    }
+                    hoverValue = hover ? thermalController.temperature_at(0, heatmapX(hover.x), heatmapY(hover.y)) : NaN;
+                    spotValue = spot ? thermalController.temperature_at(0, heatmapX(spot.x), heatmapY(spot.y)) : NaN;
+                    areaMax = area ? thermalController.rect_max(0, heatmapX(area.x), heatmapY(area.y),
+                                                                 heatmapX(area.x + area.width) - heatmapX(area.x),
+                                                                 heatmapY(area.y + area.height) - heatmapY(area.y)) : ({});
+                    profile = line ? thermalController.line_profile(0, heatmapX(line.x0), heatmapY(line.y0),
+                                                                    heatmapX(line.x1), heatmapY(line.y1)) : [];
+                }
+
+                MouseArea {
+                    anchors.fill: parent
+                    hoverEnabled: true
+                    acceptedButtons: Qt.LeftButton | Qt.RightButton
+                    property real startX: 0
+                    property real startY: 0
+                    property bool dragging: false
+
+                    onPressed: function(mouse) {
+                        startX = mouse.x;
+                        startY = mouse.y;
+                        dragging = false;
+                    }
+                    onPositionChanged: function(mouse) {
+                        probeOverlay.hover = Qt.point(mouse.x, mouse.y);
+                        if (pressed && pressedButtons & Qt.LeftButton) {
+                            dragging = dragging || Math.abs(mouse.x - startX) + Math.abs(mouse.y - startY) > 6;
+                            if (dragging && mouse.modifiers & Qt.ShiftModifier) {
+                                probeOverlay.line = {x0: startX, y0: startY, x1: mouse.x, y1: mouse.y};
+                            } else if (dragging) {
+                                probeOverlay.area = Qt.rect(Math.min(startX, mouse.x), Math.min(startY, mouse.y),
+                                                            Math.abs(mouse.x - startX), Math.abs(mouse.y - startY));
+                            }
+                        }
+                        probeOverlay.refresh();
+                    }
+                    onReleased: function(mouse) {
+                        if (mouse.button === Qt.RightButton) {
+                            probeOverlay.spot = null;
+                            probeOverlay.area = null;
+                            probeOverlay.line = null;
+                        } else if (!dragging) {
+                            probeOverlay.spot = Qt.point(mouse.x, mouse.y);
+                        }
+                        probeOverlay.refresh();
+                    }
+                    onExited: {
+                        probeOverlay.hover = null;
+                        probeOverlay.refresh();
+                    }
+                }
+
+                // Spot meter
+                Rectangle {
+                    visible: probeOverlay.spot !== null
+                    x: probeOverlay.spot ? probeOverlay.spot.x - width / 2 : 0
+                    y: probeOverlay.spot ? probeOverlay.spot.y - height / 2 : 0
+                    width: 12
+                    height: 12
+                    radius: 6
+                    color: "transparent"
+                    border.color: "white"
+                    border.width: 2
+
+                    Text {
+                        anchors.left: parent.right
+                        anchors.verticalCenter: parent.verticalCenter
+                        anchors.leftMargin: 4
+                        text: probeOverlay.format(probeOverlay.spotValue)
+                        color: "white"
+                        font.pixelSize: 14
+                        font.bold: true
+                        style: Text.Outline
+                        styleColor: "black"
+                    }
+                }
+
+                // Rectangle with the position and temperature of its hottest pixel
+                Rectangle {
+                    visible: probeOverlay.area !== null
+                    x: probeOverlay.area ? probeOverlay.area.x : 0
+                    y: probeOverlay.area ? probeOverlay.area.y : 0
+                    width: probeOverlay.area ? probeOverlay.area.width : 0
+                    height: probeOverlay.area ? probeOverlay.area.height : 0
+                    color: "transparent"
+                    border.color: "white"
+                    border.width: 1
+                }
+
+                Text {
+                    visible: probeOverlay.area !== null && probeOverlay.areaMax.value !== undefined
+                    x: probeOverlay.areaMax.x !== undefined ? probeOverlay.itemX(probeOverlay.areaMax.x) - 4 : 0
+                    y: probeOverlay.areaMax.y !== undefined ? probeOverlay.itemY(probeOverlay.areaMax.y) - height / 2 : 0
+                    text: "+ max " + probeOverlay.format(probeOverlay.areaMax.value !== undefined ? probeOverlay.areaMax.value : NaN)
+                    color: "white"
+                    font.pixelSize: 14
+                    font.bold: true
+                    style: Text.Outline
+                    styleColor: "black"
+                }
+
+                // Line of the profile
+                Canvas {
+                    id: lineCanvas
+                    anchors.fill: parent
+                    visible: probeOverlay.line !== null
+                    onPaint: {
+                        var ctx = getContext("2d");
+                        ctx.clearRect(0, 0, width, height);
+                        var line = probeOverlay.line;
+                        if (!line) {
+                            return;
+                        }
+                        ctx.strokeStyle = "white";
+                        ctx.lineWidth = 2;
+                        ctx.beginPath();
+                        ctx.moveTo(line.x0, line.y0);
+                        ctx.lineTo(line.x1, line.y1);
+                        ctx.stroke();
+                    }
+                    Connections {
+                        target: probeOverlay
+                        function onLineChanged() { lineCanvas.requestPaint(); }
+                    }
+                }
+
+                // Hover readout next to the pointer
+                Text {
+                    visible: probeOverlay.hover !== null && !isNaN(probeOverlay.hoverValue)
+                    x: probeOverlay.hover ? Math.min(probeOverlay.hover.x + 14, probeOverlay.width - width) : 0
+                    y: probeOverlay.hover ? Math.max(probeOverlay.hover.y - height - 4, 0) : 0
+                    text: probeOverlay.format(probeOverlay.hoverValue)
+                    color: "white"
+                    font.pixelSize: 14
+                    style: Text.Outline
+                    styleColor: "black"
+                }
+            }
+
+            // Line profile chart, temperature along the line from its start (left) to its end
+            Rectangle {
+                id: profilePanel
+                visible: probeOverlay.visible && probeOverlay.profile.length > 1
+                anchors {
+                    left: parent.left
+                    bottom: parent.bottom
+                    margins: 10
+                }
+                width: Math.min(parent.width / 3, 360)
+                height: 120
+                color: "#e0ffffff"
+                border.color: "#cccccc"
+                radius: 5
+
+                property real low: 0
+                property real high: 0
+
+                Canvas {
+                    id: profileCanvas
+                    anchors.fill: parent
+                    anchors.margins: 8
+                    anchors.bottomMargin: 22
+                    onPaint: {
+                        var ctx = getContext("2d");
+                        ctx.clearRect(0, 0, width, height);
+                        var profile = probeOverlay.profile;
+                        if (profile.length < 2) {
+                            return;
+                        }
+                        var low = Math.min.apply(null, profile);
+                        var high = Math.max.apply(null, profile);
+                        var span = Math.max(high - low, 0.1);
+                        profilePanel.low = low;
+                        profilePanel.high = high;
+                        ctx.strokeStyle = "#d32f2f";
+                        ctx.lineWidth = 1.5;
+                        ctx.beginPath();
+                        for (var i = 0; i < profile.length; i++) {
+                            var px = i * width / (profile.length - 1);
+                            var py = height - (profile[i] - low) * height / span;
+                            if (i === 0) {
+                                ctx.moveTo(px, py);
+                            } else {
+                                ctx.lineTo(px, py);
+                            }
+                        }
+                        ctx.stroke();
+                    }
+                    Connections {
+                        target: probeOverlay
+                        function onProfileChanged() { profileCanvas.requestPaint(); }
+                    }
+                }
+
+                Text {
+                    anchors {
+                        left: parent.left
+                        bottom: parent.bottom
+                        margins: 4
+                    }
+                    text: "Profile " + profilePanel.low.toFixed(1) + " - " + profilePanel.high.toFixed(1) + "°C"
+                    font.pixelSize: 12
+                }
+            }
+
+            // Grid of sensors when several endpoints are configured
+            GridView {
+                id: sensorGrid
+                anchors.fill: parent
+                anchors.margins: 4
+                visible: count > 0
+                interactive: false
+                model: thermalController.endpointNames
+                property int columns: Math.max(Math.ceil(Math.sqrt(count)), 1)
+                cellWidth: width / columns
+                cellHeight: height / Math.max(Math.ceil(count / columns), 1)
+
+                delegate: Rectangle {
+                    width: sensorGrid.cellWidth
+                    height: sensorGrid.cellHeight
+                    color: "transparent"
+                    border.color: "lightgray"
+                    border.width: 1
+                    property string frameUrl: ""
+                    property string status: ""
+
+                    Image {
+                        anchors.fill: parent
+                        anchors.margins: 2
+                        fillMode: Image.PreserveAspectFit
+                        cache: false
+                        source: isStreaming ? frameUrl : ""
+                    }
+
+                    Text {
+                        anchors {
+                            left: parent.left
+                            bottom: parent.bottom
+                            margins: 6
+                        }
+                        text: modelData + (status ? " - " + status : "")
+                        color: status === "offline" ? "#d32f2f" : "black"
+                        font.pixelSize: 12
+                        style: Text.Outline
+                        styleColor: "white"
+                    }
+                }
             }
 
             // High temperature warning message
@@ -164,7 +451,7 @@ Window {
                 Text {
                     id: warningText
                     anchors.centerIn: parent
-                    text: "WARNING: Temperature above 100°C!"
+                    text: "WARNING: " + Object.values(activeAlarms).join("\n")
                     color: "#d32f2f"
                     font.bold: true
                     font.pixelSize: 14
@@ -199,15 +486,17 @@ Window {
                     text: checked ? qsTr("Stop Stream") : qsTr("Start Stream")
                     checked: false
 
-                    onCheckedChanged: {
+                    // Only user toggles, the state follows streamStateChanged (e.g. autostart)
+                    onToggled: {
                         thermalController.toggle_stream()
                     }
                 }   
 
                 // Stream Status
                 Label {
-                    text: streamToggle.checked ? qsTr("Stream Running") : qsTr("Stream Stopped")
-                    color: streamToggle.checked ? "green" : "red"
+                    text: thermalController.loading ? qsTr("Loading...")
+                          : streamToggle.checked ? qsTr("Stream Running") : qsTr("Stream Stopped")
+                    color: thermalController.loading ? "gray" : streamToggle.checked ? "green" : "red"
                 } 
 
                 Item {
@@ -330,6 +619,7 @@ Window {
                 id: enableTempWarning
                 text: checked ? qsTr("Enabled") : qsTr("Disabled")
                 checked: true
+                onToggled: thermalController.set_temp_warning(checked)
             }  
 
             Item {
@@ -360,18 +650,49 @@ Window {
     Connections {
         target: thermalController
 
-        function onFrameUpdated(frameBase64) {
-            thermalImage.source = frameBase64;
+        function onFrameUpdated(frameUrl) {
+            thermalImage.source = frameUrl;
+            // Readouts follow the new frame, without any the upsampled field is not computed
+            probeOverlay.refresh();
+        }
+
+        function onAlarmChanged(index, zone, active, message) {
+            var alarms = Object.assign({}, activeAlarms);
+            if (active) {
+                alarms[index + "/" + zone] = message;
+            } else {
+                delete alarms[index + "/" + zone];
+            }
+            activeAlarms = alarms;
+        }
+
+        function onAlarmsCleared() {
+            activeAlarms = {};
         }
 
         function onStreamStateChanged(running) {
             isStreaming = running;
+            streamToggle.checked = running;
             if (!running) {
                 // Clear the image when streaming stops
                 thermalImage.source = "";
             }
         }
 
+        function onGridFrameUpdated(index, frameUrl) {
+            var cell = sensorGrid.itemAtIndex(index);
+            if (cell) {
+                cell.frameUrl = frameUrl;
+            }
+        }
+
+        function onEndpointStatusUpdated(index, status) {
+            var cell = sensorGrid.itemAtIndex(index);
+            if (cell) {
+                cell.status = status;
+            }
+        }
+
         function onTemperatureDataUpdated(min, max, avg) {
             minTemp = min;
             maxTemp = max;
@@ -0,0 +1,12 @@
+"""
+Modules shared by the server and the client, changing one changes both sides:
+
+    frame_codec        wire formats of the ThermalData node and the ReadFrames batches
+    stage_metrics      per-stage latency histograms
+    sampling_profiler  stack sampling profiler
+    alarm_engine       region of interest alarms
+    frame_filter       temporal noise filter, dead-pixel correction and percentile ranging
+
+The server uses them from common/ next to its directory, the client installs them as a path
+dependency.
+"""
@@ -0,0 +1,234 @@
+"""
+Region of interest alarms on thermal frames.
+
+Shared by the server and the client.
+
+Zones are configured as dicts, coordinates are sensor pixels (x = column, y = row):
+
+    {"name": "motor", "rect": [x, y, width, height], "high": 80.0}
+    {"name": "bearing", "polygon": [[x, y], ...], "high": 70.0, "rate": 5.0, "debounce": 4}
+    {"name": "frame", "low": 5.0}                      # no rect/polygon: the whole frame
+
+    high        alarm when the zone maximum is above (degrees Celsius)
+    low         alarm when the zone minimum is below
+    rate        alarm when the zone maximum rises faster than this (degrees per second),
+                measured over the rate_window of the engine
+    hysteresis  degrees the maximum (minimum) has to fall below high (rise above low) to clear, default 0.5
+    debounce    consecutive frames violating a limit before the alarm is raised, default 3
+    clear_debounce  consecutive frames within the limits before it clears, default debounce
+    severity    OPC UA event severity (1-1000), default 700
+
+A pixel belongs to a polygon when its center is inside. Zones may overlap: every zone is compiled
+once into the flat indices of its pixels, a frame is gathered into one vector of zone pixels and
+reduced per zone with np.maximum/minimum.reduceat, the limits and debounce counters of all
+zones are then updated with array operations. Minima and rates are only computed when a zone has a
+low or rate limit, means only for events and state(). Only zones whose state changes cost Python code.
+"""
+import time
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+HIGH = 1
+LOW = 2
+RATE = 4
+CONDITION_NAMES = ((HIGH, "high"), (LOW, "low"), (RATE, "rate"))
+
+
+def zone_mask(zone: dict, frame_shape: Tuple[int, int]) -> np.ndarray:
+    """Boolean (rows, cols) mask of the pixels of a zone"""
+    rows, cols = frame_shape
+    if "rect" in zone:
+        x, y, width, height = (int(value) for value in zone["rect"])
+        mask = np.zeros(frame_shape, dtype=bool)
+        mask[max(y, 0):max(y + height, 0), max(x, 0):max(x + width, 0)] = True
+        return mask
+    if "polygon" in zone:
+        vertices = np.asarray(zone["polygon"], dtype=np.float64)
+        if vertices.ndim != 2 or vertices.shape[0] < 3 or vertices.shape[1] != 2:
+            raise ValueError(f"Zone {zone.get('name')}: polygon needs at least 3 [x, y] vertices")
+        # Even-odd rule on the pixel centers
+        y, x = np.mgrid[0:rows, 0:cols] + 0.5
+        inside = np.zeros(frame_shape, dtype=bool)
+        for (x0, y0), (x1, y1) in zip(vertices, np.roll(vertices, -1, axis=0)):
+            if y0 == y1:
+                continue
+            crosses = (y0 > y) != (y1 > y)
+            inside ^= crosses & (x < x0 + (y - y0) * (x1 - x0) / (y1 - y0))
+        return inside
+    return np.ones(frame_shape, dtype=bool)
+
+
+class AlarmEvent(NamedTuple):
+    """Alarm raised or cleared by a frame"""
+    index: int
+    zone: str
+    active: bool
+    conditions: Tuple[str, ...]  # limits violated when raised, empty when cleared
+    maximum: float
+    minimum: float
+    mean: float
+    rate: float
+    severity: int
+    timestamp: float
+
+    @property
+    def message(self) -> str:
+        if not self.active:
+            return f"{self.zone}: cleared (max {self.maximum:.1f} C)"
+        values = {"high": f"max {self.maximum:.1f} C", "low": f"min {self.minimum:.1f} C",
+                  "rate": f"rising {self.rate:.1f} C/s"}
+        return f"{self.zone}: " + ", ".join(f"{condition} ({values[condition]})" for condition in self.conditions)
+
+
+class AlarmEngine:
+    def __init__(self, zones: Sequence[dict], frame_shape: Tuple[int, int] = (24, 32), rate_window: float = 1.0,
+                 history: int = 64):
+        """
+        Evaluates all zones of one sensor on every frame
+
+        rate_window (seconds) is the time over which the rise of the zone maxima is measured, the
+        maxima of the last history frames are kept for it
+        """
+        if not zones:
+            raise ValueError("No alarm zones")
+        self.frame_shape = tuple(frame_shape)
+        self.names: List[str] = []
+        indices = []
+        for position, zone in enumerate(zones):
+            name = str(zone.get("name", f"Zone{position}"))
+            pixels = np.flatnonzero(zone_mask(zone, self.frame_shape))
+            if not len(pixels):
+                raise ValueError(f"Zone {name} contains no pixel")
+            self.names.append(name)
+            indices.append(pixels)
+
+        def limit(key, default=np.nan):
+            return np.array([zone.get(key, default) if zone.get(key) is not None else default for zone in zones],
+                            dtype=np.float64)
+
+        self.counts = np.array([len(pixels) for pixels in indices])
+        self.indices = np.concatenate(indices)
+        self.offsets = np.concatenate(([0], np.cumsum(self.counts)[:-1]))
+        self.high = limit("high")
+        self.low = limit("low")
+        self.rate_limit = limit("rate")
+        self.hysteresis = limit("hysteresis", 0.5)
+        self.debounce = limit("debounce", 3).astype(np.int64)
+        self.clear_debounce = np.where(np.isnan(limit("clear_debounce")), self.debounce,
+                                       limit("clear_debounce")).astype(np.int64)
+        self.severity = limit("severity", 700).astype(np.int64)
+
+        zone_count = len(self.names)
+        self.uses_low = bool(np.isfinite(self.low).any())
+        self.uses_rate = bool(np.isfinite(self.rate_limit).any())
+        self.rate_window = rate_window
+        self.history = np.full((history, zone_count), np.nan)
+        self.history_times = np.full(history, -np.inf)
+        self.frames = 0
+        self.tail = 0  # Oldest frame within rate_window
+        self.values = np.zeros(len(self.indices), dtype=np.float32)  # Zone pixels of the last frame
+
+        # State of the last frame, per zone
+        self.active = np.zeros(zone_count, dtype=bool)
+        self.pending = np.zeros(zone_count, dtype=np.int64)  # frames in a row disagreeing with active
+        self.conditions = np.zeros(zone_count, dtype=np.uint8)  # HIGH | LOW | RATE bits
+        self.maximum = np.full(zone_count, np.nan)
+        self.minimum = np.full(zone_count, np.nan)
+        self.rate = np.zeros(zone_count)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def evaluate(self, frame: np.ndarray, timestamp: Optional[float] = None) -> List[AlarmEvent]:
+        """Update every zone with a frame, returns the alarms raised or cleared by it"""
+        timestamp = time.time() if timestamp is None else timestamp
+        np.take(frame.reshape(-1), self.indices, out=self.values)
+        np.maximum.reduceat(self.values, self.offsets, out=self.maximum)
+        if self.uses_low:
+            np.minimum.reduceat(self.values, self.offsets, out=self.minimum)
+        if self.uses_rate:
+            self.__update_rate(timestamp)
+
+        # Raised alarms clear only past the hysteresis band, NaN limits never trigger
+        band = self.hysteresis * self.active
+        conditions = (self.maximum > self.high - band) * HIGH
+        if self.uses_low:
+            conditions |= (self.minimum < self.low + band) * LOW
+        if self.uses_rate:
+            conditions |= (self.rate > self.rate_limit) * RATE
+        violating = conditions != 0
+
+        self.pending = np.where(violating != self.active, self.pending + 1, 0)
+        changed = np.flatnonzero(self.pending >= np.where(self.active, self.clear_debounce, self.debounce))
+        self.conditions = np.where(self.active, self.conditions | conditions, conditions).astype(np.uint8)
+        if not len(changed):
+            return []
+
+        self.active[changed] = ~self.active[changed]
+        self.pending[changed] = 0
+        return [self.__event(int(index), timestamp) for index in changed]
+
+    def reset(self) -> List[AlarmEvent]:
+        """Forget the state of every zone, returns the clear events of the zones that were active"""
+        timestamp = time.time()
+        raised = np.flatnonzero(self.active)
+        self.active.fill(False)
+        events = [self.__event(int(index), timestamp) for index in raised]
+        self.pending.fill(0)
+        self.conditions.fill(0)
+        self.rate.fill(0.0)
+        self.history.fill(np.nan)
+        self.history_times.fill(-np.inf)
+        self.frames = 0
+        self.tail = 0
+        return events
+
+    def state(self) -> List[dict]:
+        """Values and alarm state of every zone after the last frame"""
+        minimum = np.minimum.reduceat(self.values, self.offsets)
+        mean = np.add.reduceat(self.values, self.offsets, dtype=np.float64) / self.counts
+        return [
+            {
+                "zone": name,
+                "active": bool(self.active[index]),
+                "conditions": self.__condition_names(self.conditions[index]) if self.active[index] else (),
+                "max": float(self.maximum[index]),
+                "min": float(minimum[index]),
+                "mean": float(mean[index]),
+                "rate": float(self.rate[index]),
+            }
+            for index, name in enumerate(self.names)
+        ]
+
+    def __update_rate(self, timestamp: float):
+        """Rise of the zone maxima per second since the oldest kept frame within rate_window"""
+        size = len(self.history_times)
+        # Frames arrive in time order, the oldest frame within the window only moves forward
+        self.tail = max(self.tail, self.frames - size + 1)
+        while self.tail < self.frames and self.history_times[self.tail % size] < timestamp - self.rate_window:
+            self.tail += 1
+        reference = self.tail % size
+        elapsed = timestamp - self.history_times[reference]
+        if self.tail < self.frames and elapsed > 0:
+            np.subtract(self.maximum, self.history[reference], out=self.rate)
+            self.rate /= elapsed
+        else:
+            self.rate.fill(0.0)
+        self.history[self.frames % size] = self.maximum
+        self.history_times[self.frames % size] = timestamp
+        self.frames += 1
+
+    def __event(self, index: int, timestamp: float) -> AlarmEvent:
+        active = bool(self.active[index])
+        values = self.values[self.offsets[index]:self.offsets[index] + self.counts[index]]
+        return AlarmEvent(
+            index, self.names[index], active,
+            self.__condition_names(self.conditions[index]) if active else (),
+            float(self.maximum[index]), float(values.min()), float(values.mean(dtype=np.float64)),
+            float(self.rate[index]), int(self.severity[index]), timestamp
+        )
+
+    @staticmethod
+    def __condition_names(bits: int) -> Tuple[str, ...]:
+        return tuple(name for bit, name in CONDITION_NAMES if bits & bit)
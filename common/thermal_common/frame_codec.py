@@ -0,0 +1,340 @@
+"""
+Wire formats of the ThermalData node.
+
+Shared by the server and the client.
+
+    double   Double array, one value per pixel (legacy format)
+    float    Float array, one value per pixel
+    float32  ByteString, frame header + packed little-endian float32 pixels
+    int16    ByteString, frame header + packed little-endian int16 centi-degrees
+    tiles    ByteString, frame header + tile header + (compressed) quantized keyframe or changed tiles
+
+tiles is a stream format: between keyframes only the tiles which changed are sent, use
+FrameEncoder on the writer side and FrameDecoder on the reader side.
+
+Batches of frames (ReadFrames method) are one ByteString: batch header, uint32 sequence numbers,
+float64 timestamps and the packed float32 or int16 pixels of all frames.
+"""
+import struct
+import zlib
+import numpy as np
+from asyncua import ua
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+FRAME_ROWS = 24
+FRAME_COLS = 32
+
+WIRE_FORMATS = ("double", "float", "float32", "int16", "tiles")
+
+# magic, version, format, rows, cols, sequence number, timestamp (unix seconds)
+FRAME_HEADER = struct.Struct("<2sBBHHId")
+FRAME_MAGIC = b"TF"
+FRAME_VERSION = 1
+
+FORMAT_FLOAT32 = 1
+FORMAT_INT16 = 2
+FORMAT_TILES = 3
+
+# flags, tile size, number of tiles in the body, quantization step (degrees per unit)
+TILE_HEADER = struct.Struct("<BBHf")
+TILE_KEYFRAME = 0x01
+TILE_COMPRESSION_SHIFT = 1
+TILE_COMPRESSIONS = {"none": 0, "zlib": 1, "lz4": 2}
+
+# magic, version, format, rows, cols, number of frames
+BATCH_HEADER = struct.Struct("<2sBBHHH")
+BATCH_MAGIC = b"TB"
+
+CENTI_DEGREES = 100.0
+INT16_MIN = np.iinfo(np.int16).min
+INT16_MAX = np.iinfo(np.int16).max
+
+
+class FrameHeader:
+    """Header of a binary encoded frame"""
+    __slots__ = ("format", "rows", "cols", "sequence", "timestamp")
+
+    def __init__(self, format, rows, cols, sequence, timestamp):
+        self.format = format
+        self.rows = rows
+        self.cols = cols
+        self.sequence = sequence
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return (f"FrameHeader(format={self.format}, shape=({self.rows}, {self.cols}), "
+                f"sequence={self.sequence}, timestamp={self.timestamp})")
+
+
+def encode_frame(frame, wire_format="float32", sequence=0, timestamp=0.0):
+    """Encode a thermal frame (any shape with 768 pixels) into a ua.Variant"""
+    frame = np.asarray(frame, dtype=np.float32)
+
+    if wire_format == "double":
+        return ua.Variant(frame.ravel().tolist(), ua.VariantType.Double)
+    if wire_format == "float":
+        return ua.Variant(frame.ravel().tolist(), ua.VariantType.Float)
+
+    rows, cols = (frame.shape if frame.ndim == 2 else (FRAME_ROWS, FRAME_COLS))
+    if wire_format == "float32":
+        code = FORMAT_FLOAT32
+        payload = frame.astype("<f4", copy=False).tobytes()
+    elif wire_format == "int16":
+        code = FORMAT_INT16
+        centi = np.rint(frame * CENTI_DEGREES)
+        payload = np.clip(centi, INT16_MIN, INT16_MAX).astype("<i2").tobytes()
+    elif wire_format == "tiles":
+        # A standalone tiles frame is always a keyframe
+        return TileEncoder().encode(frame, sequence, timestamp)
+    else:
+        raise ValueError(f"Unknown wire format: {wire_format}")
+
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, code, rows, cols, sequence & 0xFFFFFFFF, timestamp)
+    return ua.Variant(header + payload, ua.VariantType.ByteString)
+
+
+def decode_header(data):
+    """Parse the header of a binary encoded frame"""
+    try:
+        magic, version, code, rows, cols, sequence, timestamp = FRAME_HEADER.unpack_from(data)
+    except struct.error as e:
+        raise ValueError(f"Truncated frame header: {e}")
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ValueError(f"Invalid frame header: magic={magic!r} version={version}")
+    return FrameHeader(code, rows, cols, sequence, timestamp)
+
+
+def decode_frame(value):
+    """
+    Decode a ThermalData value into a (rows, cols) float32 array and its header.
+    Array formats have no header (None). float32 frames are a read-only view on the received bytes
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        header = decode_header(value)
+        count = header.rows * header.cols
+        if header.format == FORMAT_FLOAT32:
+            frame = np.frombuffer(value, dtype="<f4", count=count, offset=FRAME_HEADER.size)
+        elif header.format == FORMAT_INT16:
+            centi = np.frombuffer(value, dtype="<i2", count=count, offset=FRAME_HEADER.size)
+            frame = np.multiply(centi, 1.0 / CENTI_DEGREES, dtype=np.float32)
+        elif header.format == FORMAT_TILES:
+            flags, tile_size, count, step, body = decode_tile_header(value)
+            if not flags & TILE_KEYFRAME:
+                raise ValueError("Tile delta frames can only be decoded by a FrameDecoder")
+            frame = np.multiply(np.frombuffer(body, dtype="<i2", count=count * tile_size ** 2), step,
+                                dtype=np.float32)
+        else:
+            raise ValueError(f"Unknown frame format code: {header.format}")
+        return frame.reshape((header.rows, header.cols)), header
+
+    frame = np.asarray(value, dtype=np.float32)
+    return frame.reshape((FRAME_ROWS, FRAME_COLS)), None
+
+
+def encode_batch(frames, sequences, timestamps, wire_format="float32"):
+    """Pack (n, rows, cols) frames with their sequence numbers and timestamps into one ByteString"""
+    frames = np.asarray(frames, dtype=np.float32)
+    count, rows, cols = frames.shape
+    if wire_format in ("int16", "tiles"):
+        code = FORMAT_INT16
+        pixels = np.clip(np.rint(frames * CENTI_DEGREES), INT16_MIN, INT16_MAX).astype("<i2")
+    else:
+        code = FORMAT_FLOAT32
+        pixels = frames.astype("<f4", copy=False)
+    header = BATCH_HEADER.pack(BATCH_MAGIC, FRAME_VERSION, code, rows, cols, count)
+    data = (header + np.asarray(sequences, dtype="<u4").tobytes() + np.asarray(timestamps, dtype="<f8").tobytes()
+            + pixels.tobytes())
+    return ua.Variant(data, ua.VariantType.ByteString)
+
+
+def decode_batch(value):
+    """Unpack a batch into (n, rows, cols) float32 frames, uint32 sequence numbers and float64 timestamps"""
+    try:
+        magic, version, code, rows, cols, count = BATCH_HEADER.unpack_from(value)
+    except struct.error as e:
+        raise ValueError(f"Truncated batch header: {e}")
+    if magic != BATCH_MAGIC or version != FRAME_VERSION:
+        raise ValueError(f"Invalid batch header: magic={magic!r} version={version}")
+
+    offset = BATCH_HEADER.size
+    sequences = np.frombuffer(value, dtype="<u4", count=count, offset=offset)
+    offset += 4 * count
+    timestamps = np.frombuffer(value, dtype="<f8", count=count, offset=offset)
+    offset += 8 * count
+    if code == FORMAT_FLOAT32:
+        frames = np.frombuffer(value, dtype="<f4", count=count * rows * cols, offset=offset)
+    elif code == FORMAT_INT16:
+        centi = np.frombuffer(value, dtype="<i2", count=count * rows * cols, offset=offset)
+        frames = np.multiply(centi, 1.0 / CENTI_DEGREES, dtype=np.float32)
+    else:
+        raise ValueError(f"Unknown batch format code: {code}")
+    return frames.reshape((count, rows, cols)), sequences, timestamps
+
+
+def compress(data, compression):
+    if compression == TILE_COMPRESSIONS["zlib"]:
+        return zlib.compress(data, 6)
+    if compression == TILE_COMPRESSIONS["lz4"]:
+        return lz4_frame.compress(data)
+    return data
+
+
+def decompress(data, compression):
+    if compression == TILE_COMPRESSIONS["zlib"]:
+        return zlib.decompress(data)
+    if compression == TILE_COMPRESSIONS["lz4"]:
+        if lz4_frame is None:
+            raise ValueError("lz4 compressed frame received but the lz4 package is not installed")
+        return lz4_frame.decompress(data)
+    if compression != TILE_COMPRESSIONS["none"]:
+        raise ValueError(f"Unknown tile compression code: {compression}")
+    return data
+
+
+def decode_tile_header(value):
+    """Parse the tile header of a tiles frame, returns flags, tile size, tile count, step and the decompressed body"""
+    try:
+        flags, tile_size, count, step = TILE_HEADER.unpack_from(value, FRAME_HEADER.size)
+    except struct.error as e:
+        raise ValueError(f"Truncated tile header: {e}")
+    body = decompress(bytes(value[FRAME_HEADER.size + TILE_HEADER.size:]), flags >> TILE_COMPRESSION_SHIFT)
+    return flags, tile_size, count, step, body
+
+
+def tile_view(frame, tile_size):
+    """(tile rows, tile cols, tile_size, tile_size) view on a (rows, cols) frame"""
+    rows, cols = frame.shape
+    return frame.reshape(rows // tile_size, tile_size, cols // tile_size, tile_size).swapaxes(1, 2)
+
+
+class TileEncoder:
+    def __init__(self, tile_size=8, step=0.05, threshold=0.5, keyframe_interval=32, compression="zlib"):
+        """
+        Keyframe / changed tile encoder of a frame stream
+
+        Pixels are quantized to int16 multiples of step (degrees). A tile is sent when one of its
+        pixels differs by more than threshold (degrees) from what the reader has, so the reader's
+        error stays below threshold + step / 2. Every keyframe_interval frames, and on request,
+        the whole frame is sent
+        """
+        if compression not in TILE_COMPRESSIONS:
+            raise ValueError(f"Unknown tile compression: {compression}")
+        if compression == "lz4" and lz4_frame is None:
+            raise ValueError("lz4 compression needs the lz4 package")
+        self.tile_size = tile_size
+        self.step = step
+        self.threshold = int(round(threshold / step))
+        self.keyframe_interval = keyframe_interval
+        self.compression = TILE_COMPRESSIONS[compression]
+        self.reference = None  # Quantized frame as the reader has it
+        self.since_keyframe = 0
+        self.keyframe_requested = False
+
+    def request_keyframe(self):
+        """Send the next frame as a keyframe, e.g. for a reader which lost track"""
+        self.keyframe_requested = True
+
+    def encode(self, frame, sequence=0, timestamp=0.0):
+        frame = np.asarray(frame, dtype=np.float32)
+        if frame.ndim != 2:
+            frame = frame.reshape((FRAME_ROWS, FRAME_COLS))
+        rows, cols = frame.shape
+        if rows % self.tile_size or cols % self.tile_size:
+            raise ValueError(f"Frame shape {frame.shape} is not a multiple of the tile size {self.tile_size}")
+        quantized = np.clip(np.rint(frame / self.step), INT16_MIN, INT16_MAX).astype("<i2")
+
+        keyframe = (self.reference is None or self.reference.shape != quantized.shape or self.keyframe_requested
+                    or self.since_keyframe >= self.keyframe_interval)
+        if keyframe:
+            self.reference = quantized
+            self.since_keyframe = 0
+            self.keyframe_requested = False
+            count = quantized.size // self.tile_size ** 2
+            body = quantized.tobytes()
+        else:
+            tiles = tile_view(quantized, self.tile_size)
+            reference = tile_view(self.reference, self.tile_size)
+            difference = np.abs(tiles.astype(np.int32) - reference).max(axis=(2, 3))
+            tile_rows, tile_cols = np.nonzero(difference > self.threshold)
+            changed = tiles[tile_rows, tile_cols]
+            reference[tile_rows, tile_cols] = changed
+            self.since_keyframe += 1
+            count = len(tile_rows)
+            indices = (tile_rows * reference.shape[1] + tile_cols).astype("<u2")
+            body = indices.tobytes() + changed.tobytes()
+
+        flags = (TILE_KEYFRAME if keyframe else 0) | (self.compression << TILE_COMPRESSION_SHIFT)
+        header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, FORMAT_TILES, rows, cols, sequence & 0xFFFFFFFF, timestamp)
+        tile_header = TILE_HEADER.pack(flags, self.tile_size, count, self.step)
+        return ua.Variant(header + tile_header + compress(body, self.compression), ua.VariantType.ByteString)
+
+
+class FrameEncoder:
+    def __init__(self, wire_format="float32", **tile_options):
+        """Encoder of a frame stream in any wire format, tiles keeps the state of the reader"""
+        if wire_format not in WIRE_FORMATS:
+            raise ValueError(f"Unknown wire format: {wire_format}")
+        self.wire_format = wire_format
+        self.tiles = TileEncoder(**tile_options) if wire_format == "tiles" else None
+
+    def encode(self, frame, sequence=0, timestamp=0.0):
+        if self.tiles is not None:
+            return self.tiles.encode(frame, sequence, timestamp)
+        return encode_frame(frame, self.wire_format, sequence, timestamp)
+
+    def request_keyframe(self):
+        if self.tiles is not None:
+            self.tiles.request_keyframe()
+
+
+class FrameDecoder:
+    """
+    Decoder of a frame stream in any wire format. Tile deltas are applied to the frame built
+    from the last keyframe; after a sequence gap the decoder is out of sync and returns no
+    frame until the next keyframe
+    """
+    def __init__(self):
+        self.reference = None
+        self.step = None
+        self.sequence = None
+
+    @property
+    def synchronized(self):
+        return self.reference is not None
+
+    def reset(self):
+        self.reference = None
+        self.sequence = None
+
+    def decode(self, value):
+        """Decode a ThermalData value into a (rows, cols) float32 array (None while out of sync) and its header"""
+        if not isinstance(value, (bytes, bytearray, memoryview)):
+            return decode_frame(value)
+        header = decode_header(value)
+        if header.format != FORMAT_TILES:
+            return decode_frame(value)
+
+        flags, tile_size, count, step, body = decode_tile_header(value)
+        if flags & TILE_KEYFRAME:
+            pixels = header.rows * header.cols
+            self.reference = np.frombuffer(body, dtype="<i2", count=pixels).reshape((header.rows, header.cols)).copy()
+            self.step = step
+        elif self.reference is None:
+            return None, header
+        elif header.sequence != self.sequence:
+            if header.sequence != (self.sequence + 1) & 0xFFFFFFFF or self.reference.shape != (header.rows, header.cols):
+                # A delta was lost, wait for the next keyframe
+                self.reset()
+                return None, header
+            indices = np.frombuffer(body, dtype="<u2", count=count)
+            tiles = np.frombuffer(body, dtype="<i2", count=count * tile_size ** 2, offset=2 * count)
+            reference = tile_view(self.reference, tile_size)
+            tile_rows, tile_cols = np.divmod(indices, reference.shape[1])
+            reference[tile_rows, tile_cols] = tiles.reshape((count, tile_size, tile_size))
+
+        self.sequence = header.sequence
+        return np.multiply(self.reference, self.step, dtype=np.float32), header
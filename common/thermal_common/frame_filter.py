@@ -0,0 +1,234 @@
+"""
+Temporal noise filtering, dead-pixel correction and robust range estimation of thermal frames.
+
+Shared by the server and the client.
+
+The filter is configured as a dict, every key is optional:
+
+    {"mode": "kalman", "measurement_noise": 0.0625, "process_noise": 0.01, "step_threshold": 1.0}
+    {"mode": "ema", "alpha": 0.3}
+
+    mode               "ema", "kalman" or none (only the bad pixels are corrected)
+    alpha              weight of the new frame of the exponential moving average, default 0.3
+    process_noise      variance (degrees squared) the true temperature of a pixel drifts per frame, default 0.01
+    measurement_noise  variance of the sensor noise of a pixel, default 0.0625 (0.25 degrees rms)
+    step_threshold     pixels changing by more than this (degrees) take the new value at once,
+                       a moving hot object is not smeared over several frames, default 1.0 (0 disables)
+
+Bad pixels are listed as [x, y] sensor pixels (x = column, y = row), e.g. the pixels the MLX90640
+EEPROM flags as broken or outliers found on a uniform scene. Each is replaced by the median of its
+good 8-neighbours before the temporal filter, so a dead pixel neither pollutes the filter state nor
+stretches the colormap range.
+
+Everything is precomputed: the neighbours of the bad pixels are grouped by their count into index
+matrices, a frame is gathered into them with np.take, the medians are found with an in place
+ndarray.partition and written back with np.put. The filter state is updated in place in float32
+arrays, apply() creates no arrays. What it allocates is the working memory of ndarray.partition,
+about 3 KB per call whatever the array size (peak measured by benchmarks/bench_filter.py).
+"""
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+EMA = "ema"
+KALMAN = "kalman"
+FILTER_MODES = (EMA, KALMAN)
+
+
+def bad_pixel_mask(bad_pixels: Optional[Sequence[Sequence[int]]], frame_shape: Tuple[int, int]) -> np.ndarray:
+    """Boolean (rows, cols) mask of the [x, y] bad pixels"""
+    mask = np.zeros(frame_shape, dtype=bool)
+    for pixel in bad_pixels or ():
+        x, y = (int(value) for value in pixel)
+        if not (0 <= x < frame_shape[1] and 0 <= y < frame_shape[0]):
+            raise ValueError(f"Bad pixel [{x}, {y}] is outside the {frame_shape[1]}x{frame_shape[0]} frame")
+        mask[y, x] = True
+    return mask
+
+
+class NeighbourMedian:
+    """Replaces the pixels of a mask by the median of their good 8-neighbours, in place"""
+    def __init__(self, mask: np.ndarray):
+        rows, cols = mask.shape
+        groups = {}
+        for y, x in zip(*np.nonzero(mask)):
+            neighbours = [
+                (y + dy) * cols + (x + dx)
+                for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+                if (dy or dx) and 0 <= y + dy < rows and 0 <= x + dx < cols and not mask[y + dy, x + dx]
+            ]
+            if not neighbours:
+                raise ValueError(f"Bad pixel [{x}, {y}] has no good neighbour")
+            targets, sources = groups.setdefault(len(neighbours), ([], []))
+            targets.append(y * cols + x)
+            sources.append(neighbours)
+
+        # One group per neighbour count k: targets (n,), sources (n, k), gathered values (n, k) and views
+        # of their middle column(s), the same column twice for odd k
+        self.groups = []
+        for count, (targets, sources) in sorted(groups.items()):
+            values = np.empty((len(targets), count), dtype=np.float32)
+            low, high = (count - 1) // 2, count // 2
+            self.groups.append((
+                np.array(targets, dtype=np.intp),
+                np.array(sources, dtype=np.intp),
+                values,
+                np.empty(len(targets), dtype=np.float32),
+                sorted({low, high}),
+                values[:, low],
+                values[:, high],
+            ))
+        self.count = int(mask.sum())
+
+    def __call__(self, frame: np.ndarray):
+        """frame is a C-contiguous (rows, cols) float32 array"""
+        flat = frame.reshape(-1)
+        for targets, sources, values, median, kth, low, high in self.groups:
+            np.take(flat, sources, out=values)
+            values.partition(kth, axis=1)
+            # Through the contiguous median, np.put would copy the strided column
+            if len(kth) == 1:
+                np.copyto(median, low)
+            else:
+                # Even count: mean of the two middle values
+                np.add(low, high, out=median)
+                median *= 0.5
+            np.put(flat, targets, median)
+
+
+class PercentileRange:
+    """
+    (low, high) percentiles of frames, robust to single hot or dead pixels, found by partitioning a
+    preallocated copy of the frame (ndarray.partition itself allocates about 3 KB per call)
+    """
+    def __init__(self, percentiles: Sequence[float] = (1.0, 99.0), frame_shape: Tuple[int, int] = (24, 32)):
+        low, high = (float(value) for value in percentiles)
+        if not 0 <= low < high <= 100:
+            raise ValueError(f"Invalid range percentiles: {low}, {high}")
+        self.percentiles = (low, high)
+        size = frame_shape[0] * frame_shape[1]
+        # Nearest rank, no interpolation between neighbouring values
+        self.ranks = sorted({int(round(low / 100 * (size - 1))), int(round(high / 100 * (size - 1)))})
+        self.work = np.empty(size, dtype=np.float32)
+
+    def __call__(self, frame: np.ndarray) -> Tuple[float, float]:
+        np.copyto(self.work, frame.reshape(-1))
+        self.work.partition(self.ranks)
+        return float(self.work[self.ranks[0]]), float(self.work[self.ranks[-1]])
+
+
+class FrameFilter:
+    def __init__(self, mode: Optional[str] = None, frame_shape: Tuple[int, int] = (24, 32),
+                 bad_pixels: Optional[Sequence[Sequence[int]]] = None, alpha: float = 0.3,
+                 process_noise: float = 0.01, measurement_noise: float = 0.0625, step_threshold: float = 1.0,
+                 outputs: int = 1):
+        """
+        Per-pixel temporal filter of one sensor with dead-pixel correction
+
+        apply() returns the filtered frame in one of outputs preallocated arrays, used in turn: a
+        frame stays valid until outputs more frames were filtered (frames waiting in a queue need
+        as many outputs as the queue holds, plus one)
+        """
+        if mode is not None and mode not in FILTER_MODES:
+            raise ValueError(f"Unknown frame filter mode: {mode}")
+        if not 0 < alpha <= 1:
+            raise ValueError(f"alpha must be in (0, 1]: {alpha}")
+        self.mode = mode
+        self.frame_shape = tuple(frame_shape)
+        self.alpha = np.float32(alpha)
+        self.process_noise = np.float32(process_noise)
+        self.measurement_noise = np.float32(measurement_noise)
+        self.step_threshold = step_threshold
+
+        mask = bad_pixel_mask(bad_pixels, self.frame_shape)
+        self.correct = NeighbourMedian(mask) if mask.any() else None
+
+        self.frame = np.empty(self.frame_shape, dtype=np.float32)  # Input after dead-pixel correction
+        self.estimate = np.empty(self.frame_shape, dtype=np.float32)
+        self.variance = np.empty(self.frame_shape, dtype=np.float32)  # Kalman error variance
+        self.innovation = np.empty(self.frame_shape, dtype=np.float32)
+        self.gain = np.empty(self.frame_shape, dtype=np.float32)
+        self.magnitude = np.empty(self.frame_shape, dtype=np.float32)
+        self.step = np.empty(self.frame_shape, dtype=bool)
+        self.outputs = [np.empty(self.frame_shape, dtype=np.float32) for _ in range(max(outputs, 1))]
+        self.frames = 0
+        self.steps = 0  # pixel updates that bypassed the filter
+
+    @classmethod
+    def from_config(cls, config: Optional[dict], bad_pixels: Optional[Sequence[Sequence[int]]] = None,
+                    frame_shape: Tuple[int, int] = (24, 32), outputs: int = 1) -> Optional["FrameFilter"]:
+        """Filter of a frame_filter config dict, None when neither a mode nor bad pixels are configured"""
+        config = dict(config or {})
+        if not config.get("mode") and not bad_pixels:
+            return None
+        return cls(mode=config.pop("mode", None) or None, frame_shape=frame_shape, bad_pixels=bad_pixels,
+                   outputs=outputs, **config)
+
+    @property
+    def bad_pixels(self) -> int:
+        return self.correct.count if self.correct is not None else 0
+
+    def reset(self):
+        """Forget the filter state, the next frame is taken as it is (e.g. after a reconnect)"""
+        self.frames = 0
+
+    def apply(self, frame: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Correct and filter the next frame, into out (may be frame itself) or the next output array"""
+        if out is None:
+            out = self.outputs[self.frames % len(self.outputs)]
+        np.copyto(self.frame, frame)
+        if self.correct is not None:
+            self.correct(self.frame)
+
+        if self.mode is None:
+            np.copyto(out, self.frame)
+        else:
+            if self.frames == 0:
+                np.copyto(self.estimate, self.frame)
+                self.variance.fill(self.measurement_noise)
+            elif self.mode == KALMAN:
+                self.__kalman()
+            else:
+                self.__ema()
+            np.copyto(out, self.estimate)
+        self.frames += 1
+        return out
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "frames": self.frames, "bad_pixels": self.bad_pixels, "steps": self.steps}
+
+    def __ema(self):
+        innovation = self.innovation
+        np.subtract(self.frame, self.estimate, out=innovation)
+        if self.step_threshold:
+            self.__steps()
+            # Stepped pixels take the full innovation
+            np.copyto(self.gain, self.alpha)
+            np.copyto(self.gain, 1.0, where=self.step)
+            innovation *= self.gain
+        else:
+            innovation *= self.alpha
+        self.estimate += innovation
+
+    def __kalman(self):
+        # Random walk model: predict P += Q, gain K = P / (P + R), update x += K (z - x), P *= 1 - K
+        variance, gain, innovation = self.variance, self.gain, self.innovation
+        variance += self.process_noise
+        np.add(variance, self.measurement_noise, out=gain)
+        np.divide(variance, gain, out=gain)
+        np.subtract(self.frame, self.estimate, out=innovation)
+        if self.step_threshold:
+            self.__steps()
+            np.copyto(gain, 1.0, where=self.step)
+        np.multiply(innovation, gain, out=innovation)
+        self.estimate += innovation
+        np.subtract(1.0, gain, out=gain)
+        variance *= gain
+        if self.step_threshold:
+            # A stepped pixel is as uncertain as one measurement
+            np.copyto(variance, self.measurement_noise, where=self.step)
+
+    def __steps(self):
+        np.abs(self.innovation, out=self.magnitude)
+        np.greater(self.magnitude, self.step_threshold, out=self.step)
+        self.steps += int(np.count_nonzero(self.step))
@@ -0,0 +1,84 @@
+"""
+Opt-in sampling profiler for field debugging.
+
+Shared by the server and the client.
+
+A background thread takes the Python stack of every thread each interval seconds and counts
+identical stacks. No tracing hooks are installed, the profiled threads run at full speed and the
+cost is the sampling thread itself. collapsed() returns the counts in the folded format read by
+flamegraph.pl and speedscope, top() the functions seen most often on top of a stack.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.01, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.__run, name="sampling-profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def reset(self):
+        with self.lock:
+            self.stacks.clear()
+            self.samples = 0
+
+    def collapsed(self) -> str:
+        """One "thread;outer;...;inner count" line per distinct stack"""
+        with self.lock:
+            stacks = list(self.stacks.items())
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks))
+
+    def top(self, limit: int = 20) -> List[Tuple[str, float]]:
+        """(function, share of samples) of the innermost frames seen most often"""
+        with self.lock:
+            leaves = Counter()
+            for stack, count in self.stacks.items():
+                leaves[stack.rsplit(";", 1)[-1]] += count
+            samples = max(self.samples, 1)
+        return [(function, count / samples) for function, count in leaves.most_common(limit)]
+
+    def save(self, path: str):
+        with open(path, "w") as profile_file:
+            profile_file.write(self.collapsed())
+
+    def __run(self):
+        own = threading.get_ident()
+        while self.running:
+            time.sleep(self.interval)
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            sampled = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                functions = []
+                while frame is not None and len(functions) < self.max_depth:
+                    code = frame.f_code
+                    functions.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                functions.append(names.get(ident, str(ident)))
+                sampled.append(";".join(reversed(functions)))
+            with self.lock:
+                self.stacks.update(sampled)
+                self.samples += len(sampled)
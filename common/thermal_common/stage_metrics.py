@@ -0,0 +1,71 @@
+"""
+Rolling duration histograms of the frame pipeline stages.
+
+Shared by the server and the client.
+
+Every stage keeps the durations of its last `window` frames in a preallocated ring, recording
+is a lock and one array store. Percentiles are computed only when a snapshot is taken.
+"""
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+
+class RollingHistogram:
+    """Last window samples of one stage, in seconds"""
+    def __init__(self, window: int = 1024):
+        self.samples = np.zeros(window, dtype=np.float64)
+        self.count = 0  # Samples recorded since start, the ring holds the last window of them
+
+    def record(self, seconds: float):
+        self.samples[self.count % len(self.samples)] = seconds
+        self.count += 1
+
+    def summary(self) -> dict:
+        """count, p50/p95/p99 and max (ms) of the samples in the window"""
+        samples = self.samples[:min(self.count, len(self.samples))]
+        if not len(samples):
+            return {"count": 0, **{f"p{q}_ms": None for q in PERCENTILES}, "max_ms": None}
+        values = 1000 * np.percentile(samples, PERCENTILES)
+        return {
+            "count": self.count,
+            **{f"p{q}_ms": float(value) for q, value in zip(PERCENTILES, values)},
+            "max_ms": float(1000 * samples.max()),
+        }
+
+
+class StageMetrics:
+    def __init__(self, stages: Iterable[str] = (), window: int = 1024):
+        """
+        Duration histograms per stage name, safe to record from any thread
+
+        Stages listed up front appear in snapshots before their first sample, others are
+        created on their first record()
+        """
+        self.window = window
+        self.lock = threading.Lock()
+        self.histograms: Dict[str, RollingHistogram] = {stage: RollingHistogram(window) for stage in stages}
+
+    def record(self, stage: str, seconds: float):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = RollingHistogram(self.window)
+            histogram.record(seconds)
+
+    def since(self, stage: str, start: float) -> float:
+        """Record the time since start (time.perf_counter()) and return the current time"""
+        now = time.perf_counter()
+        self.record(stage, now - start)
+        return now
+
+    def snapshot(self, stage: Optional[str] = None) -> dict:
+        """Summary of every stage (or of one stage)"""
+        with self.lock:
+            if stage is not None:
+                return self.histograms[stage].summary()
+            return {name: histogram.summary() for name, histogram in self.histograms.items()}
@@ -0,0 +1,212 @@
+"""
+Sensor acquisition off the event loop.
+
+Every sensor is read on its own thread with deadline based pacing at the sensor frame rate.
+Frames are handed to the asyncio loop through a latest-value slot: if the loop falls behind,
+older frames are replaced instead of queued, and counted as skipped.
+"""
+import asyncio
+import threading
+import time
+
+from thermal_common.stage_metrics import PERCENTILES, StageMetrics
+
+# Stages timed for every frame: sensor read and noise filter on the acquisition thread, frame encoding,
+# the OPC UA write of ThermalData and the whole publish step (encode, writes, statistics, history)
+STAGES = ("read", "filter", "encode", "write", "publish")
+
+
+class LatestFrame:
+    """Thread-safe slot holding the newest frame"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.item = None
+        self.skipped = 0
+
+    def put(self, item):
+        with self.lock:
+            if self.item is not None:
+                self.skipped += 1
+            self.item = item
+
+    def take(self):
+        with self.lock:
+            item, self.item = self.item, None
+            return item
+
+
+class AcquisitionMetrics:
+    """Counters of one reporting window, read and reset with snapshot(), and rolling stage percentiles"""
+    def __init__(self, window=1024):
+        self.lock = threading.Lock()
+        self.stages = StageMetrics(STAGES, window)
+        self.reset()
+
+    def reset(self):
+        self.window_start = time.monotonic()
+        self.frames = 0
+        self.read_time = 0.0
+        self.read_time_max = 0.0
+        self.published = 0
+        self.publish_time = 0.0
+        self.publish_time_max = 0.0
+        self.errors = 0
+
+    def record_read(self, seconds):
+        with self.lock:
+            self.frames += 1
+            self.read_time += seconds
+            self.read_time_max = max(self.read_time_max, seconds)
+        self.stages.record("read", seconds)
+
+    def record_publish(self, seconds):
+        with self.lock:
+            self.published += 1
+            self.publish_time += seconds
+            self.publish_time_max = max(self.publish_time_max, seconds)
+        self.stages.record("publish", seconds)
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def snapshot(self):
+        """Return the rates and times (ms) of the window, and the stage percentiles (ms), and start a new window"""
+        stages = self.stages.snapshot()
+        with self.lock:
+            elapsed = max(time.monotonic() - self.window_start, 1e-9)
+            frames = max(self.frames, 1)
+            result = {
+                "rate": self.frames / elapsed,
+                "read_ms": 1000 * self.read_time / frames,
+                "read_max_ms": 1000 * self.read_time_max,
+                "publish_rate": self.published / elapsed,
+                "publish_ms": 1000 * self.publish_time / max(self.published, 1),
+                "publish_max_ms": 1000 * self.publish_time_max,
+                "errors": self.errors,
+            }
+            for stage, summary in stages.items():
+                for q in PERCENTILES:
+                    result[f"{stage}_p{q}_ms"] = summary[f"p{q}_ms"] or 0.0
+            self.reset()
+            return result
+
+
+class SensorAcquisition:
+    def __init__(self, sensor, loop, lead=0.25, error_delay=1.0, metrics_window=1024, frame_filter=None):
+        """
+        Read sensor frames on a dedicated thread
+
+        The thread wakes up lead * period before each frame deadline, so sensors which wait
+        for their data-ready flag (MLX90640) are polled briefly and the schedule does not drift.
+        A FrameFilter corrects and filters every frame in place on the acquisition thread
+        """
+        self.sensor = sensor
+        self.loop = loop
+        self.frame_rate = getattr(sensor, "frame_rate", None)
+        self.lead = lead
+        self.error_delay = error_delay
+        self.slot = LatestFrame()
+        self.metrics = AcquisitionMetrics(metrics_window)
+        self.frame_filter = frame_filter
+        self.ready = asyncio.Event()
+        self.running = False
+        self.thread = None
+        self.sequence = 0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.__run, name=f"acquisition-{self.sensor.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=2.0):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+        self.sensor.close()
+
+    async def next_frame(self):
+        """Wait for the newest (sequence, frame, timestamp, error) item from the acquisition thread"""
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            item = self.slot.take()
+            if item is not None:
+                return item
+
+    def __run(self):
+        period = 1.0 / self.frame_rate if self.frame_rate else 0.0
+        deadline = time.monotonic()
+
+        while self.running:
+            if period:
+                deadline += period
+                delay = deadline - period * self.lead - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -period:
+                    # More than one frame behind, restart the schedule instead of bursting
+                    deadline = time.monotonic()
+
+            start = time.perf_counter()
+            try:
+                frame = self.sensor.read_frame()
+            except Exception as e:
+                self.metrics.record_error()
+                self.__publish((self.sequence, None, time.time(), e))
+                time.sleep(self.error_delay)  # Avoid tight error loops
+                deadline = time.monotonic()
+                continue
+
+            self.metrics.record_read(time.perf_counter() - start)
+            if self.frame_filter is not None:
+                # Sensors return a new array per frame, it is filtered in place
+                start = time.perf_counter()
+                self.frame_filter.apply(frame, out=frame)
+                self.metrics.stages.since("filter", start)
+            self.sequence += 1
+            self.__publish((self.sequence, frame, time.time(), None))
+
+    def __publish(self, item):
+        self.slot.put(item)
+        try:
+            self.loop.call_soon_threadsafe(self.ready.set)
+        except RuntimeError:
+            # Loop closed during shutdown
+            self.running = False
+
+
+async def monitor_loop_lag(metrics, interval=0.05):
+    """Measure how long the event loop is blocked: the delay of a periodic wake-up"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        metrics.record(time.perf_counter() - start - interval)
+
+
+class LoopLagMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.samples = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def record(self, lag):
+        with self.lock:
+            lag = max(lag, 0.0)
+            self.samples += 1
+            self.total += lag
+            self.maximum = max(self.maximum, lag)
+
+    def snapshot(self):
+        with self.lock:
+            result = {
+                "lag_ms": 1000 * self.total / max(self.samples, 1),
+                "lag_max_ms": 1000 * self.maximum,
+            }
+            self.reset()
+            return result
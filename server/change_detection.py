@@ -0,0 +1,54 @@
+"""
+Deadband publishing: a frame is only written to OPC UA when it differs enough from the last
+published frame, or when the heartbeat interval has passed.
+"""
+import numpy as np
+
+from sensors import FRAME_COLS, FRAME_ROWS
+
+
+class ChangeDetector:
+    def __init__(self, deadband=0.0, pixels=0, heartbeat=1.0, frame_shape=(FRAME_ROWS, FRAME_COLS)):
+        """
+        Decide which frames are published
+
+        deadband: temperature change (degrees Celsius) that counts as a change, 0 publishes every frame
+        pixels: publish when at least this many pixels changed by more than deadband,
+                0 publishes when any pixel did (maximum absolute difference above deadband)
+        heartbeat: publish at least every heartbeat seconds, 0 disables it
+        """
+        self.deadband = deadband
+        self.pixels = pixels
+        self.heartbeat = heartbeat
+        self.enabled = deadband > 0 or pixels > 0
+
+        # Last published frame and preallocated scratch buffers
+        self.last = np.empty(frame_shape, dtype=np.float32)
+        self.difference = np.empty(frame_shape, dtype=np.float32)
+        self.changed = np.empty(frame_shape, dtype=bool)
+        self.last_publish = None
+
+        self.published = 0
+        self.suppressed = 0
+
+    def should_publish(self, frame, now):
+        """Check a frame captured at now (seconds), if it is published it becomes the reference"""
+        if self.enabled and self.last_publish is not None and not self.__heartbeat_due(now):
+            np.subtract(frame, self.last, out=self.difference)
+            np.abs(self.difference, out=self.difference)
+            if self.pixels:
+                np.greater(self.difference, self.deadband, out=self.changed)
+                publish = np.count_nonzero(self.changed) >= self.pixels
+            else:
+                publish = self.difference.max() > self.deadband
+            if not publish:
+                self.suppressed += 1
+                return False
+
+        self.last[...] = frame
+        self.last_publish = now
+        self.published += 1
+        return True
+
+    def __heartbeat_due(self, now):
+        return self.heartbeat > 0 and now - self.last_publish >= self.heartbeat
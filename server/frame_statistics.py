@@ -0,0 +1,49 @@
+"""
+Per frame statistics published next to the ThermalData node, so monitoring clients can
+subscribe to a few scalars instead of the whole frame.
+"""
+import numpy as np
+
+from sensors import FRAME_COLS, FRAME_ROWS
+
+
+class FrameStatistics:
+    def __init__(self, bins=16, low=-20.0, high=140.0, frame_shape=(FRAME_ROWS, FRAME_COLS)):
+        """
+        Min, max, mean, hotspot position and a coarse histogram of a frame
+
+        The histogram has bins equal bins between low and high (degrees Celsius), pixels outside
+        the range are counted in the first or last bin
+        """
+        if bins < 1 or high <= low:
+            raise ValueError("Histogram needs at least one bin and high > low")
+        self.bins = bins
+        self.low = float(low)
+        self.scale = bins / (high - low)
+        self.edges = np.linspace(low, high, bins + 1)
+        self.frame_shape = frame_shape
+
+        # Preallocated scratch buffers for the bin indices
+        pixels = frame_shape[0] * frame_shape[1]
+        self.position = np.empty(pixels, dtype=np.float32)
+        self.index = np.empty(pixels, dtype=np.intp)
+
+    def compute(self, frame):
+        flat = np.asarray(frame, dtype=np.float32).reshape(-1)
+        hotspot = int(flat.argmax())
+        row, col = divmod(hotspot, self.frame_shape[1])
+
+        np.subtract(flat, self.low, out=self.position)
+        self.position *= self.scale
+        np.clip(self.position, 0, self.bins - 1, out=self.position)
+        self.index[:] = self.position
+        histogram = np.bincount(self.index, minlength=self.bins)
+
+        return {
+            "min": float(flat.min()),
+            "max": float(flat[hotspot]),
+            "mean": float(flat.mean()),
+            "hotspot_row": row,
+            "hotspot_col": col,
+            "histogram": histogram,
+        }
@@ -0,0 +1,176 @@
+"""
+Frame history of the ThermalData nodes, served through OPC UA HistoryRead.
+
+Every historized node gets a preallocated ring of (timestamp, sequence, frame) records, kept in
+memory or in a memory mapped file. Retention is a number of frames, a time window or both.
+Frames are stored as float32 and encoded in the server wire format when they are read.
+"""
+import math
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+from asyncua import ua
+from asyncua.server.history import HistoryStorageInterface
+from thermal_common.frame_codec import decode_frame, encode_frame
+
+from sensors import FRAME_COLS, FRAME_ROWS
+
+RECORD_DTYPE = np.dtype([
+    ("timestamp", np.float64),
+    ("sequence", np.uint32),
+    ("frame", np.float32, (FRAME_ROWS, FRAME_COLS)),
+])
+
+
+def history_capacity(frames=0, seconds=0.0, frame_rate=None):
+    """Number of records needed for the retention, a time window needs the frame rate (default 32)"""
+    capacity = int(frames or 0)
+    if seconds:
+        capacity = max(capacity, math.ceil(seconds * (frame_rate or 32.0)) + 1)
+    return capacity
+
+
+def to_posix(value):
+    """POSIX time of an OPC UA DateTime, None if it is unset (the Windows epoch)"""
+    if value is None or value == ua.get_win_epoch():
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class FrameRing:
+    def __init__(self, capacity, seconds=0.0, path=None):
+        """
+        Preallocated ring of frame records, memory mapped when a file path is given
+        """
+        if capacity < 1:
+            raise ValueError("History capacity must be at least 1")
+        self.capacity = capacity
+        self.seconds = seconds
+        self.path = path
+        if path:
+            # Recreated at every start, the file only moves the frames out of the RAM
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="w+", shape=(capacity,))
+        else:
+            self.records = np.zeros(capacity, dtype=RECORD_DTYPE)
+        self.write_count = 0
+
+    def append(self, frame, sequence, timestamp):
+        record = self.records[self.write_count % self.capacity]
+        record["timestamp"] = timestamp
+        record["sequence"] = sequence & 0xFFFFFFFF
+        record["frame"] = frame
+        self.write_count += 1
+
+    def __len__(self):
+        return min(self.write_count, self.capacity)
+
+    def indices(self, now=None):
+        """Ring indices of the retained records, oldest first"""
+        count = len(self)
+        indices = (self.write_count - count + np.arange(count)) % self.capacity
+        if self.seconds and count:
+            now = datetime.now(timezone.utc).timestamp() if now is None else now
+            timestamps = self.records["timestamp"][indices]
+            indices = indices[np.searchsorted(timestamps, now - self.seconds):]
+        return indices
+
+    def since(self, sequence, limit=None):
+        """Records published after the sequence number (uint32, wraps around), oldest first"""
+        indices = self.indices()
+        if limit:
+            indices = indices[-limit:]
+        gaps = (self.records["sequence"][indices].astype(np.int64) - sequence) & 0xFFFFFFFF
+        return self.records[indices[(gaps > 0) & (gaps < 0x80000000)]]
+
+    def select(self, start=None, end=None):
+        """
+        Ring indices between the POSIX times start and end (inclusive), following HistoryRead:
+        oldest first, or newest first when start is after end or only end is given
+        """
+        indices = self.indices()
+        timestamps = self.records["timestamp"][indices]
+        if start is not None and end is not None and start > end:
+            lower, upper, reverse = end, start, True
+        else:
+            lower, upper, reverse = start, end, start is None
+        first = 0 if lower is None else np.searchsorted(timestamps, lower, side="left")
+        last = len(indices) if upper is None else np.searchsorted(timestamps, upper, side="right")
+        indices = indices[first:last]
+        return indices[::-1] if reverse else indices
+
+    def flush(self):
+        if isinstance(self.records, np.memmap):
+            self.records.flush()
+
+
+class FrameHistory(HistoryStorageInterface):
+    def __init__(self, wire_format, path=None, max_history_data_response_size=1000):
+        """
+        History storage of the ThermalData nodes
+
+        Frames are appended by the acquisition coroutines (append), data change subscriptions of
+        the server history manager work too (save_node_value). Reads return at most
+        max_history_data_response_size frames, clients continue with the continuation point
+        """
+        super().__init__(max_history_data_response_size)
+        self.wire_format = wire_format
+        self.path = path
+        self.rings = {}
+
+    async def init(self):
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+
+    async def new_historized_node(self, node_id, period, count=0, frame_rate=None, name=None):
+        seconds = period.total_seconds() if period else 0.0
+        path = os.path.join(self.path, f"{name or node_id.Identifier}.history") if self.path else None
+        self.rings[node_id] = FrameRing(history_capacity(count, seconds, frame_rate), seconds, path)
+
+    def append(self, node_id, frame, sequence, timestamp):
+        self.rings[node_id].append(frame, sequence, timestamp)
+
+    async def save_node_value(self, node_id, datavalue):
+        frame, header = decode_frame(datavalue.Value.Value)
+        timestamp = datavalue.SourceTimestamp or datavalue.ServerTimestamp
+        self.append(node_id, frame, header.sequence if header else 0, to_posix(timestamp))
+
+    async def read_node_history(self, node_id, start, end, nb_values):
+        if node_id not in self.rings:
+            return [], None
+        ring = self.rings[node_id]
+        indices = ring.select(to_posix(start), to_posix(end))
+        if nb_values:
+            indices = indices[:nb_values]
+
+        cont = None
+        if len(indices) > self.max_history_data_response_size:
+            cont = datetime.fromtimestamp(ring.records["timestamp"][indices[self.max_history_data_response_size]],
+                                          timezone.utc)
+            indices = indices[:self.max_history_data_response_size]
+
+        results = []
+        for record in ring.records[indices]:
+            timestamp = float(record["timestamp"])
+            source_time = datetime.fromtimestamp(timestamp, timezone.utc)
+            results.append(ua.DataValue(
+                encode_frame(record["frame"], self.wire_format, int(record["sequence"]), timestamp),
+                SourceTimestamp=source_time,
+                ServerTimestamp=source_time
+            ))
+        return results, cont
+
+    async def new_historized_event(self, source_id, evtypes, period, count=0):
+        raise NotImplementedError("Events are not historized")
+
+    async def save_event(self, event):
+        pass
+
+    async def read_event_history(self, source_id, start, end, nb_values, evfilter):
+        return [], None
+
+    async def stop(self):
+        for ring in self.rings.values():
+            ring.flush()
@@ -0,0 +1,137 @@
+"""
+Sensor backends of the thermal server.
+
+Every backend implements ThermalSensor: read_frame() is a blocking call returning the next
+(24, 32) float32 frame in degrees Celsius. The server runs it on an acquisition thread paced at
+frame_rate so a slow sensor never blocks the loop. New backends are added with register_sensor_type().
+"""
+import math
+import time
+import numpy as np
+
+FRAME_ROWS = 24
+FRAME_COLS = 32
+
+# Supported MLX90640 refresh rates (Hz) and their adafruit_mlx90640.RefreshRate names
+MLX_REFRESH_RATES = {
+    0.5: "REFRESH_0_5_HZ",
+    1: "REFRESH_1_HZ",
+    2: "REFRESH_2_HZ",
+    4: "REFRESH_4_HZ",
+    8: "REFRESH_8_HZ",
+    16: "REFRESH_16_HZ",
+    32: "REFRESH_32_HZ",
+    64: "REFRESH_64_HZ",
+}
+
+
+class ThermalSensor:
+    """Interface of a sensor backend"""
+    name = "sensor"
+    frame_rate = None  # Full frames per second, None lets read_frame() pace the acquisition
+
+    def read_frame(self):
+        """Block until the next frame is available and return it as (24, 32) float32"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release the sensor"""
+        pass
+
+
+class MLX90640Sensor(ThermalSensor):
+    """MLX90640 connected over I2C, the board libraries are only imported when used"""
+    # One busio.I2C per pin pair, sensors on the same bus share it
+    _buses = {}
+
+    def __init__(self, name, scl="SCL", sda="SDA", address=0x33, frequency=400000, refresh_rate=4):
+        import adafruit_mlx90640
+
+        if refresh_rate not in MLX_REFRESH_RATES:
+            raise ValueError(f"Unsupported MLX90640 refresh rate: {refresh_rate}")
+
+        self.name = name
+        self.refresh_rate = refresh_rate
+        # The refresh rate counts subpages, getFrame() reads both chess pattern subpages
+        self.frame_rate = refresh_rate / 2
+        self.mlx = adafruit_mlx90640.MLX90640(self.__get_bus(scl, sda, frequency), address=address)
+        self.mlx.refresh_rate = getattr(adafruit_mlx90640.RefreshRate, MLX_REFRESH_RATES[refresh_rate])
+        self.frame = [0] * (FRAME_ROWS * FRAME_COLS)
+
+    @classmethod
+    def __get_bus(cls, scl, sda, frequency):
+        if (scl, sda) not in cls._buses:
+            import board
+            import busio
+            cls._buses[(scl, sda)] = busio.I2C(getattr(board, scl), getattr(board, sda), frequency=frequency)
+        return cls._buses[(scl, sda)]
+
+    def read_frame(self):
+        """Capture a frame from the sensor (blocks for the I2C transfer)"""
+        self.mlx.getFrame(self.frame)
+        return np.array(self.frame, dtype=np.float32).reshape((FRAME_ROWS, FRAME_COLS))
+
+
+class SimulatedSensor(ThermalSensor):
+    """
+    Synthetic MLX90640: room temperature background with moving hot spots and noise.
+    read_frame() blocks until the next frame is due at frame_rate (0 returns frames as fast as possible)
+    """
+    def __init__(self, name, ambient=22.0, hotspots=2, hotspot_temperature=45.0, noise=0.25,
+                 frame_rate=32.0, seed=None):
+        self.name = name
+        self.ambient = ambient
+        self.hotspot_temperature = hotspot_temperature
+        self.noise = noise
+        self.frame_rate = frame_rate
+        self.rng = np.random.default_rng(seed)
+        self.rows, self.cols = np.mgrid[0:FRAME_ROWS, 0:FRAME_COLS].astype(np.float32)
+
+        # Every hot spot moves on its own Lissajous path
+        self.speeds = self.rng.uniform(0.2, 1.0, (hotspots, 2))
+        self.phases = self.rng.uniform(0, 2 * math.pi, (hotspots, 2))
+        self.sizes = self.rng.uniform(6.0, 20.0, hotspots)
+
+        self.start = time.monotonic()
+        self.deadline = self.start
+
+    def read_frame(self):
+        """Wait for the next frame deadline and render the scene at that time"""
+        if self.frame_rate:
+            self.deadline += 1.0 / self.frame_rate
+            delay = self.deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -1.0:
+                # Far behind (e.g. suspended), restart the schedule instead of bursting
+                self.deadline = time.monotonic()
+
+        t = time.monotonic() - self.start
+        frame = np.full((FRAME_ROWS, FRAME_COLS), self.ambient, dtype=np.float32)
+        for (speed_y, speed_x), (phase_y, phase_x), size in zip(self.speeds, self.phases, self.sizes):
+            cy = FRAME_ROWS / 2 + FRAME_ROWS / 3 * math.sin(t * speed_y + phase_y)
+            cx = FRAME_COLS / 2 + FRAME_COLS / 3 * math.cos(t * speed_x + phase_x)
+            distance = (self.rows - cy) ** 2 + (self.cols - cx) ** 2
+            frame += (self.hotspot_temperature - self.ambient) * np.exp(-distance / size)
+        frame += self.rng.normal(0.0, self.noise, frame.shape).astype(np.float32)
+        return frame
+
+
+SENSOR_TYPES = {
+    "mlx90640": MLX90640Sensor,
+    "simulated": SimulatedSensor,
+}
+
+
+def register_sensor_type(sensor_type, factory):
+    """Make a ThermalSensor implementation available as "type" in the sensor configuration"""
+    SENSOR_TYPES[sensor_type] = factory
+
+
+def create_sensor(config):
+    """Create a sensor from its configuration entry, e.g. {"name": "Sensor0", "type": "simulated"}"""
+    options = dict(config)
+    sensor_type = options.pop("type", "mlx90640")
+    if sensor_type not in SENSOR_TYPES:
+        raise ValueError(f"Unknown sensor type: {sensor_type}")
+    return SENSOR_TYPES[sensor_type](**options)
@@ -1,66 +1,477 @@
+import argparse
 import asyncio
-import board
-import busio
-import adafruit_mlx90640
+import json
+import os
+import sys
+import time
 import numpy as np
+from datetime import datetime, timedelta, timezone
 from asyncua import Server, ua
 
+# Wire format, stage metrics, profiler, alarm engine and frame filter are shared with the client
+# in common/thermal_common, used from this checkout unless installed
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
 
-async def read_thermal_data(mlx, thermal_node):
-    """ Reads MLX90640 data and updates OPC UA node at 32Hz """
-    frame = [0] * 768  # 32x24 pixels
+from thermal_common.alarm_engine import AlarmEngine
+from thermal_common.frame_codec import WIRE_FORMATS, FrameEncoder, encode_batch, encode_frame
+from thermal_common.frame_filter import FrameFilter
+from thermal_common.sampling_profiler import SamplingProfiler
+from thermal_common.stage_metrics import PERCENTILES
+
+from acquisition import LoopLagMetrics, SensorAcquisition, monitor_loop_lag
+from change_detection import ChangeDetector
+from frame_statistics import FrameStatistics
+from history import FrameHistory, FrameRing
+from sensors import create_sensor
+
+# Used when no configuration file exists: one MLX90640 on board.SCL/SDA, as before
+DEFAULT_CONFIG = {
+    "endpoint": "opc.tcp://0.0.0.0:4840/freeopcua/server/",
+    "server_name": "BeagleBone Thermal Server",
+    "namespace": "BeagleBoneThermal",
+    "wire_format": "float32",
+    "metrics_interval": 10,
+    "metrics_window": 1024,
+    "profile_path": None,
+    "profiler_interval": 0.01,
+    "history_frames": 320,
+    "history_seconds": 0,
+    "history_path": None,
+    "frame_statistics": True,
+    "histogram_bins": 16,
+    "histogram_range": [-20.0, 140.0],
+    "deadband": 0.0,
+    "deadband_pixels": 0,
+    "heartbeat_interval": 1.0,
+    "tile_size": 8,
+    "tile_step": 0.05,
+    "tile_threshold": 0.5,
+    "tile_compression": "zlib",
+    "keyframe_interval": 32,
+    "batch_frames": 32,
+    "alarm_zones": {},
+    "alarm_rate_window": 1.0,
+    "alarm_value_interval": 1.0,
+    "frame_filter": None,
+    "bad_pixels": {},
+    "sensors": [
+        {"name": "Sensor0", "type": "mlx90640", "scl": "SCL", "sda": "SDA", "frequency": 400000, "refresh_rate": 4}
+    ]
+}
+
+# Scalar frame statistics: key of FrameStatistics.compute() -> browse name and type
+STATISTICS_VARIABLES = {
+    "min": ("Min", ua.VariantType.Double),
+    "max": ("Max", ua.VariantType.Double),
+    "mean": ("Mean", ua.VariantType.Double),
+    "hotspot_row": ("HotspotRow", ua.VariantType.Int32),
+    "hotspot_col": ("HotspotColumn", ua.VariantType.Int32),
+}
+
+# Per sensor metric variables: key of AcquisitionMetrics.snapshot() -> browse name
+SENSOR_METRICS = {
+    "rate": "AcquisitionRate",
+    "read_ms": "ReadTime",
+    "read_max_ms": "ReadTimeMax",
+    "publish_rate": "PublishRate",
+    "publish_ms": "PublishTime",
+    "publish_max_ms": "PublishTimeMax",
+    "skipped": "SkippedFrames",
+    "suppressed": "SuppressedFrames",
+    "errors": "ReadErrors",
+}
+# Rolling percentiles of the stage durations (ms) over the last metrics_window frames, e.g. ReadTimeP95
+STAGE_METRICS = {"read": "ReadTime", "filter": "FilterTime", "encode": "EncodeTime", "write": "WriteTime", "publish": "PublishTime"}
+SENSOR_METRICS.update({
+    f"{stage}_p{q}_ms": f"{browse_name}P{q}" for stage, browse_name in STAGE_METRICS.items() for q in PERCENTILES
+})
+
+
+def load_config(path):
+    """Load the server configuration, missing keys fall back to DEFAULT_CONFIG"""
+    config = dict(DEFAULT_CONFIG)
+    if path and os.path.exists(path):
+        with open(path, 'r') as config_file:
+            config.update(json.load(config_file))
+    else:
+        print(f"Config file {path} not found, using the default configuration")
+    return config
+
+
+async def add_sensor_nodes(objects, ns_idx, name, wire_format):
+    """ Creates the object node of a sensor with its ThermalData, Timestamp, Status and metric variables """
+    sensor_node = await objects.add_object(ns_idx, name)
+
+    # Thermal data, its data type follows the wire format
+    thermal_node = await sensor_node.add_variable(
+        ns_idx,
+        "ThermalData",
+        encode_frame(np.zeros(768, dtype=np.float32), wire_format)
+    )
+    timestamp_node = await sensor_node.add_variable(
+        ns_idx, "Timestamp", ua.Variant(datetime.now(timezone.utc), ua.VariantType.DateTime)
+    )
+    status_node = await sensor_node.add_variable(
+        ns_idx, "Status", ua.Variant("starting", ua.VariantType.String)
+    )
+    # Make the node writable so it can be updated
+    await thermal_node.set_writable()
+
+    # Acquisition metrics, refreshed every metrics_interval seconds
+    metric_nodes = {}
+    for key, browse_name in SENSOR_METRICS.items():
+        metric_nodes[key] = await sensor_node.add_variable(ns_idx, browse_name, ua.Variant(0.0, ua.VariantType.Double))
+
+    return {"object": sensor_node, "thermal": thermal_node, "timestamp": timestamp_node, "status": status_node,
+            "metrics": metric_nodes}
+
+
+async def add_statistics_nodes(sensor_node, ns_idx, statistics):
+    """ Creates the Statistics object of a sensor: Min, Max, Mean, HotspotRow, HotspotColumn and Histogram """
+    statistics_node = await sensor_node.add_object(ns_idx, "Statistics")
+    nodes = {}
+    for key, (browse_name, variant_type) in STATISTICS_VARIABLES.items():
+        nodes[key] = await statistics_node.add_variable(ns_idx, browse_name, ua.Variant(0, variant_type))
+    nodes["histogram"] = await statistics_node.add_variable(
+        ns_idx, "Histogram", ua.Variant([0] * statistics.bins, ua.VariantType.UInt32)
+    )
+    # Static, bins + 1 edges in degrees Celsius
+    await statistics_node.add_property(
+        ns_idx, "HistogramEdges", ua.Variant(statistics.edges.tolist(), ua.VariantType.Double)
+    )
+    return nodes
+
+
+async def write_statistics(nodes, values, source_time):
+    """ Writes the statistics of a frame with the source timestamp of the frame """
+    for key, (_, variant_type) in STATISTICS_VARIABLES.items():
+        await nodes[key].write_value(ua.DataValue(ua.Variant(values[key], variant_type), SourceTimestamp=source_time))
+    await nodes["histogram"].write_value(
+        ua.DataValue(ua.Variant(values["histogram"].tolist(), ua.VariantType.UInt32), SourceTimestamp=source_time)
+    )
+
+
+def create_encoder(config):
+    """ Frame encoder of one sensor, the tiles format sends keyframes and changed tiles """
+    if config["wire_format"] != "tiles":
+        return FrameEncoder(config["wire_format"])
+    return FrameEncoder(
+        "tiles",
+        tile_size=config["tile_size"],
+        step=config["tile_step"],
+        threshold=config["tile_threshold"],
+        keyframe_interval=config["keyframe_interval"],
+        compression=config["tile_compression"]
+    )
+
+
+async def add_keyframe_method(sensor_node, ns_idx, encoder):
+    """ RequestKeyframe() lets a tiles client which missed a frame resynchronize without waiting for the next keyframe """
+    def request_keyframe(parent):
+        encoder.request_keyframe()
+        return []
+
+    await sensor_node.add_method(ns_idx, "RequestKeyframe", request_keyframe, [], [])
+
+
+async def add_batch_method(sensor_node, ns_idx, batch, wire_format):
+    """ ReadFrames(after) returns the frames published after a sequence number (up to batch_frames) in one round trip """
+    def read_frames(parent, after):
+        records = batch.since(after.Value)
+        return [encode_batch(records["frame"], records["sequence"], records["timestamp"], wire_format)]
+
+    await sensor_node.add_method(
+        ns_idx, "ReadFrames", read_frames, [ua.VariantType.UInt32], [ua.VariantType.ByteString]
+    )
+
+
+async def add_deadband_nodes(sensor_node, ns_idx, detector):
+    """ Deadband (degrees) and DeadbandPixels tell clients that unchanged frames are skipped, a gap in the timestamps is no lost frame """
+    await sensor_node.add_variable(ns_idx, "Deadband", ua.Variant(float(detector.deadband), ua.VariantType.Double))
+    await sensor_node.add_variable(ns_idx, "DeadbandPixels", ua.Variant(int(detector.pixels), ua.VariantType.Int32))
+
+
+async def add_alarm_nodes(server, sensor_node, ns_idx, engine):
+    """
+    Creates the Alarms object of a sensor, the source of its alarm events, with one object per zone
+    holding Active, Conditions and Max (refreshed every alarm_value_interval seconds)
+    """
+    alarms_node = await sensor_node.add_object(ns_idx, "Alarms")
+    zones = []
+    for name in engine.names:
+        zone_node = await alarms_node.add_object(ns_idx, name)
+        zones.append({
+            "object": zone_node,
+            "active": await zone_node.add_variable(ns_idx, "Active", ua.Variant(False, ua.VariantType.Boolean)),
+            "conditions": await zone_node.add_variable(ns_idx, "Conditions", ua.Variant("", ua.VariantType.String)),
+            "max": await zone_node.add_variable(ns_idx, "Max", ua.Variant(0.0, ua.VariantType.Double)),
+        })
+    generator = await server.get_event_generator(ua.ObjectIds.AlarmConditionType, alarms_node)
+    return {"engine": engine, "zones": zones, "generator": generator, "values_written": 0.0}
+
+
+async def evaluate_alarms(alarms, name, thermal_array, captured, value_interval):
+    """ Evaluates the alarm zones on a frame, state changes are written at once and sent as AlarmConditionType events """
+    engine = alarms["engine"]
+    for event in engine.evaluate(thermal_array, captured):
+        zone = alarms["zones"][event.index]
+        await zone["active"].write_value(ua.Variant(event.active, ua.VariantType.Boolean))
+        await zone["conditions"].write_value(ua.Variant(",".join(event.conditions), ua.VariantType.String))
+
+        alarm = alarms["generator"].event
+        alarm.SourceNode = zone["object"].nodeid
+        alarm.SourceName = f"{name}/{event.zone}"
+        alarm.ConditionName = event.zone
+        alarm.Severity = event.severity if event.active else 100
+        alarm.ActiveState = ua.LocalizedText("Active" if event.active else "Inactive")
+        setattr(alarm, "ActiveState/Id", event.active)
+        await alarms["generator"].trigger(datetime.fromtimestamp(event.timestamp, timezone.utc), event.message)
+        print(f"Alarm {name}/{event.message}")
+
+    # Zone maxima change every frame, they are written at a lower rate
+    if captured - alarms["values_written"] >= value_interval:
+        alarms["values_written"] = captured
+        for zone, maximum in zip(alarms["zones"], engine.maximum):
+            await zone["max"].write_value(ua.Variant(float(maximum), ua.VariantType.Double))
+
+
+async def write_status(nodes, status):
+    await nodes["status"].write_value(ua.Variant(status, ua.VariantType.String))
+
+
+async def enable_history(history, node, name, frame_rate, config):
+    """ Makes the ThermalData node readable with HistoryRead, frames are appended by read_thermal_data """
+    await node.write_attribute(ua.AttributeIds.Historizing, ua.DataValue(True))
+    await node.set_attr_bit(ua.AttributeIds.AccessLevel, ua.AccessLevel.HistoryRead)
+    await node.set_attr_bit(ua.AttributeIds.UserAccessLevel, ua.AccessLevel.HistoryRead)
+    period = timedelta(seconds=config["history_seconds"]) if config["history_seconds"] else None
+    await history.new_historized_node(node.nodeid, period, config["history_frames"], frame_rate, name)
+
+
+async def read_thermal_data(publisher, history=None, statistics=None, alarm_value_interval=1.0):
+    """
+    Publishes the frames of one sensor's acquisition thread on its OPC UA nodes as they arrive,
+    frames within the deadband of the last published frame are skipped until the heartbeat is due.
+    Alarm zones are evaluated on every frame, also on the skipped ones
+    """
+    acquisition = publisher["acquisition"]
+    nodes = publisher["nodes"]
+    encoder = publisher["encoder"]
+    detector = publisher["detector"]
+    batch = publisher["batch"]
+    alarms = publisher["alarms"]
+    name = acquisition.sensor.name
+    status = None
 
     while True:
-        try:
-            mlx.getFrame(frame)  # Capture frame from sensor
-            thermal_array = np.array(frame, dtype=np.float32)
+        # Pacing is done by the acquisition thread, the loop only waits for the newest frame
+        _, thermal_array, captured, error = await acquisition.next_frame()
+        if error is not None:
+            print(f"Error reading sensor {name}:", error)
+            status = f"error: {error}"
+            await write_status(nodes, status)
+            continue
 
-            # Update OPC UA node
-            await thermal_node.write_value(
-                ua.Variant(thermal_array.tolist(), ua.VariantType.Double)
-            )
-            print("Updated OPC UA node with new thermal data")
+        if alarms is not None:
+            await evaluate_alarms(alarms, name, thermal_array, captured, alarm_value_interval)
 
-            await asyncio.sleep(1 / 32)  # Maintain 32Hz refresh rate
-        except Exception as e:
-            print("Error reading sensor:", e)
-            await asyncio.sleep(1)  # Avoid tight error loops
+        start = time.perf_counter()
+        if not detector.should_publish(thermal_array, captured):
+            continue
+        # Published frames are numbered without gaps, clients count gaps as lost frames
+        sequence = detector.published
+        now = datetime.fromtimestamp(captured, timezone.utc)
+
+        # Update OPC UA node, the sequence and source timestamp let clients detect dropped or repeated frames
+        stage = time.perf_counter()
+        value = encoder.encode(thermal_array, sequence, captured)
+        stage = acquisition.metrics.stages.since("encode", stage)
+        await nodes["thermal"].write_value(ua.DataValue(value, SourceTimestamp=now))
+        acquisition.metrics.stages.since("write", stage)
+        await nodes["timestamp"].write_value(ua.Variant(now, ua.VariantType.DateTime))
+        if statistics is not None:
+            await write_statistics(nodes["statistics"], statistics.compute(thermal_array), now)
+        if history is not None:
+            history.append(nodes["thermal"].nodeid, thermal_array, sequence, captured)
+        if batch is not None:
+            batch.append(thermal_array, sequence, captured)
+        if status != "running":
+            status = "running"
+            await write_status(nodes, status)
+        acquisition.metrics.record_publish(time.perf_counter() - start)
 
 
-async def main():
-    # Initialize I2C and MLX90640
-    i2c = busio.I2C(board.SCL, board.SDA,frequency=400000)
-    mlx = adafruit_mlx90640.MLX90640(i2c)
-    mlx.refresh_rate = adafruit_mlx90640.RefreshRate.REFRESH_4_HZ
-    frame = [0] * 768  # 32x24 pixels
+async def report_metrics(publishers, loop_lag, diagnostics, interval, profiler=None, profile_path=None):
+    """
+    Writes the acquisition and loop metrics to their OPC UA variables and prints them every interval seconds,
+    with the sampling profiler also its top functions and the collapsed stacks to profile_path
+    """
+    while True:
+        await asyncio.sleep(interval)
+        lag = loop_lag.snapshot()
+        await diagnostics["lag_ms"].write_value(ua.Variant(lag["lag_ms"], ua.VariantType.Double))
+        await diagnostics["lag_max_ms"].write_value(ua.Variant(lag["lag_max_ms"], ua.VariantType.Double))
+        if profiler is not None:
+            top = "\n".join(f"{100 * share:5.1f}% {function}" for function, share in profiler.top(10))
+            await diagnostics["profile"].write_value(ua.Variant(top, ua.VariantType.String))
+            if profile_path:
+                profiler.save(profile_path)
+
+        for publisher in publishers:
+            acquisition = publisher["acquisition"]
+            metrics = acquisition.metrics.snapshot()
+            metrics["skipped"] = acquisition.slot.skipped
+            metrics["suppressed"] = publisher["detector"].suppressed
+            for key, node in publisher["nodes"]["metrics"].items():
+                await node.write_value(ua.Variant(float(metrics[key]), ua.VariantType.Double))
+            print(
+                f"{acquisition.sensor.name}: {metrics['rate']:.1f} frames/s, "
+                f"read {metrics['read_ms']:.1f} ms (max {metrics['read_max_ms']:.1f}), "
+                f"published {metrics['publish_rate']:.1f} frames/s, "
+                f"publish {metrics['publish_ms']:.1f} ms (max {metrics['publish_max_ms']:.1f}), "
+                f"skipped {metrics['skipped']}, suppressed {metrics['suppressed']}, errors {metrics['errors']}, "
+                f"p95 read {metrics['read_p95_ms']:.1f} / encode {metrics['encode_p95_ms']:.2f} / "
+                f"write {metrics['write_p95_ms']:.2f} / publish {metrics['publish_p95_ms']:.1f} ms"
+            )
+        print(f"Event loop lag {lag['lag_ms']:.1f} ms (max {lag['lag_max_ms']:.1f})")
+
+
+async def main(config):
+    wire_format = config["wire_format"]
+    loop = asyncio.get_running_loop()
 
     # Create OPC UA Server
     server = Server()
-    server.set_endpoint("opc.tcp://0.0.0.0:4840/freeopcua/server/")
-    server.set_server_name("BeagleBone Thermal Server")
+    server.set_endpoint(config["endpoint"])
+    server.set_server_name(config["server_name"])
 
     # Initialize the server address space (creates namespace array and nodes)
     await server.init()
 
     # Now register a custom namespace
-    ns_idx = await server.register_namespace("BeagleBoneThermal")
+    ns_idx = await server.register_namespace(config["namespace"])
 
     # Get the Objects node
     objects = server.nodes.objects
 
-    # Create a Variable Node for thermal data (as a flat array)
-    thermal_node = await objects.add_variable(
-        ns_idx,
-        "ThermalData",
-        ua.Variant([0.0] * 768, ua.VariantType.Double)
-    )
-    # Make the node writable so it can be updated
-    await thermal_node.set_writable()
+    # Recent frames of every sensor for clients which (re)connect late
+    history = None
+    if config["history_frames"] or config["history_seconds"]:
+        history = FrameHistory(wire_format, config["history_path"])
+        await history.init()
+        server.iserver.history_manager.set_storage(history)
+
+    # Server wide diagnostics: how long the event loop was blocked
+    diagnostics_node = await objects.add_object(ns_idx, "Diagnostics")
+    diagnostics = {
+        "lag_ms": await diagnostics_node.add_variable(ns_idx, "LoopLag", ua.Variant(0.0, ua.VariantType.Double)),
+        "lag_max_ms": await diagnostics_node.add_variable(ns_idx, "LoopLagMax", ua.Variant(0.0, ua.VariantType.Double)),
+    }
+
+    # Opt-in sampling profiler for field debugging, enabled by profile_path
+    profiler = None
+    if config["profile_path"]:
+        profiler = SamplingProfiler(config["profiler_interval"])
+        diagnostics["profile"] = await diagnostics_node.add_variable(
+            ns_idx, "ProfileTop", ua.Variant("", ua.VariantType.String)
+        )
+
+    # Min/max/mean/hotspot/histogram of every frame, computed once on the server
+    statistics = None
+    if config["frame_statistics"]:
+        statistics = FrameStatistics(config["histogram_bins"], *config["histogram_range"])
 
-    async with server:
+    # One object node, sensor backend, acquisition thread and publishing state per configured sensor
+    publishers = []
+    for index, sensor_config in enumerate(config["sensors"]):
+        name = sensor_config.get("name", f"Sensor{index}")
+        nodes = await add_sensor_nodes(objects, ns_idx, name, wire_format)
+
+        # Objects/ThermalData keeps pointing at the first sensor for single sensor clients
+        if index == 0:
+            await objects.add_reference(nodes["thermal"].nodeid, ua.ObjectIds.Organizes)
+
+        try:
+            sensor = create_sensor({**sensor_config, "name": name})
+        except Exception as e:
+            print(f"Error initializing sensor {name}:", e)
+            await write_status(nodes, f"error: {e}")
+            continue
+
+        if history is not None:
+            await enable_history(history, nodes["thermal"], name, sensor.frame_rate, config)
+        if config["frame_statistics"]:
+            nodes["statistics"] = await add_statistics_nodes(nodes["object"], ns_idx, statistics)
+        encoder = create_encoder(config)
+        if wire_format == "tiles":
+            await add_keyframe_method(nodes["object"], ns_idx, encoder)
+        batch = None
+        if config["batch_frames"]:
+            batch = FrameRing(config["batch_frames"])
+            await add_batch_method(nodes["object"], ns_idx, batch, wire_format)
+        alarms = None
+        if config["alarm_zones"].get(name):
+            try:
+                engine = AlarmEngine(config["alarm_zones"][name], rate_window=config["alarm_rate_window"])
+            except ValueError as e:
+                print(f"Invalid alarm zones of sensor {name}:", e)
+            else:
+                alarms = await add_alarm_nodes(server, nodes["object"], ns_idx, engine)
+        detector = ChangeDetector(config["deadband"], config["deadband_pixels"], config["heartbeat_interval"])
+        await add_deadband_nodes(nodes["object"], ns_idx, detector)
+        frame_filter = None
+        try:
+            frame_filter = FrameFilter.from_config(config["frame_filter"], config["bad_pixels"].get(name))
+        except (TypeError, ValueError) as e:
+            print(f"Invalid frame filter of sensor {name}:", e)
+        publishers.append({
+            "acquisition": SensorAcquisition(sensor, loop, metrics_window=config["metrics_window"],
+                                             frame_filter=frame_filter),
+            "nodes": nodes,
+            "encoder": encoder,
+            "detector": detector,
+            "batch": batch,
+            "alarms": alarms,
+        })
+
+    loop_lag = LoopLagMetrics()
+    try:
+        async with server:
+            if not publishers:
+                print("No sensor available, serving the address space only")
+                await asyncio.Event().wait()
+            for publisher in publishers:
+                publisher["acquisition"].start()
+            if profiler is not None:
+                profiler.start()
             await asyncio.gather(
-                read_thermal_data(mlx, thermal_node)
+                monitor_loop_lag(loop_lag),
+                report_metrics(publishers, loop_lag, diagnostics, config["metrics_interval"], profiler,
+                               config["profile_path"]),
+                *(read_thermal_data(publisher, history, statistics, config["alarm_value_interval"])
+                  for publisher in publishers)
             )
+    finally:
+        for publisher in publishers:
+            publisher["acquisition"].stop()
+        if profiler is not None:
+            profiler.stop()
+            profiler.save(config["profile_path"])
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="MLX90640 OPC UA thermal server")
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "server_config.json"),
+                        help="Server configuration file (default: server_config.json next to this script)")
+    parser.add_argument("--wire-format", choices=WIRE_FORMATS,
+                        help="Encoding of the ThermalData nodes, overrides the configuration")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="Run the sampling profiler and write its collapsed stacks to PATH")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if args.wire_format:
+        config["wire_format"] = args.wire_format
+    if args.profile:
+        config["profile_path"] = args.profile
+    asyncio.run(main(config))
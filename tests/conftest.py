@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The shared package, the server and the client modules, imported the way the server and the client run them
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "server"))
+sys.path.insert(0, os.path.join(ROOT, "client", "embedded_device"))
+sys.path.insert(0, os.path.join(ROOT, "common"))
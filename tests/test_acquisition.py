@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import numpy as np
+
+from acquisition import LatestFrame, SensorAcquisition
+
+
+class Sensor:
+    name = "test"
+
+    def __init__(self, frame_rate, slow=(), fail=()):
+        self.frame_rate = frame_rate
+        self.period = 1.0 / frame_rate
+        self.slow = slow
+        self.fail = fail
+        self.reads = []
+        self.closed = False
+
+    def read_frame(self):
+        count = len(self.reads)
+        self.reads.append(time.monotonic())
+        if count in self.fail:
+            raise OSError("I2C read failed")
+        if count in self.slow:
+            time.sleep(3 * self.period)
+        return np.full((24, 32), count, dtype=np.float32)
+
+    def close(self):
+        self.closed = True
+
+
+def acquire(sensor, done, timeout=5.0, **options):
+    """Items taken by the loop until done(items), a slow loop misses the frames replaced in the slot"""
+    async def run():
+        acquisition = SensorAcquisition(sensor, asyncio.get_running_loop(), **options)
+        acquisition.start()
+        items = []
+        try:
+            while not done(items):
+                items.append(await asyncio.wait_for(acquisition.next_frame(), timeout))
+        finally:
+            acquisition.stop()
+        return acquisition, items
+
+    return asyncio.run(run())
+
+
+def test_frames_are_read_at_the_frame_rate():
+    sensor = Sensor(50)
+    acquisition, items = acquire(sensor, lambda items: items and items[-1][0] >= 20)
+    # Deadlines advance by one period, the schedule does not drift with the read time
+    elapsed = sensor.reads[19] - sensor.reads[0]
+    assert 19 * 0.02 * 0.9 <= elapsed <= 19 * 0.02 * 1.3
+    sequences = [sequence for sequence, _, _, _ in items]
+    assert sequences == sorted(set(sequences))
+    assert acquisition.slot.skipped == sequences[-1] - len(items)
+    assert sensor.closed
+
+
+def test_late_read_restarts_the_schedule_instead_of_bursting():
+    sensor = Sensor(50, slow=(5,))
+    acquire(sensor, lambda items: len(sensor.reads) >= 15)
+    gaps = np.diff(sensor.reads[6:15])
+    # One read right after the late one, then the normal period again
+    assert np.count_nonzero(gaps < 0.01) <= 1
+    assert np.median(gaps) >= 0.015
+
+
+def test_read_errors_are_handed_to_the_loop():
+    sensor = Sensor(100, fail=(1,))
+    # The error stays in the slot for error_delay, long enough for a loaded loop to take it
+    acquisition, items = acquire(sensor, lambda items: items and items[-1][1] is not None and
+                                 any(error is not None for _, _, _, error in items), error_delay=0.5)
+    failed = [item for item in items if item[3] is not None]
+    assert len(failed) == 1 and isinstance(failed[0][3], OSError) and failed[0][1] is None
+    assert acquisition.metrics.snapshot()["errors"] == 1
+
+
+def test_latest_frame_replaces_frames_the_loop_did_not_take():
+    slot = LatestFrame()
+    for item in range(3):
+        slot.put(item)
+    assert slot.take() == 2 and slot.take() is None
+    assert slot.skipped == 2
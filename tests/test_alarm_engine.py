@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from thermal_common.alarm_engine import AlarmEngine, zone_mask
+
+
+def scene(hot=25.0, cold=25.0):
+    frame = np.full((24, 32), 25.0, dtype=np.float32)
+    frame[2, 3] = hot
+    frame[20, 30] = cold
+    return frame
+
+
+def run(engine, frames, start=0.0, interval=0.1):
+    """Events of every frame, as (zone, active) pairs"""
+    return [[(event.zone, event.active) for event in engine.evaluate(frame, start + interval * number)]
+            for number, frame in enumerate(frames)]
+
+
+def test_high_alarm_is_debounced_on_entry_and_exit():
+    engine = AlarmEngine([{"name": "motor", "rect": [0, 0, 8, 8], "high": 80.0, "debounce": 3,
+                           "clear_debounce": 2}])
+    events = run(engine, [scene(hot=90.0)] * 4 + [scene()] * 3)
+    assert events == [[], [], [("motor", True)], [], [], [("motor", False)], []]
+
+
+def test_short_spike_does_not_raise():
+    engine = AlarmEngine([{"name": "motor", "high": 80.0, "debounce": 3}])
+    assert run(engine, [scene(hot=90.0), scene(hot=90.0), scene(), scene(hot=90.0)]) == [[], [], [], []]
+    assert not engine.active[0]
+
+
+def test_hysteresis_keeps_the_alarm_inside_the_band():
+    engine = AlarmEngine([{"name": "motor", "high": 80.0, "hysteresis": 2.0, "debounce": 1}])
+    assert run(engine, [scene(hot=81.0)]) == [[("motor", True)]]
+    # Below the limit but within the hysteresis band: still active
+    assert run(engine, [scene(hot=79.0)] * 3) == [[], [], []]
+    assert run(engine, [scene(hot=77.5)]) == [[("motor", False)]]
+
+
+def test_low_limit_and_event_values():
+    engine = AlarmEngine([{"name": "pipe", "rect": [28, 18, 4, 4], "low": 5.0, "debounce": 1, "severity": 900}])
+    events = engine.evaluate(scene(cold=-3.0), 42.0)
+    assert len(events) == 1
+    event = events[0]
+    assert (event.zone, event.active, event.conditions, event.severity, event.timestamp) == \
+        ("pipe", True, ("low",), 900, 42.0)
+    assert event.minimum == pytest.approx(-3.0)
+    assert "min -3.0 C" in event.message
+
+
+def test_rate_limit():
+    engine = AlarmEngine([{"name": "bearing", "rate": 5.0, "debounce": 1}], rate_window=1.0)
+    # 1 degree per 0.1 s is 10 C/s
+    frames = [scene(hot=30.0 + step) for step in range(6)]
+    events = run(engine, frames)
+    assert ("bearing", True) in sum(events, [])
+    assert engine.rate[0] == pytest.approx(10.0)
+
+
+def test_zones_are_independent():
+    engine = AlarmEngine([
+        {"name": "left", "rect": [0, 0, 16, 24], "high": 80.0, "debounce": 1},
+        {"name": "right", "rect": [16, 0, 16, 24], "high": 80.0, "debounce": 1},
+    ])
+    assert run(engine, [scene(hot=90.0)]) == [[("left", True)]]
+    state = {zone["zone"]: zone for zone in engine.state()}
+    assert state["left"]["active"] and state["left"]["conditions"] == ("high",)
+    assert not state["right"]["active"] and state["right"]["max"] == pytest.approx(25.0)
+
+
+def test_polygon_contains_the_pixel_centers():
+    mask = zone_mask({"polygon": [[0, 0], [4, 0], [0, 4]]}, (24, 32))
+    # Centers strictly below the hypotenuse x + y = 4
+    assert mask[0, 0] and mask[1, 1] and not mask[2, 1]
+    assert mask.sum() == 6
+
+
+def test_invalid_zones_raise():
+    with pytest.raises(ValueError):
+        AlarmEngine([])
+    with pytest.raises(ValueError):
+        AlarmEngine([{"name": "empty", "rect": [40, 40, 2, 2], "high": 1.0}])
+    with pytest.raises(ValueError):
+        AlarmEngine([{"name": "line", "polygon": [[0, 0], [1, 1]], "high": 1.0}])
+
+
+def test_reset_clears_the_raised_alarms():
+    engine = AlarmEngine([{"name": "motor", "rect": [0, 0, 8, 8], "high": 80.0, "debounce": 1},
+                          {"name": "bearing", "rect": [28, 18, 4, 4], "high": 80.0, "debounce": 2}])
+    run(engine, [scene(hot=90.0, cold=90.0)])
+    events = engine.reset()
+    assert [(event.zone, event.active, event.conditions) for event in events] == [("motor", False, ())]
+    assert not engine.active.any() and not engine.pending.any()
+    # The debounce starts again from the next frame
+    assert run(engine, [scene(cold=90.0)] * 2) == [[], [("bearing", True)]]
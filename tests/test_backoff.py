@@ -0,0 +1,26 @@
+import pytest
+
+from multithreading.backoff import Backoff
+
+
+def test_delays_grow_to_the_maximum():
+    backoff = Backoff(initial=0.05, maximum=2.0, factor=2.0, jitter=0)
+    assert [backoff.next() for _ in range(8)] == pytest.approx([0.05, 0.1, 0.2, 0.4, 0.8, 1.6, 2.0, 2.0])
+    backoff.reset()
+    assert backoff.next() == pytest.approx(0.05)
+
+
+def test_exponent_is_bounded_on_long_outages():
+    backoff = Backoff(initial=0.05, maximum=2.0, factor=2.0, jitter=0)
+    for _ in range(10000):
+        delay = backoff.next()
+    assert delay == pytest.approx(2.0)
+    assert backoff.attempts == backoff.max_attempts == 6
+    assert backoff.growth == 64
+
+
+def test_jitter_stays_within_bounds():
+    backoff = Backoff(initial=1.0, maximum=1.0, jitter=0.5)
+    delays = [backoff.next() for _ in range(200)]
+    assert 0.5 <= min(delays) and max(delays) <= 1.5
+    assert backoff.attempts == 0
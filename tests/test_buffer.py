@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from multithreading.buffer import CircularBuffer
+
+
+def frame(value):
+    return np.full((24, 32), value, dtype=np.float32)
+
+
+def test_reader_gets_the_newest_frame_and_counts_skipped():
+    buffer = CircularBuffer(4)
+    assert buffer.get() is None and buffer.empty()
+    for value in range(3):
+        buffer.put(frame(value))
+    slot = buffer.get()
+    assert slot.sequence == 2 and slot.frame[0, 0] == 2
+    assert buffer.stats() == {"size": 4, "committed": 3, "read": 1, "unread": 0, "skipped": 2}
+    assert buffer.get() is None
+
+
+def test_unread_is_bounded_by_the_ring():
+    buffer = CircularBuffer(3)
+    for value in range(5):
+        buffer.put(frame(value))
+    assert buffer.stats()["unread"] == 3
+    assert buffer.full() and buffer.qsize() == 3
+    buffer.get()
+    buffer.put(frame(5))
+    stats = buffer.stats()
+    assert (stats["read"], stats["unread"], stats["skipped"]) == (1, 1, 4)
+
+
+def test_reserve_never_returns_the_newest_slot():
+    buffer = CircularBuffer(3)
+    for value in range(7):
+        index = buffer.reserve()
+        assert index != buffer.latest_index
+        np.copyto(buffer.frames[index], frame(value))
+        buffer.commit(index, sequence=100 + value, timestamp=float(value))
+    latest = buffer.latest()
+    assert (latest.sequence, latest.timestamp, latest.frame[0, 0]) == (106, 6.0, 6)
+    # latest() does not mark the frame as read
+    assert buffer.get().sequence == 106
+
+
+def test_wait_for_frame_times_out():
+    buffer = CircularBuffer(2)
+    assert buffer.wait_for_frame(timeout=0.01) is None
+    buffer.put(frame(1))
+    assert buffer.wait_for_frame(timeout=0.01).frame[0, 0] == 1
+
+
+def test_clear_resets_the_counters():
+    buffer = CircularBuffer(2, render_shape=(48, 64))
+    buffer.put(frame(1), rendered=np.ones((48, 64, 3), dtype=np.uint8))
+    assert buffer.latest().rendered.shape == (48, 64, 3)
+    buffer.clear()
+    assert buffer.latest() is None
+    assert buffer.stats() == {"size": 2, "committed": 0, "read": 0, "unread": 0, "skipped": 0}
+
+
+def test_buffer_size_must_hold_two_frames():
+    with pytest.raises(ValueError):
+        CircularBuffer(1)
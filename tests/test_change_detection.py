@@ -0,0 +1,47 @@
+import numpy as np
+
+from change_detection import ChangeDetector
+
+
+def frame(value=25.0):
+    return np.full((24, 32), value, dtype=np.float32)
+
+
+def test_without_deadband_every_frame_is_published():
+    detector = ChangeDetector()
+    assert all(detector.should_publish(frame(), now) for now in range(5))
+    assert (detector.published, detector.suppressed) == (5, 0)
+
+
+def test_deadband_on_the_largest_change():
+    detector = ChangeDetector(deadband=0.5, heartbeat=0)
+    changed = frame()
+    changed[3, 3] += 0.6
+    results = [detector.should_publish(value, now)
+               for now, value in enumerate([frame(), frame(25.4), changed, changed])]
+    assert results == [True, False, True, False]
+    assert (detector.published, detector.suppressed) == (2, 2)
+
+
+def test_changes_are_measured_against_the_last_published_frame():
+    detector = ChangeDetector(deadband=0.5, heartbeat=0)
+    # Slow drift below the deadband per frame is published once it adds up
+    results = [detector.should_publish(frame(25.0 + 0.2 * step), step) for step in range(5)]
+    assert results == [True, False, False, True, False]
+
+
+def test_pixel_count():
+    detector = ChangeDetector(deadband=0.5, pixels=3, heartbeat=0)
+    detector.should_publish(frame(), 0)
+    two = frame()
+    two[0, :2] += 1.0
+    three = frame()
+    three[0, :3] += 1.0
+    assert not detector.should_publish(two, 1)
+    assert detector.should_publish(three, 2)
+
+
+def test_heartbeat_publishes_a_static_scene():
+    detector = ChangeDetector(deadband=0.5, heartbeat=1.0)
+    results = [detector.should_publish(frame(), now) for now in (0.0, 0.5, 0.99, 1.0, 1.5, 2.0)]
+    assert results == [True, False, False, True, False, True]
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+from thermal_common.frame_codec import (
+    FORMAT_FLOAT32, FORMAT_INT16, FORMAT_TILES, FrameDecoder, FrameEncoder, decode_batch, decode_frame,
+    encode_batch, encode_frame
+)
+
+
+def is_keyframe(value):
+    """Only keyframes of a tiles stream decode without a FrameDecoder"""
+    try:
+        decode_frame(value)
+    except ValueError:
+        return False
+    return True
+
+
+@pytest.fixture
+def frames():
+    rng = np.random.default_rng(0)
+    scene = rng.normal(25.0, 2.0, (24, 32)).astype(np.float32)
+    # A hot spot moving over a static scene, most tiles are unchanged between frames
+    result = []
+    for position in range(8):
+        frame = scene.copy()
+        frame[4:12, 4 * position:4 * position + 8] += 20.0
+        result.append(frame)
+    return result
+
+
+@pytest.mark.parametrize("wire_format, code, tolerance", [
+    ("float32", FORMAT_FLOAT32, 0.0),
+    ("int16", FORMAT_INT16, 0.005),
+    ("tiles", FORMAT_TILES, 0.025),
+])
+def test_binary_formats_round_trip(frames, wire_format, code, tolerance):
+    value = encode_frame(frames[0], wire_format, sequence=7, timestamp=123.5)
+    frame, header = decode_frame(value.Value)
+    assert (header.format, header.rows, header.cols, header.sequence, header.timestamp) == (code, 24, 32, 7, 123.5)
+    assert frame.dtype == np.float32 and frame.shape == (24, 32)
+    assert np.abs(frame - frames[0]).max() <= tolerance + 1e-6
+
+
+@pytest.mark.parametrize("wire_format", ["double", "float"])
+def test_array_formats_round_trip(frames, wire_format):
+    frame, header = decode_frame(encode_frame(frames[0], wire_format).Value)
+    assert header is None
+    np.testing.assert_allclose(frame, frames[0], atol=1e-6)
+
+
+def test_sequence_wraps_to_uint32(frames):
+    _, header = decode_frame(encode_frame(frames[0], "float32", sequence=2 ** 32 + 5).Value)
+    assert header.sequence == 5
+
+
+def test_invalid_values_raise(frames):
+    with pytest.raises(ValueError):
+        encode_frame(frames[0], "png")
+    with pytest.raises(ValueError):
+        decode_frame(b"XX" + bytes(30))
+    with pytest.raises(ValueError):
+        decode_frame(b"TF")
+
+
+@pytest.mark.parametrize("wire_format, tolerance", [("float32", 0.0), ("int16", 0.005), ("tiles", 0.005)])
+def test_batch_round_trip(frames, wire_format, tolerance):
+    sequences = np.arange(10, 10 + len(frames))
+    timestamps = 1000.0 + 0.03125 * np.arange(len(frames))
+    decoded, decoded_sequences, decoded_timestamps = decode_batch(
+        encode_batch(frames, sequences, timestamps, wire_format).Value
+    )
+    assert decoded.shape == (len(frames), 24, 32)
+    assert np.abs(decoded - np.array(frames)).max() <= tolerance + 1e-6
+    np.testing.assert_array_equal(decoded_sequences, sequences)
+    np.testing.assert_array_equal(decoded_timestamps, timestamps)
+
+
+def test_tile_stream_follows_the_frames(frames):
+    encoder = FrameEncoder("tiles", threshold=0.5, step=0.05, keyframe_interval=100)
+    decoder = FrameDecoder()
+    sizes = []
+    for sequence, frame in enumerate(frames):
+        value = encoder.encode(frame, sequence).Value
+        sizes.append(len(value))
+        decoded, header = decoder.decode(value)
+        assert header.sequence == sequence
+        # Unchanged tiles keep the reader within threshold + step / 2
+        assert np.abs(decoded - frame).max() <= 0.5 + 0.025 + 1e-6
+    # Deltas only carry the tiles under the moving spot
+    assert max(sizes[1:]) < sizes[0]
+
+
+def test_tile_decoder_resyncs_on_keyframe_after_dropped_delta(frames):
+    encoder = FrameEncoder("tiles", keyframe_interval=100)
+    decoder = FrameDecoder()
+    values = [encoder.encode(frame, sequence).Value for sequence, frame in enumerate(frames[:4])]
+
+    decoder.decode(values[0])
+    decoder.decode(values[1])
+    # values[2] is lost, the next delta does not apply to the frame the decoder has
+    frame, header = decoder.decode(values[3])
+    assert frame is None and header.sequence == 3
+    assert not decoder.synchronized
+    # Deltas are ignored until a keyframe arrives
+    encoder.request_keyframe()
+    frame, _ = decoder.decode(encoder.encode(frames[4], 4).Value)
+    assert frame is not None and decoder.synchronized
+    assert np.abs(frame - frames[4]).max() <= 0.025 + 1e-6
+    frame, _ = decoder.decode(encoder.encode(frames[5], 5).Value)
+    assert np.abs(frame - frames[5]).max() <= 0.525 + 1e-6
+
+
+def test_tile_delta_without_keyframe_is_not_decoded(frames):
+    encoder = FrameEncoder("tiles")
+    encoder.encode(frames[0], 0)
+    delta = encoder.encode(frames[1], 1).Value
+    frame, header = FrameDecoder().decode(delta)
+    assert frame is None and header.format == FORMAT_TILES
+    with pytest.raises(ValueError):
+        decode_frame(delta)
+
+
+def test_tile_keyframe_interval(frames):
+    encoder = FrameEncoder("tiles", keyframe_interval=3)
+    keyframes = [is_keyframe(encoder.encode(frame, sequence).Value)
+                 for sequence, frame in enumerate(frames[:7])]
+    assert keyframes == [True, False, False, False, True, False, False]
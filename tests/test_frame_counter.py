@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+from multithreading.producer import FrameCounter
+
+START = datetime(2024, 1, 1)
+
+
+def at(*frames, interval=0.03125):
+    return [START + timedelta(seconds=interval * frame) for frame in frames]
+
+
+def test_sequence_gaps_are_dropped_frames():
+    counter = FrameCounter()
+    assert [counter.observe(None, sequence=sequence) for sequence in (1, 2, 5, 5, 6)] == \
+        [True, True, True, False, True]
+    assert counter.as_dict() == {"received": 4, "dropped": 2, "duplicated": 1}
+    assert counter.last_sequence == 6
+
+
+def test_sequence_wraps_around():
+    counter = FrameCounter()
+    for sequence in (0xFFFFFFFE, 0xFFFFFFFF, 0, 2):
+        counter.observe_sequence(sequence)
+    assert counter.as_dict() == {"received": 4, "dropped": 1, "duplicated": 0}
+
+
+def test_server_restart_is_not_counted_as_drops():
+    counter = FrameCounter()
+    for sequence in (5000, 5001, 3):
+        counter.observe_sequence(sequence)
+    assert counter.as_dict() == {"received": 3, "dropped": 0, "duplicated": 0}
+
+
+def test_timestamp_gaps_estimate_drops():
+    counter = FrameCounter()
+    results = [counter.observe(time) for time in at(0, 1, 2, 5, 5, 6)]
+    assert results == [True, True, True, True, False, True]
+    assert counter.as_dict() == {"received": 5, "dropped": 2, "duplicated": 1}
+    assert counter.frame_interval == 0.03125
+
+
+def test_overflow_and_missing_timestamps():
+    counter = FrameCounter()
+    assert counter.observe(None, overflow=True)
+    assert counter.observe(None)
+    assert counter.as_dict() == {"received": 2, "dropped": 1, "duplicated": 0}
+
+
+def test_reset_forgets_the_stream():
+    counter = FrameCounter()
+    for time in at(0, 2):
+        counter.observe(time)
+    counter.observe_sequence(10)
+    counter.reset()
+    assert counter.as_dict() == {"received": 0, "dropped": 0, "duplicated": 0}
+    assert (counter.last_sequence, counter.last_source_time, counter.frame_interval) == (None, None, None)
+    assert counter.observe_sequence(3) and counter.dropped == 0
+
+
+def test_timestamp_gaps_are_not_drops_with_a_server_deadband():
+    counter = FrameCounter()
+    counter.count_gaps = False
+    results = [counter.observe(time) for time in at(0, 1, 5, 5, 40)]
+    assert results == [True, True, True, False, True]
+    assert counter.as_dict() == {"received": 4, "dropped": 0, "duplicated": 1}
+    # The frame interval is still estimated, and overflows are still counted
+    assert counter.frame_interval == 0.03125
+    counter.observe(None, overflow=True)
+    assert counter.dropped == 1
+    counter.reset()
+    assert not counter.count_gaps
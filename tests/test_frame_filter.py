@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from thermal_common.frame_filter import FrameFilter, NeighbourMedian, PercentileRange, bad_pixel_mask
+
+
+def noisy_frames(count, level=25.0, noise=0.25, seed=0):
+    rng = np.random.default_rng(seed)
+    return (level + rng.normal(0.0, noise, (count, 24, 32))).astype(np.float32)
+
+
+def test_bad_pixels_take_the_median_of_their_good_neighbours():
+    rng = np.random.default_rng(1)
+    # Corner (3 neighbours), edge (5), inside (8) and two adjacent pixels (7 good neighbours each)
+    bad = [[0, 0], [10, 0], [5, 5], [7, 9], [8, 9]]
+    mask = bad_pixel_mask(bad, (24, 32))
+    correct = NeighbourMedian(mask)
+    assert correct.count == len(bad)
+    for _ in range(10):
+        frame = rng.normal(25.0, 3.0, (24, 32)).astype(np.float32)
+        expected = frame.copy()
+        for x, y in bad:
+            expected[y, x] = np.median([frame[y + dy, x + dx] for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+                                        if (dy or dx) and 0 <= y + dy < 24 and 0 <= x + dx < 32
+                                        and not mask[y + dy, x + dx]])
+        correct(frame)
+        np.testing.assert_allclose(frame, expected, atol=1e-5)
+
+
+def test_bad_pixel_errors():
+    with pytest.raises(ValueError):
+        bad_pixel_mask([[32, 0]], (24, 32))
+    with pytest.raises(ValueError):
+        NeighbourMedian(np.ones((24, 32), dtype=bool))
+
+
+def test_stuck_pixel_does_not_reach_the_output():
+    frames = noisy_frames(5)
+    frames[:, 10, 12] = 300.0
+    frame_filter = FrameFilter.from_config({"mode": "kalman"}, bad_pixels=[[12, 10]])
+    for frame in frames:
+        output = frame_filter.apply(frame)
+    assert output.max() < 27.0
+    assert frame_filter.stats()["bad_pixels"] == 1
+
+
+@pytest.mark.parametrize("mode", ["ema", "kalman"])
+def test_filters_reduce_the_noise(mode):
+    # 0.1 rms noise never crosses the 1 degree step threshold
+    frames = noisy_frames(200, noise=0.1)
+    frame_filter = FrameFilter(mode)
+    outputs = np.array([frame_filter.apply(frame).copy() for frame in frames])
+    assert np.std(outputs[50:] - 25.0) < 0.5 * np.std(frames[50:] - 25.0)
+    assert frame_filter.steps == 0
+
+
+@pytest.mark.parametrize("mode", ["ema", "kalman"])
+def test_steps_bypass_the_filter(mode):
+    frames = noisy_frames(40, noise=0.1)
+    frames[20:, 4:8, 4:8] += 40.0
+    frame_filter = FrameFilter(mode, step_threshold=1.0)
+    for frame in frames[:21]:
+        output = frame_filter.apply(frame)
+    # The hot object appears at once, the rest of the frame stays filtered
+    np.testing.assert_array_equal(output[4:8, 4:8], frames[20, 4:8, 4:8])
+    assert frame_filter.steps == 16
+    assert np.abs(output[12:, 12:] - 25.0).max() < 0.5
+
+
+@pytest.mark.parametrize("mode", ["ema", "kalman"])
+def test_without_step_threshold_a_step_is_smoothed(mode):
+    frames = noisy_frames(40, noise=0.0)
+    frames[20:] += 40.0
+    frame_filter = FrameFilter(mode, step_threshold=0)
+    for frame in frames[:21]:
+        output = frame_filter.apply(frame)
+    assert 25.0 < output.max() < 65.0
+    assert frame_filter.steps == 0
+
+
+def test_reset_takes_the_next_frame_as_it_is():
+    frame_filter = FrameFilter("ema", step_threshold=0)
+    frame_filter.apply(np.full((24, 32), 20.0, dtype=np.float32))
+    frame_filter.reset()
+    output = frame_filter.apply(np.full((24, 32), 30.0, dtype=np.float32))
+    assert np.all(output == 30.0)
+
+
+def test_outputs_are_used_in_turn():
+    frame_filter = FrameFilter(outputs=2, bad_pixels=[[0, 0]])
+    first = frame_filter.apply(noisy_frames(1, seed=1)[0])
+    second = frame_filter.apply(noisy_frames(1, seed=2)[0])
+    third = frame_filter.apply(noisy_frames(1, seed=3)[0])
+    assert first is third and first is not second
+
+
+def test_from_config_without_mode_or_bad_pixels_is_none():
+    assert FrameFilter.from_config(None) is None
+    assert FrameFilter.from_config({"mode": "ema", "alpha": 0.5}).alpha == np.float32(0.5)
+    with pytest.raises(ValueError):
+        FrameFilter("median")
+
+
+def test_percentile_range_ignores_single_outliers():
+    frame = noisy_frames(1)[0]
+    frame[0, 0] = -40.0
+    frame[23, 31] = 300.0
+    low, high = PercentileRange((1, 99))(frame)
+    assert 24.0 < low < 25.0 < high < 26.0
+    ranks = np.sort(frame.reshape(-1))
+    assert (low, high) == (ranks[int(round(0.01 * 767))], ranks[int(round(0.99 * 767))])
+    with pytest.raises(ValueError):
+        PercentileRange((50, 10))
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from frame_statistics import FrameStatistics
+
+
+def test_statistics_of_a_frame():
+    frame = np.full((24, 32), 20.0, dtype=np.float32)
+    frame[5, 9] = 80.0
+    frame[0, 0] = 10.0
+    result = FrameStatistics().compute(frame)
+    assert (result["min"], result["max"]) == (10.0, 80.0)
+    assert result["mean"] == pytest.approx((20.0 * 766 + 90.0) / 768)
+    assert (result["hotspot_row"], result["hotspot_col"]) == (5, 9)
+
+
+def test_histogram_counts_out_of_range_pixels_in_the_outer_bins():
+    frame = np.linspace(-40.0, 160.0, 24 * 32, dtype=np.float32).reshape(24, 32)
+    statistics = FrameStatistics(bins=16, low=-20.0, high=140.0)
+    histogram = statistics.compute(frame)["histogram"]
+    assert histogram.sum() == 24 * 32
+    expected, _ = np.histogram(np.clip(frame, -20.0, 139.99), statistics.edges)
+    np.testing.assert_array_equal(histogram, expected)
+
+
+def test_invalid_histogram():
+    with pytest.raises(ValueError):
+        FrameStatistics(bins=0)
+    with pytest.raises(ValueError):
+        FrameStatistics(low=50.0, high=50.0)
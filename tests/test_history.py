@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from asyncua import ua
+from thermal_common.frame_codec import decode_frame
+
+from history import FrameHistory, FrameRing, history_capacity
+
+START = 1_700_000_000.0
+NODE = ua.NodeId("ThermalData", 2)
+
+
+def frame(value):
+    return np.full((24, 32), value, dtype=np.float32)
+
+
+def ring_with(count, capacity, seconds=0.0, first_sequence=0):
+    ring = FrameRing(capacity, seconds)
+    for index in range(count):
+        ring.append(frame(index), first_sequence + index, START + index)
+    return ring
+
+
+def utc(seconds):
+    return datetime.fromtimestamp(START + seconds, timezone.utc)
+
+
+def test_capacity_covers_frames_and_time_window():
+    assert history_capacity(frames=100) == 100
+    assert history_capacity(seconds=10) == 321
+    assert history_capacity(frames=100, seconds=1, frame_rate=8) == 100
+
+
+def test_ring_keeps_the_newest_records_oldest_first():
+    ring = ring_with(7, 4)
+    assert len(ring) == 4
+    assert list(ring.records["sequence"][ring.indices()]) == [3, 4, 5, 6]
+
+
+def test_time_window_drops_old_records():
+    ring = ring_with(10, 16, seconds=3.0)
+    assert list(ring.records["sequence"][ring.indices(now=START + 9)]) == [6, 7, 8, 9]
+
+
+def test_select_after_wraparound():
+    ring = ring_with(10, 6)
+    sequences = ring.records["sequence"]
+    assert list(sequences[ring.select(START + 5, START + 7)]) == [5, 6, 7]
+    # start after end, or only an end, reads newest first
+    assert list(sequences[ring.select(START + 7, START + 5)]) == [7, 6, 5]
+    assert list(sequences[ring.select(None, START + 6)]) == [6, 5, 4]
+    assert list(sequences[ring.select(START + 8)]) == [8, 9]
+    # Records overwritten by the ring are not returned
+    assert list(sequences[ring.select(START, START + 3)]) == []
+
+
+def test_since_follows_the_sequence_over_the_uint32_wrap():
+    ring = ring_with(6, 4, first_sequence=0xFFFFFFFE)
+    # Retained: 0, 1, 2, 3 after 0xFFFFFFFE and 0xFFFFFFFF were overwritten
+    assert list(ring.since(0xFFFFFFFF)["sequence"]) == [0, 1, 2, 3]
+    assert list(ring.since(1)["sequence"]) == [2, 3]
+    assert list(ring.since(1, limit=1)["sequence"]) == [3]
+    assert len(ring.since(3)) == 0
+
+
+def test_invalid_capacity():
+    with pytest.raises(ValueError):
+        FrameRing(0)
+
+
+def test_read_node_history_continues_where_the_last_read_stopped():
+    async def run():
+        history = FrameHistory("float32", max_history_data_response_size=4)
+        await history.new_historized_node(NODE, None, count=16)
+        for index in range(10):
+            history.append(NODE, frame(index), index, START + index)
+
+        sequences, start, reads = [], utc(0), 0
+        while start is not None:
+            values, start = await history.read_node_history(NODE, start, utc(9), 0)
+            sequences += [decode_frame(value.Value.Value)[1].sequence for value in values]
+            reads += 1
+        return sequences, reads
+
+    sequences, reads = asyncio.run(run())
+    assert sequences == list(range(10))
+    assert reads == 3
+
+
+def test_read_node_history_values():
+    async def run():
+        history = FrameHistory("int16")
+        await history.new_historized_node(NODE, None, count=4)
+        history.append(NODE, frame(21.5), 7, START + 1)
+        values, cont = await history.read_node_history(NODE, utc(0), utc(2), 0)
+        missing = await history.read_node_history(ua.NodeId("Other", 2), utc(0), utc(2), 0)
+        return values, cont, missing
+
+    values, cont, missing = asyncio.run(run())
+    assert cont is None and missing == ([], None)
+    decoded, header = decode_frame(values[0].Value.Value)
+    assert header.sequence == 7 and header.timestamp == START + 1
+    assert np.allclose(decoded, 21.5)
+    assert values[0].SourceTimestamp == utc(1)
@@ -0,0 +1,103 @@
+import itertools
+import re
+
+import pytest
+
+from app_configuration.log_writer import DEBUG, ERROR, INFO, WARNING, LogWriter, RateLimiter, level_value
+
+names = itertools.count()
+
+
+@pytest.fixture
+def writer_factory(tmp_path):
+    writers = []
+
+    def make(**options):
+        writer = LogWriter(str(tmp_path / "test.log"), name=f"test_log_writer.{next(names)}", **options)
+        writers.append(writer)
+        return writer
+
+    yield make
+    for writer in writers:
+        writer.close()
+
+
+def lines(tmp_path, name="test.log"):
+    return (tmp_path / name).read_text(encoding="utf-8").splitlines()
+
+
+def test_rate_limiter_counts_repetitions_past_the_burst():
+    limiter = RateLimiter(burst=2, interval=10.0)
+    key = (ERROR, "Data fetch error", None)
+    assert [limiter.check(key, now) for now in (0, 1, 2, 3)] == [(True, 0), (True, 0), (False, 0), (False, 0)]
+    # The next record after the window carries the count
+    assert limiter.check(key, 10.0) == (True, 2)
+    assert limiter.check((ERROR, "Other", None), 10.0) == (True, 0)
+
+
+def test_rate_limiter_reports_counts_of_messages_that_stopped():
+    limiter = RateLimiter(burst=1, interval=10.0)
+    for now in range(5):
+        limiter.check((ERROR, "Lost", None), now)
+    limiter.check((INFO, "Once", None), 5)
+    assert limiter.expired(9.0) == []
+    assert limiter.expired(10.0) == [((ERROR, "Lost", None), 4)]
+    # Reported counts are not reported again
+    assert limiter.expired(20.0) == [] and limiter.windows == {}
+
+
+def test_records_are_formatted_with_level_and_error(tmp_path, writer_factory):
+    writer = writer_factory(level=INFO)
+    writer.log(INFO, "Connected")
+    writer.log(DEBUG, "Not written")
+    writer.log(ERROR, "Data fetch error", ValueError("bad frame"))
+    writer.close()
+    written = lines(tmp_path)
+    assert len(written) == 2 and writer.written == 2
+    assert re.fullmatch(r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\.\d{3} INFO: Connected", written[0])
+    assert written[1].endswith("ERROR: Data fetch error. Error: bad frame")
+
+
+def test_close_writes_the_suppressed_repetitions(tmp_path, writer_factory):
+    writer = writer_factory(burst=2)
+    for _ in range(7):
+        writer.log(WARNING, "Transient read error", "timeout")
+    writer.close()
+    written = lines(tmp_path)
+    assert len(written) == 3
+    assert written[2].endswith("WARNING: Transient read error. Error: timeout (repeated 5 more times)")
+    # Records after close are ignored
+    writer.log(ERROR, "Late")
+    assert len(lines(tmp_path)) == 3
+
+
+def test_suppressed_repetitions_are_written_when_the_interval_ended(tmp_path, writer_factory):
+    writer = writer_factory(burst=1, burst_interval=10.0)
+    for _ in range(3):
+        writer.log(ERROR, "Sensor lost")
+    # Move the windows back in time instead of waiting for them to end
+    for window in writer.rate_limiter.windows.values():
+        window[0] -= 10.0
+    writer.next_sweep = 0
+    writer.log(INFO, "Other message")
+    writer.close()
+    written = lines(tmp_path)
+    assert [line.split(": ", 1)[1] for line in written] == [
+        "Sensor lost", "Sensor lost (repeated 2 more times)", "Other message"
+    ]
+
+
+def test_file_is_rotated(tmp_path, writer_factory):
+    writer = writer_factory(max_bytes=200, backup_count=2)
+    for index in range(40):
+        writer.log(INFO, f"Message {index:02d} " + "x" * 20)
+    writer.close()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["test.log", "test.log.1", "test.log.2"]
+    assert lines(tmp_path)[-1].endswith("Message 39 " + "x" * 20)
+    assert all(path.stat().st_size <= 200 for path in tmp_path.iterdir())
+
+
+def test_level_names():
+    assert level_value("warning") == WARNING and level_value(10) == DEBUG
+    with pytest.raises(ValueError):
+        level_value("verbose")
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from multithreading.pipeline import BLOCK, DROP_OLDEST, RenderPipeline
+
+
+class Span:
+    def update_frame(self, frame):
+        return None
+
+
+def make_pipeline(commit, render=lambda renderer, frame, index, span: None, **options):
+    errors = []
+    options = {"buffer_size": 8, "workers": 2, "queue_size": 2, **options}
+    pipeline = RenderPipeline(render, commit, lambda: None, Span(), on_error=errors.append, **options)
+    return pipeline, errors
+
+
+def frame():
+    return np.zeros((24, 32), dtype=np.float32)
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return predicate()
+
+
+def done(pipeline, count):
+    stats = pipeline.stats()
+    return stats["rendered"] + stats["failed"] >= count
+
+
+def test_frames_commit_in_submission_order():
+    committed = []
+    pipeline, _ = make_pipeline(lambda index, sequence, timestamp: committed.append(sequence),
+                                render=lambda renderer, frame, index, span: time.sleep(0.001 * (index % 3)),
+                                policy=BLOCK)
+    pipeline.start()
+    for sequence in range(30):
+        assert pipeline.submit(frame(), sequence)
+    assert wait_until(lambda: done(pipeline, 30))
+    pipeline.stop()
+    assert committed == list(range(30))
+
+
+def test_drop_oldest_keeps_the_newest_frames():
+    release = threading.Event()
+    committed = []
+    pipeline, _ = make_pipeline(lambda index, sequence, timestamp: committed.append(sequence),
+                                render=lambda renderer, frame, index, span: release.wait(1.0),
+                                workers=1, policy=DROP_OLDEST)
+    pipeline.start()
+    pipeline.submit(frame(), 0)
+    assert wait_until(lambda: pipeline.qsize() == 0)
+    for sequence in range(1, 6):
+        pipeline.submit(frame(), sequence)
+    release.set()
+    assert wait_until(lambda: done(pipeline, 3))
+    pipeline.stop()
+    # The worker holds frame 0, the queue the two newest
+    assert committed == [0, 4, 5]
+    assert pipeline.stats()["dropped"] == 3
+
+
+def test_failed_commit_does_not_stall_the_next_frames():
+    committed = []
+
+    def commit(index, sequence, timestamp):
+        if sequence == 2:
+            raise RuntimeError("display gone")
+        committed.append(sequence)
+
+    pipeline, errors = make_pipeline(commit, policy=BLOCK)
+    pipeline.start()
+    for sequence in range(6):
+        pipeline.submit(frame(), sequence)
+    assert wait_until(lambda: done(pipeline, 6))
+    pipeline.stop()
+    assert committed == [0, 1, 3, 4, 5]
+    assert [str(error) for error in errors] == ["display gone"]
+    assert pipeline.stats()["failed"] == 1
+
+
+def test_put_waits_without_blocking_the_loop():
+    committed = []
+    pipeline, _ = make_pipeline(lambda index, sequence, timestamp: committed.append(sequence),
+                                render=lambda renderer, frame, index, span: time.sleep(0.02),
+                                policy=BLOCK, block_timeout=5.0)
+    pipeline.start()
+
+    async def feed():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.002)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        results = await asyncio.gather(*(pipeline.put(frame(), sequence) for sequence in range(12)))
+        ticker.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(feed())
+    assert wait_until(lambda: done(pipeline, 12))
+    pipeline.stop()
+    assert all(results)
+    assert committed == list(range(12))
+    # 12 frames at 2 workers x 20 ms take over 100 ms, the loop kept running meanwhile
+    assert ticks > 10
+
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        make_pipeline(lambda *args: None, policy="wait")
+    with pytest.raises(ValueError):
+        make_pipeline(lambda *args: None, workers=7)
@@ -0,0 +1,53 @@
+import numpy as np
+
+from multithreading.buffer import CircularBuffer
+from multithreading.producer import Producer
+
+
+class Configs:
+    def __init__(self):
+        self.config = {"render_workers": 0}
+
+    def logging(self, message, error=None, level=None):
+        pass
+
+
+def make_producer():
+    producer = Producer(CircularBuffer(4), Configs())
+    events = []
+    producer.alarm_listeners.append(lambda event: events.append((event.zone, event.active)))
+    return producer, events
+
+
+def hot():
+    frame = np.full((24, 32), 25.0, dtype=np.float32)
+    frame[5, 5] = 120.0
+    return frame
+
+
+def test_disabled_alarms_are_not_evaluated():
+    producer, events = make_producer()
+    producer.set_alarms_enabled(False)
+    producer.prepare_frame(hot())
+    assert events == [] and not producer.alarms.active.any()
+
+
+def test_disabling_clears_the_raised_alarms():
+    producer, events = make_producer()
+    producer.prepare_frame(hot())
+    assert events == [("Temperature", True)]
+    producer.set_alarms_enabled(False)
+    producer.prepare_frame(hot())
+    producer.prepare_frame(hot())
+    assert events == [("Temperature", True), ("Temperature", False)]
+    producer.set_alarms_enabled(True)
+    producer.prepare_frame(hot())
+    assert events[-1] == ("Temperature", True)
+
+
+def test_reset_reports_the_raised_alarms_cleared():
+    producer, events = make_producer()
+    producer.prepare_frame(hot())
+    producer.reset_alarms()
+    producer.reset_alarms()
+    assert events == [("Temperature", True), ("Temperature", False)]
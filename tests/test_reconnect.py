@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from multithreading import session_pool
+from multithreading.buffer import CircularBuffer
+from multithreading.producer import Producer
+from multithreading.session_pool import SessionPool
+
+URL = "opc.tcp://sensor:4840"
+
+
+class Configs:
+    def __init__(self):
+        self.config = {"opcua_server": URL, "delivery_mode": "polling", "render_workers": 0}
+
+    def reload_if_changed(self):
+        return False
+
+    def logging(self, message, error=None, level=None):
+        pass
+
+
+class Client:
+    def __init__(self):
+        self.broken = False
+        self.closed = False
+
+    async def check_connection(self):
+        if self.broken:
+            raise ConnectionError("connection lost")
+
+    async def disconnect(self):
+        self.closed = True
+
+
+class DeadSubscription:
+    async def delete(self):
+        raise ConnectionError("connection lost")
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    opened = []
+
+    async def open_session(url, request_timeout, connect_timeout):
+        opened.append(Client())
+        return opened[-1]
+
+    async def resolve_nodes(self, server_url, sensor):
+        pass
+
+    monkeypatch.setattr(session_pool, "open_session", open_session)
+    monkeypatch.setattr(Producer, "resolve_nodes", resolve_nodes)
+    return opened
+
+
+def make_producer(pool):
+    return Producer(CircularBuffer(4), Configs(), session_pool=pool)
+
+
+def lose_connection(producer):
+    producer.subscription = DeadSubscription()
+    producer.connection_lost(ConnectionError("connection lost"))
+
+
+def test_lease_is_released_when_the_subscription_cannot_be_deleted(clients):
+    async def run():
+        pool = SessionPool(Configs())
+        producer = make_producer(pool)
+        await producer.connect()
+        lose_connection(producer)
+        await asyncio.gather(*producer.closing)
+        return pool
+
+    pool = asyncio.run(run())
+    assert clients[0].closed
+    assert len(pool) == 0 and not pool.leases
+
+
+def test_late_release_keeps_the_session_of_a_fast_reconnect(clients):
+    async def run():
+        pool = SessionPool(Configs())
+        producer = make_producer(pool)
+        await producer.connect()
+        lose_connection(producer)
+        # The reconnect acquires the session before the lost one is released
+        await producer.connect()
+        await asyncio.gather(*producer.closing)
+        return pool, producer
+
+    pool, producer = asyncio.run(run())
+    assert producer.client is clients[0] and not clients[0].closed
+    assert pool.leases[URL] == {producer.session_lease}
+
+
+def test_reconnect_after_a_dead_session(clients):
+    async def run():
+        pool = SessionPool(Configs())
+        producer = make_producer(pool)
+        await producer.connect()
+        clients[0].broken = True
+        lose_connection(producer)
+        await producer.connect()
+        await asyncio.gather(*producer.closing)
+        connected = producer.client
+        await producer.disconnect()
+        return pool, connected
+
+    pool, connected = asyncio.run(run())
+    assert connected is clients[1]
+    assert clients[0].closed and clients[1].closed
+    assert len(pool) == 0 and not pool.leases
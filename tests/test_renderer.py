@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+import pytest
+
+from processing.renderer import TemperatureSpan, ThermalRenderer, colormap_lut
+
+
+def test_span_expands_at_once_and_shrinks_past_the_hysteresis():
+    span = TemperatureSpan(hysteresis=0.5)
+    assert span.update(20.0, 30.0) == (20.0, 30.0)
+    # Wider frames widen the span right away
+    assert span.update(19.0, 31.0) == (19.0, 31.0)
+    # Shrinking within the band keeps the span
+    assert span.update(19.4, 30.6) == (19.0, 31.0)
+    assert span.update(19.6, 30.2) == (19.6, 30.2)
+
+
+def test_span_is_at_least_min_span():
+    span = TemperatureSpan(min_span=2.0)
+    assert span.update(25.0, 25.0) == (24.0, 26.0)
+    assert span.update_frame(np.full((24, 32), 30.0, dtype=np.float32)) == (29.0, 31.0)
+
+
+def test_fixed_span_ignores_the_frames():
+    span = TemperatureSpan(fixed=(40.0, 10.0))
+    assert span.update(0.0, 100.0) == (10.0, 40.0)
+    span.set_auto()
+    assert span.update(0.0, 100.0) == (0.0, 100.0)
+
+
+def test_render_matches_resize_and_colormap():
+    rng = np.random.default_rng(0)
+    frame = rng.uniform(20.0, 40.0, (24, 32)).astype(np.float32)
+    renderer = ThermalRenderer(scale_factor=4, span=TemperatureSpan(fixed=(20.0, 40.0)))
+    image = renderer.render(frame, cv2.COLORMAP_JET)
+
+    scaled = (40.0 - frame) * (255.0 / 20.0)
+    resized = cv2.resize(scaled, (32 * 4, 24 * 4), interpolation=cv2.INTER_CUBIC)
+    index = np.clip(resized, 0, 255).astype(np.uint8)
+    expected = cv2.applyColorMap(index, cv2.COLORMAP_JET)
+    assert image.shape == (96, 128, 3)
+    # The separable matmul rounds differently from cv2.resize by at most one LUT step
+    lut = colormap_lut(cv2.COLORMAP_JET).astype(np.int16)
+    step = np.abs(np.diff(lut, axis=0)).max()
+    assert np.abs(image.astype(np.int16) - expected).max() <= step
+
+
+def test_render_reuses_the_output_buffer():
+    renderer = ThermalRenderer(scale_factor=2)
+    out = np.empty(renderer.output_shape + (3,), dtype=np.uint8)
+    frame = np.zeros((24, 32), dtype=np.float32)
+    assert renderer.render(frame, out=out) is out
+    renderer.configure(3)
+    assert renderer.output_shape == (72, 96)
+
+
+@pytest.mark.parametrize("colormap", [cv2.COLORMAP_JET, cv2.COLORMAP_INFERNO])
+def test_colormap_lut_is_cached_and_read_only(colormap):
+    lut = colormap_lut(colormap)
+    assert lut.shape == (256, 1, 3) and colormap_lut(colormap) is lut
+    assert not lut.flags.writeable
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from multithreading import session_pool
+from multithreading.session_pool import SessionPool
+
+URL = "opc.tcp://sensor:4840"
+
+
+class Logs:
+    def __init__(self):
+        self.messages = []
+
+    def logging(self, message, error=None, level=None):
+        self.messages.append(message)
+
+
+class Client:
+    def __init__(self, url):
+        self.url = url
+        self.broken = False
+        self.closed = False
+
+    async def check_connection(self):
+        if self.broken:
+            raise ConnectionError("connection lost")
+
+    async def disconnect(self):
+        self.closed = True
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    clients = []
+
+    async def open_session(url, request_timeout, connect_timeout):
+        if url.endswith(":0"):
+            raise OSError("connection refused")
+        clients.append(Client(url))
+        return clients[-1]
+
+    monkeypatch.setattr(session_pool, "open_session", open_session)
+    return clients
+
+
+def test_endpoints_of_one_server_share_the_session(opened):
+    async def run():
+        pool = SessionPool(Logs())
+        first = await pool.acquire(URL)
+        second = await pool.acquire(URL)
+        other = await pool.acquire("opc.tcp://other:4840")
+        return pool, first, second, other
+
+    pool, first, second, other = asyncio.run(run())
+    assert first.client is second.client
+    assert other.client is not first.client
+    assert len(pool) == 2 and pool.connects == 2
+
+
+def test_last_release_closes_the_session(opened):
+    async def run():
+        pool = SessionPool(Logs())
+        first = await pool.acquire(URL)
+        second = await pool.acquire(URL)
+        await pool.release(first)
+        await pool.release(first)  # a second release of the same lease is ignored
+        still_open = not second.client.closed and len(pool) == 1
+        await pool.release(second)
+        return pool, second, still_open
+
+    pool, second, still_open = asyncio.run(run())
+    assert still_open
+    assert second.client.closed and len(pool) == 0
+
+
+def test_broken_session_is_replaced_and_its_late_release_ignored(opened):
+    async def run():
+        pool = SessionPool(Logs())
+        old = await pool.acquire(URL)
+        old.client.broken = True
+        new = await pool.acquire(URL)
+        await pool.release(old)
+        return pool, old, new
+
+    pool, old, new = asyncio.run(run())
+    assert old.client.closed
+    assert new.client is not old.client and not new.client.closed
+    assert pool.sessions[URL] is new.client and pool.connects == 2
+
+
+def test_late_release_does_not_close_a_session_acquired_again(opened):
+    async def run():
+        pool = SessionPool(Logs())
+        old = await pool.acquire(URL)
+        new = await pool.acquire(URL)  # reconnect before the previous lease is released
+        await pool.release(old)
+        return pool, new
+
+    pool, new = asyncio.run(run())
+    assert not new.client.closed and len(pool) == 1
+
+
+def test_release_after_a_failed_connect(opened):
+    async def run():
+        pool = SessionPool(Logs())
+        with pytest.raises(OSError):
+            await pool.acquire("opc.tcp://sensor:0")
+        lease = await pool.acquire(URL)
+        await pool.release(lease)
+        return pool, lease
+
+    pool, lease = asyncio.run(run())
+    assert lease.client.closed
+    assert len(pool) == 0 and not pool.leases
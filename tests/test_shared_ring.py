@@ -0,0 +1,71 @@
+import os
+import struct
+import subprocess
+import sys
+import uuid
+
+import numpy as np
+import pytest
+
+from multithreading import shared_ring
+from multithreading.shared_ring import WRITER_PID_OFFSET, SharedFrameReader, SharedFrameRing
+
+
+@pytest.fixture
+def name():
+    return f"thermal_test_{uuid.uuid4().hex[:8]}"
+
+
+def frame(value):
+    return np.full((24, 32), value, dtype=np.float32)
+
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_reader_sees_the_newest_frame(name):
+    with SharedFrameRing(name, 4, render_shape=(48, 64)) as ring:
+        with SharedFrameReader(name) as reader:
+            assert reader.latest() is None
+            for sequence in range(6):
+                ring.put(frame(sequence), sequence, 100.0 + sequence, np.full((48, 64, 3), sequence, np.uint8))
+            latest = reader.latest()
+            assert (latest.sequence, latest.timestamp, latest.frame[0, 0], latest.rendered[0, 0, 0]) == \
+                (5, 105.0, 5, 5)
+            assert reader.valid(latest)
+            copied = reader.copy(latest)
+            for sequence in range(6, 10):
+                ring.put(frame(sequence), sequence, 100.0 + sequence)
+            assert not reader.valid(latest)
+            assert copied.frame[0, 0] == 5
+            del latest, copied
+
+
+def test_running_writer_is_not_replaced(name):
+    with SharedFrameRing(name, 4) as ring:
+        with pytest.raises(FileExistsError, match="in use"):
+            SharedFrameRing(name, 4)
+        ring.put(frame(1), 1, 1.0)
+        with SharedFrameReader(name) as reader:
+            assert reader.latest().sequence == 1
+
+
+def test_ring_of_an_exited_writer_is_replaced(name):
+    with SharedFrameRing(name, 4) as ring:
+        struct.pack_into("<I", ring.shm.buf, WRITER_PID_OFFSET, exited_pid())
+        # As left behind by a crashed process
+        shared_ring.open_rings.discard(name)
+        with SharedFrameRing(name, 8) as replaced:
+            with SharedFrameReader(name) as reader:
+                assert reader.layout.slots == 8
+            assert replaced.writer_pid[0] == os.getpid()
+
+
+def test_replace_takes_over_a_running_writer(name):
+    with SharedFrameRing(name, 4):
+        with SharedFrameRing(name, 2, replace=True):
+            with SharedFrameReader(name) as reader:
+                assert reader.layout.slots == 2
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from recording.replay import ReplaySource
+from recording.stream_file import StreamRecorder, StreamRecording
+
+
+@pytest.fixture
+def recording_path(tmp_path):
+    path = str(tmp_path / "stream.trec")
+    with StreamRecorder(path, chunk_frames=4) as recorder:
+        for number in range(10):
+            recorder.append(np.full((24, 32), number, dtype=np.float32), sequence=100 + number,
+                            timestamp=1000.0 + 0.5 * number)
+    return path
+
+
+def test_frames_read_back(recording_path):
+    recording = StreamRecording(recording_path)
+    assert len(recording) == 10
+    frame, sequence, timestamp = recording[7]
+    assert (frame[0, 0], sequence, timestamp) == (7, 107, 1003.5)
+    assert (recording.start_time, recording.end_time) == (1000.0, 1004.5)
+    recording.close()
+    assert len(recording) == 0
+
+
+def test_seek_through_the_chunk_index(recording_path):
+    recording = StreamRecording(recording_path)
+    assert len(recording.index) == 3
+    assert recording.seek(0.0) == 0
+    assert recording.seek(1000.0) == 0
+    assert recording.seek(1001.75) == 4
+    assert recording.seek(1002.0) == 4
+    assert recording.seek(1002.1) == 5
+    assert recording.seek(1004.5) == 9
+    assert recording.seek(2000.0) == 10
+
+
+def test_recording_in_progress_is_readable(tmp_path):
+    path = str(tmp_path / "live.trec")
+    recorder = StreamRecorder(path, chunk_frames=8)
+    for number in range(3):
+        recorder.append(np.zeros((24, 32), dtype=np.float32), sequence=number, timestamp=float(number))
+    recording = StreamRecording(path)
+    assert len(recording) == 3 and recording.seek(1.5) == 2
+    recorder.close()
+
+
+def test_not_a_recording(tmp_path):
+    path = tmp_path / "other.trec"
+    path.write_bytes(b"PNG" + bytes(100))
+    with pytest.raises(ValueError):
+        StreamRecording(str(path))
+
+
+def test_replay_from_a_start_time(recording_path):
+    received = []
+    replay = ReplaySource(StreamRecording(recording_path), lambda frame, sequence, timestamp: received.append(
+        (int(frame[0, 0]), sequence, timestamp)), speed=0, start_time=1002.0, retime=False)
+    assert replay.run() == 6
+    assert received[0] == (4, 104, 1002.0) and received[-1] == (9, 109, 1004.5)
@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+import pytest
+
+from processing.temperature_probe import TemperatureProbe
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    result = rng.uniform(20.0, 30.0, (24, 32)).astype(np.float32)
+    result[10, 20] = 60.0
+    return result
+
+
+def test_field_matches_the_heatmap_interpolation(frame):
+    probe = TemperatureProbe(scale_factor=10)
+    probe.set_frame(frame)
+    expected = cv2.resize(frame, (320, 240), interpolation=cv2.INTER_CUBIC)
+    np.testing.assert_allclose(probe.field(), expected, atol=1e-3)
+    assert probe.shape == (240, 320)
+
+
+def test_field_is_computed_once_per_frame(frame):
+    probe = TemperatureProbe(scale_factor=4)
+    assert probe.value_at(0, 0) is None and probe.field() is None
+    probe.set_frame(frame)
+    for x in range(10):
+        probe.value_at(x, 5)
+    probe.rect_max(0, 0, 20, 20)
+    assert probe.computed == 1
+    probe.set_frame(frame)
+    probe.value_at(1, 1)
+    assert (probe.frames, probe.computed) == (2, 2)
+
+
+def test_readouts(frame):
+    probe = TemperatureProbe(scale_factor=4, interpolation=cv2.INTER_NEAREST)
+    probe.set_frame(frame)
+    assert probe.value_at(81, 41) == pytest.approx(60.0)
+    # Positions outside the heatmap are clamped
+    assert probe.value_at(-5, 1000) == pytest.approx(frame[23, 0])
+    # Rectangles drawn in any direction, the hottest pixel and its position
+    temperature, x, y = probe.rect_max(100, 60, -40, -30)
+    assert temperature == pytest.approx(60.0) and (x // 4, y // 4) == (20, 10)
+    assert probe.rect_max(500, 500, 10, 10) is None
+    profile = probe.line_profile(0, 42, 127, 42)
+    assert len(profile) == 128 and profile.max() == pytest.approx(60.0)
+    assert len(probe.line_profile(0, 0, 10, 10, samples=5)) == 5
+
+
+def test_cleared_probe_has_no_readouts(frame):
+    probe = TemperatureProbe()
+    probe.set_frame(frame)
+    probe.clear()
+    assert probe.value_at(10, 10) is None and probe.line_profile(0, 0, 5, 5) is None